@@ -45,6 +45,7 @@ def make_backup(elem):
     elem.set('name')
     elem.set('description')
     elem.set('fail_reason')
+    elem.set('parent_id')
 
 
 def make_backup_restore(elem):
@@ -91,7 +92,7 @@ class CreateDeserializer(wsgi.MetadataXMLDeserializer):
         backup_node = self.find_first_child_named(node, 'backup')
 
         attributes = ['container', 'display_name',
-                      'display_description', 'volume_id']
+                      'display_description', 'volume_id', 'parent_id']
 
         for attr in attributes:
             if backup_node.getAttribute(attr):
@@ -197,6 +198,7 @@ class BackupsController(wsgi.Controller):
         container = backup.get('container', None)
         name = backup.get('name', None)
         description = backup.get('description', None)
+        parent_id = backup.get('parent_id', None)
 
         LOG.audit(_("Creating backup of volume %(volume_id)s in container"
                     " %(container)s"),
@@ -205,11 +207,16 @@ class BackupsController(wsgi.Controller):
 
         try:
             new_backup = self.backup_api.create(context, name, description,
-                                                volume_id, container)
+                                                volume_id, container,
+                                                parent_id=parent_id)
         except exception.InvalidVolume as error:
             raise exc.HTTPBadRequest(explanation=error.msg)
+        except exception.InvalidBackup as error:
+            raise exc.HTTPBadRequest(explanation=error.msg)
         except exception.VolumeNotFound as error:
             raise exc.HTTPNotFound(explanation=error.msg)
+        except exception.BackupNotFound as error:
+            raise exc.HTTPNotFound(explanation=error.msg)
         except exception.ServiceNotFound as error:
             raise exc.HTTPInternalServerError(explanation=error.msg)
 
@@ -0,0 +1,81 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""The scheduler statistics extension."""
+
+from cinder.api import extensions
+from cinder.api.openstack import wsgi
+from cinder.api import xmlutil
+from cinder.scheduler import rpcapi as scheduler_rpcapi
+
+
+authorize = extensions.extension_authorizer('volume', 'scheduler_stats')
+
+
+def make_stat(elem):
+    elem.set('name')
+    elem.set('calls')
+    elem.set('total_time')
+    elem.set('average_time')
+    elem.set('max_time')
+    elem.set('hosts_in')
+    elem.set('hosts_out')
+
+
+class SchedulerStatsTemplate(xmlutil.TemplateBuilder):
+    def construct(self):
+        root = xmlutil.TemplateElement('scheduler_stats',
+                                       selector='scheduler_stats')
+        for kind in ('filters', 'weighers'):
+            elem = xmlutil.SubTemplateElement(root, kind)
+            stat = xmlutil.SubTemplateElement(elem, kind[:-1],
+                                              selector=kind)
+            make_stat(stat)
+        return xmlutil.MasterTemplate(root, 1)
+
+
+class SchedulerStatsController(wsgi.Controller):
+    """Statistics of the filters and weighers run by the scheduler."""
+
+    def __init__(self, *args, **kwargs):
+        super(SchedulerStatsController, self).__init__(*args, **kwargs)
+        self.scheduler_api = scheduler_rpcapi.SchedulerAPI()
+
+    @wsgi.serializers(xml=SchedulerStatsTemplate)
+    def index(self, req):
+        """Return the statistics collected by a scheduler."""
+        context = req.environ['cinder.context']
+        authorize(context)
+        stats = self.scheduler_api.get_scheduler_stats(context)
+        return {'scheduler_stats': stats}
+
+
+class Scheduler_stats(extensions.ExtensionDescriptor):
+    """Scheduler filter and weigher statistics."""
+
+    name = "SchedulerStats"
+    alias = "os-scheduler-stats"
+    namespace = ("http://docs.openstack.org/volume/ext/"
+                 "scheduler-stats/api/v1")
+    updated = "2013-10-17T00:00:00+00:00"
+
+    def get_resources(self):
+        resources = []
+        res = extensions.ResourceExtension('os-scheduler-stats',
+                                           SchedulerStatsController())
+        resources.append(res)
+        return resources
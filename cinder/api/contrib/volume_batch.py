@@ -0,0 +1,90 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""The volume batch create extension."""
+
+from webob import exc
+
+from cinder.api import extensions
+from cinder.api.openstack import wsgi
+from cinder.api.v2 import volumes
+from cinder.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+authorize = extensions.extension_authorizer('volume', 'volume_batch')
+
+
+class VolumeBatchController(wsgi.Controller):
+    """Creates several volumes placed by the scheduler in one batch."""
+
+    def __init__(self, ext_mgr):
+        super(VolumeBatchController, self).__init__()
+        self.volume_controller = volumes.VolumeController(ext_mgr)
+        self.volume_api = self.volume_controller.volume_api
+
+    @wsgi.response(202)
+    @wsgi.serializers(xml=volumes.VolumesTemplate)
+    def create(self, req, body):
+        """Creates the volumes of a list of volume create bodies."""
+        context = req.environ['cinder.context']
+        authorize(context)
+        volume_bodies = (body or {}).get('volumes')
+        if (not isinstance(volume_bodies, list) or
+                not all(self.is_valid_body({'volume': volume}, 'volume')
+                        for volume in volume_bodies)):
+            msg = _("Missing required element '%s' in request body") % \
+                'volumes'
+            raise exc.HTTPBadRequest(explanation=msg)
+
+        LOG.debug('Create volume batch request body: %s', body)
+        requests = [self.volume_controller._get_create_kwargs(context,
+                                                              volume)
+                    for volume in volume_bodies]
+        new_volumes = []
+        for new_volume in self.volume_api.create_volumes(context, requests):
+            new_volume = dict(new_volume.iteritems())
+            self.volume_controller._add_visible_admin_metadata(context,
+                                                               new_volume)
+            new_volumes.append(new_volume)
+
+        view_builder = self.volume_controller._view_builder
+        return {'volumes': [view_builder.summary(req, new_volume)['volume']
+                            for new_volume in new_volumes]}
+
+
+class Volume_batch(extensions.ExtensionDescriptor):
+    """Create several volumes scheduled in one batch."""
+
+    name = "VolumeBatch"
+    alias = "os-volume-batch"
+    namespace = ("http://docs.openstack.org/volume/ext/"
+                 "volume-batch/api/v1")
+    updated = "2013-10-17T00:00:00+00:00"
+
+    def __init__(self, ext_mgr):
+        # The volume bodies are parsed as the volumes resource parses them,
+        # which depends on the loaded extensions
+        self.ext_mgr = ext_mgr
+        super(Volume_batch, self).__init__(ext_mgr)
+
+    def get_resources(self):
+        resources = []
+        res = extensions.ResourceExtension('os-volume-batch',
+                                           VolumeBatchController(self.ext_mgr))
+        resources.append(res)
+        return resources
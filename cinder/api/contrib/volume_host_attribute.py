@@ -29,21 +29,23 @@ class VolumeHostAttributeController(wsgi.Controller):
         super(VolumeHostAttributeController, self).__init__(*args, **kwargs)
         self.volume_api = volume.API()
 
-    def _add_volume_host_attribute(self, context, resp_volume):
-        try:
-            db_volume = self.volume_api.get(context, resp_volume['id'])
-        except Exception:
-            return
-        else:
-            key = "%s:host" % Volume_host_attribute.alias
-            resp_volume[key] = db_volume['host']
+    def _add_volume_host_attribute(self, req, context, resp_volume):
+        db_volume = req.get_db_volume(resp_volume['id'])
+        if db_volume is None:
+            try:
+                db_volume = self.volume_api.get(context, resp_volume['id'])
+            except Exception:
+                return
+        key = "%s:host" % Volume_host_attribute.alias
+        resp_volume[key] = db_volume['host']
 
     @wsgi.extends
     def show(self, req, resp_obj, id):
         context = req.environ['cinder.context']
         if authorize(context):
             resp_obj.attach(xml=VolumeHostAttributeTemplate())
-            self._add_volume_host_attribute(context, resp_obj.obj['volume'])
+            self._add_volume_host_attribute(req, context,
+                                            resp_obj.obj['volume'])
 
     @wsgi.extends
     def detail(self, req, resp_obj):
@@ -51,7 +53,7 @@ class VolumeHostAttributeController(wsgi.Controller):
         if authorize(context):
             resp_obj.attach(xml=VolumeListHostAttributeTemplate())
             for volume in list(resp_obj.obj['volumes']):
-                self._add_volume_host_attribute(context, volume)
+                self._add_volume_host_attribute(req, context, volume)
 
 
 class Volume_host_attribute(extensions.ExtensionDescriptor):
@@ -52,8 +52,16 @@ class VolumeImageMetadataController(wsgi.Controller):
         context = req.environ['cinder.context']
         if authorize(context):
             resp_obj.attach(xml=VolumesImageMetadataTemplate())
-            for volume in list(resp_obj.obj.get('volumes', [])):
-                self._add_image_metadata(context, volume)
+            volumes = list(resp_obj.obj.get('volumes', []))
+            try:
+                all_meta = self.volume_api.get_list_volumes_image_metadata(
+                    context, [volume['id'] for volume in volumes])
+            except Exception:
+                return
+            for volume in volumes:
+                image_meta = all_meta.get(volume['id'])
+                if image_meta:
+                    volume['volume_image_metadata'] = image_meta
 
 
 class Volume_image_metadata(extensions.ExtensionDescriptor):
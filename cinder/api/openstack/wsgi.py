@@ -65,6 +65,50 @@ _MEDIA_TYPE_MAP = {
 class Request(webob.Request):
     """Add some OpenStack API-specific logic to the base webob.Request."""
 
+    def __init__(self, *args, **kwargs):
+        super(Request, self).__init__(*args, **kwargs)
+        self._extension_data = {'db_items': {}}
+
+    def cache_db_items(self, key, items, item_key='id'):
+        """Allow API methods to store objects from a DB query to be
+        used by API extensions within the same API request.
+
+        An instance of this class only lives for the lifetime of a
+        single API request, so there's no need to implement full
+        cache management.
+        """
+        db_items = self._extension_data['db_items'].setdefault(key, {})
+        for item in items:
+            db_items[item[item_key]] = item
+
+    def get_db_items(self, key):
+        """Allow an API extension to get previously stored objects within
+        the same API request.
+
+        Note that the object data will be slightly stale.
+        """
+        return self._extension_data['db_items'].get(key, {})
+
+    def get_db_item(self, key, item_key):
+        """Allow an API extension to get a previously stored object
+        within the same API request.
+
+        Note that the object data will be slightly stale.
+        """
+        return self.get_db_items(key).get(item_key)
+
+    def cache_db_volumes(self, volumes):
+        self.cache_db_items('volumes', volumes, 'id')
+
+    def cache_db_volume(self, volume):
+        self.cache_db_items('volumes', [volume], 'id')
+
+    def get_db_volumes(self):
+        return self.get_db_items('volumes')
+
+    def get_db_volume(self, volume_id):
+        return self.get_db_item('volumes', volume_id)
+
     def best_match_content_type(self):
         """Determine the requested response content-type."""
         if 'cinder.best_content_type' not in self.environ:
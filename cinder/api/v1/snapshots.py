@@ -139,20 +139,24 @@ class SnapshotsController(wsgi.Controller):
         """Returns a list of snapshots, transformed through entity_maker."""
         context = req.environ['cinder.context']
 
-        #pop out limit and offset , they are not search_opts
+        #pop out limit, offset and marker, they are not search_opts
         search_opts = req.GET.copy()
         search_opts.pop('limit', None)
         search_opts.pop('offset', None)
+        marker = search_opts.pop('marker', None)
 
         #filter out invalid option
         allowed_search_options = ('status', 'volume_id', 'display_name')
         volumes.remove_invalid_options(context, search_opts,
                                        allowed_search_options)
 
+        limit, offset = common.get_limit_and_offset(req)
         snapshots = self.volume_api.get_all_snapshots(context,
-                                                      search_opts=search_opts)
-        limited_list = common.limited(snapshots, req)
-        res = [entity_maker(context, snapshot) for snapshot in limited_list]
+                                                      search_opts=search_opts,
+                                                      marker=marker,
+                                                      limit=limit,
+                                                      offset=offset)
+        res = [entity_maker(context, snapshot) for snapshot in snapshots]
         return {'snapshots': res}
 
     @wsgi.serializers(xml=SnapshotTemplate)
@@ -265,6 +265,8 @@ class VolumeController(wsgi.Controller):
         except exception.NotFound:
             raise exc.HTTPNotFound()
 
+        req.cache_db_volume(vol)
+
         self._add_visible_admin_metadata(context, vol)
 
         return {'volume': _translate_volume_detail_view(context, vol)}
@@ -295,10 +297,11 @@ class VolumeController(wsgi.Controller):
     def _items(self, req, entity_maker):
         """Returns a list of volumes, transformed through entity_maker."""
 
-        #pop out limit and offset , they are not search_opts
+        #pop out limit, offset and marker, they are not search_opts
         search_opts = req.GET.copy()
         search_opts.pop('limit', None)
         search_opts.pop('offset', None)
+        marker = search_opts.pop('marker', None)
 
         if 'metadata' in search_opts:
             search_opts['metadata'] = ast.literal_eval(search_opts['metadata'])
@@ -307,15 +310,19 @@ class VolumeController(wsgi.Controller):
         remove_invalid_options(context,
                                search_opts, self._get_volume_search_options())
 
-        volumes = self.volume_api.get_all(context, marker=None, limit=None,
+        # The page is cut in the database; a marker, the last volume of the
+        # previous page, spares it from skipping the offset first volumes
+        limit, offset = common.get_limit_and_offset(req)
+        volumes = self.volume_api.get_all(context, marker=marker, limit=limit,
                                           sort_key='created_at',
-                                          sort_dir='desc', filters=search_opts)
+                                          sort_dir='desc', filters=search_opts,
+                                          offset=offset)
 
         for volume in volumes:
             self._add_visible_admin_metadata(context, volume)
 
-        limited_list = common.limited(volumes, req)
-        res = [entity_maker(context, vol) for vol in limited_list]
+        req.cache_db_volumes(volumes)
+        res = [entity_maker(context, vol) for vol in volumes]
         return {'volumes': res}
 
     def _image_uuid_from_href(self, image_href):
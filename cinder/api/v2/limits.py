@@ -19,11 +19,17 @@ Module dedicated functions/classes dealing with rate limiting requests.
 
 import collections
 import copy
+import fcntl
+import hashlib
 import httplib
 import math
+import mmap
+import os
 import re
+import struct
 import time
 
+from oslo.config import cfg
 import webob.dec
 import webob.exc
 
@@ -35,6 +41,7 @@ from cinder.openstack.common import jsonutils
 from cinder import quota
 from cinder import wsgi as base_wsgi
 
+CONF = cfg.CONF
 QUOTAS = quota.QUOTAS
 
 
@@ -127,6 +134,7 @@ class Limit(object):
         self.verb = verb
         self.uri = uri
         self.regex = regex
+        self._regex = None
         self.value = int(value)
         self.unit = unit
         self.unit_string = self.display_unit().lower()
@@ -145,6 +153,25 @@ class Limit(object):
                 "made to %(uri)s every %(unit_string)s.")
         self.error_message = msg % self.__dict__
 
+    def __deepcopy__(self, memo):
+        # Compiled patterns can't be deep copied, but they are immutable
+        # and can be shared between the copies.
+        result = self.__class__.__new__(self.__class__)
+        memo[id(self)] = result
+        for key, value in self.__dict__.iteritems():
+            if key != '_regex':
+                value = copy.deepcopy(value, memo)
+            result.__dict__[key] = value
+        return result
+
+    def matches(self, verb, url):
+        """Return whether a request for verb and url counts against us."""
+        if self.verb != verb:
+            return False
+        if self._regex is None:
+            self._regex = re.compile(self.regex)
+        return self._regex.match(url) is not None
+
     def __call__(self, verb, url):
         """
         Represents a call to this limit from a relevant request.
@@ -152,7 +179,7 @@ class Limit(object):
         @param verb: string http verb (POST, GET, etc.)
         @param url: string URL
         """
-        if self.verb != verb or not re.match(self.regex, url):
+        if not self.matches(verb, url):
             return
 
         now = self._get_time()
@@ -289,6 +316,7 @@ class Limiter(object):
         """
         self.limits = copy.deepcopy(limits)
         self.levels = collections.defaultdict(lambda: copy.deepcopy(limits))
+        self._levels_by_verb = {}
 
         # Pick up any per-user limit information
         for key, value in kwargs.items():
@@ -296,6 +324,19 @@ class Limiter(object):
                 username = key[7:]
                 self.levels[username] = self.parse_limits(value)
 
+    def _get_verb_limits(self, username, verb):
+        """
+        Return the limits of a given user which apply to verb, so that a
+        request only looks at the limits which can possibly match it.
+        """
+        by_verb = self._levels_by_verb.get(username)
+        if by_verb is None:
+            by_verb = collections.defaultdict(list)
+            for limit in self.levels[username]:
+                by_verb[limit.verb].append(limit)
+            self._levels_by_verb[username] = by_verb
+        return by_verb.get(verb, [])
+
     def get_limits(self, username=None):
         """
         Return the limits for a given user.
@@ -310,7 +351,7 @@ class Limiter(object):
         """
         delays = []
 
-        for limit in self.levels[username]:
+        for limit in self._get_verb_limits(username, verb):
             delay = limit(verb, url)
             if delay:
                 delays.append((delay, limit.error_message))
@@ -382,6 +423,151 @@ class Limiter(object):
         return result
 
 
+class SharedMemoryLimiter(Limiter):
+    """
+    Rate-limit checking class which keeps the state of the limits in a
+    memory mapped file, so that all API workers on a host enforce the
+    same limits without going through a `WsgiLimiter` over HTTP.
+
+    Every (user, limit) pair owns a fixed size slot of the file, found by
+    hashing.  Slots whose bucket has completely drained are recycled, so
+    the file does not need to grow with the number of users.  Updates are
+    serialized across processes with a POSIX lock on the file.
+    """
+
+    # key, water level, last request, remaining, next request
+    SLOT = struct.Struct('<8s4d')
+    EMPTY_KEY = '\0' * 8
+    PROBES = 8
+
+    def __init__(self, limits, limiter_file=None, limiter_slots=65536,
+                 **kwargs):
+        """
+        Initialize the new `SharedMemoryLimiter`.
+
+        @param limits: List of `Limit` objects
+        @param limiter_file: Path of the file shared by the API workers,
+                             defaults to $state_path/api-limits
+        @param limiter_slots: Number of (user, limit) pairs kept in the file
+        """
+        super(SharedMemoryLimiter, self).__init__(limits, **kwargs)
+        self.path = limiter_file or os.path.join(CONF.state_path,
+                                                 'api-limits')
+        self.slots = int(limiter_slots)
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def _get_map(self):
+        # API workers are forked after the middleware is built, so every
+        # process maps the file on its own.
+        if self._pid != os.getpid():
+            size = self.slots * self.SLOT.size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+            self._fd = fd
+            self._pid = os.getpid()
+        return self._fd, self._map
+
+    def _slot_key(self, username, limit):
+        key = '\0'.join([unicode(username), limit.verb, limit.regex,
+                         str(limit.value), str(limit.unit)])
+        return hashlib.md5(key.encode('utf-8')).digest()[:8]
+
+    def _find_slot(self, table, key, now):
+        """Return the offset of the slot for key and whether it is in use."""
+        size = self.SLOT.size
+        home = struct.unpack('<Q', key)[0] % self.slots
+        free = None
+        for probe in xrange(min(self.PROBES, self.slots)):
+            offset = ((home + probe) % self.slots) * size
+            stored, water_level, last_request, _r, _n = \
+                self.SLOT.unpack_from(table, offset)
+            if stored == key:
+                return offset, True
+            if free is None and (stored == self.EMPTY_KEY or
+                                 now - last_request >= water_level):
+                free = offset
+        # Every probed slot is busy; sacrifice the home slot
+        return (home * size if free is None else free), False
+
+    def _load(self, table, offset, in_use, limit):
+        if not in_use:
+            limit.water_level = 0
+            limit.last_request = None
+            limit.remaining = limit.value
+            limit.next_request = None
+            return
+        _key, limit.water_level, last_request, limit.remaining, \
+            next_request = self.SLOT.unpack_from(table, offset)
+        limit.last_request = None if math.isnan(last_request) \
+            else last_request
+        limit.next_request = None if math.isnan(next_request) \
+            else next_request
+
+    def _store(self, table, offset, key, limit):
+        nan = float('nan')
+        self.SLOT.pack_into(table, offset, key, limit.water_level,
+                            nan if limit.last_request is None
+                            else limit.last_request,
+                            limit.remaining,
+                            nan if limit.next_request is None
+                            else limit.next_request)
+
+    def get_limits(self, username=None):
+        """
+        Return the limits for a given user, as seen by all the workers.
+        """
+        fd, table = self._get_map()
+        fcntl.lockf(fd, fcntl.LOCK_SH)
+        try:
+            result = []
+            for limit in self.levels[username]:
+                key = self._slot_key(username, limit)
+                offset, in_use = self._find_slot(table, key,
+                                                 limit._get_time())
+                self._load(table, offset, in_use, limit)
+                result.append(limit.display())
+            return result
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+
+    def check_for_delay(self, verb, url, username=None):
+        """
+        Check the given verb/user/user triplet for limit.
+
+        @return: Tuple of delay (in seconds) and error message (or None, None)
+        """
+        limits = [limit for limit in self._get_verb_limits(username, verb)
+                  if limit.matches(verb, url)]
+        if not limits:
+            return None, None
+
+        delays = []
+        fd, table = self._get_map()
+        fcntl.lockf(fd, fcntl.LOCK_EX)
+        try:
+            for limit in limits:
+                key = self._slot_key(username, limit)
+                offset, in_use = self._find_slot(table, key,
+                                                 limit._get_time())
+                self._load(table, offset, in_use, limit)
+                delay = limit(verb, url)
+                self._store(table, offset, key, limit)
+                if delay:
+                    delays.append((delay, limit.error_message))
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN)
+
+        if delays:
+            delays.sort()
+            return delays[0]
+
+        return None, None
+
+
 class WsgiLimiter(object):
     """
     Rate-limit checking from a WSGI application. Uses an in-memory `Limiter`.
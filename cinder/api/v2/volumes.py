@@ -209,6 +209,8 @@ class VolumeController(wsgi.Controller):
             msg = _("Volume could not be found")
             raise exc.HTTPNotFound(explanation=msg)
 
+        req.cache_db_volume(vol)
+
         self._add_visible_admin_metadata(context, vol)
 
         return self._view_builder.detail(req, vol)
@@ -271,6 +273,7 @@ class VolumeController(wsgi.Controller):
             self._add_visible_admin_metadata(context, volume)
 
         limited_list = common.limited(volumes, req)
+        req.cache_db_volumes(limited_list)
 
         if is_detail:
             volumes = self._view_builder.detail_list(req, limited_list)
@@ -304,8 +307,22 @@ class VolumeController(wsgi.Controller):
 
         LOG.debug('Create volume request body: %s', body)
         context = req.environ['cinder.context']
-        volume = body['volume']
+        kwargs = self._get_create_kwargs(context, body['volume'])
+        new_volume = self.volume_api.create(context, **kwargs)
+
+        # TODO(vish): Instance should be None at db layer instead of
+        #             trying to lazy load, but for now we turn it into
+        #             a dict to avoid an error.
+        new_volume = dict(new_volume.iteritems())
+
+        self._add_visible_admin_metadata(context, new_volume)
+
+        retval = self._view_builder.summary(req, new_volume)
+
+        return retval
 
+    def _get_create_kwargs(self, context, volume):
+        """Return the volume_api.create() arguments of a volume body."""
         kwargs = {}
 
         # NOTE(thingee): v2 API allows name instead of display_name
@@ -362,22 +379,10 @@ class VolumeController(wsgi.Controller):
         kwargs['availability_zone'] = volume.get('availability_zone', None)
         kwargs['scheduler_hints'] = volume.get('scheduler_hints', None)
 
-        new_volume = self.volume_api.create(context,
-                                            size,
-                                            volume.get('display_name'),
-                                            volume.get('display_description'),
-                                            **kwargs)
-
-        # TODO(vish): Instance should be None at db layer instead of
-        #             trying to lazy load, but for now we turn it into
-        #             a dict to avoid an error.
-        new_volume = dict(new_volume.iteritems())
-
-        self._add_visible_admin_metadata(context, new_volume)
-
-        retval = self._view_builder.summary(req, new_volume)
-
-        return retval
+        kwargs['size'] = size
+        kwargs['name'] = volume.get('display_name')
+        kwargs['description'] = volume.get('display_description')
+        return kwargs
 
     def _get_volume_filter_options(self):
         """Return volume search options allowed by non-admin."""
@@ -72,6 +72,7 @@ class ViewBuilder(common.ViewBuilder):
                 'description': backup.get('display_description'),
                 'fail_reason': backup.get('fail_reason'),
                 'volume_id': backup.get('volume_id'),
+                'parent_id': backup.get('parent_id'),
                 'links': self._get_links(request, backup['id'])
             }
         }
@@ -65,6 +65,9 @@ class API(base.Base):
         if backup['status'] not in ['available', 'error']:
             msg = _('Backup status must be available or error')
             raise exception.InvalidBackup(reason=msg)
+        if self.db.backup_get_all_by_parent(context, backup_id):
+            msg = _('Backup has incremental backups depending on it')
+            raise exception.InvalidBackup(reason=msg)
 
         self.db.backup_update(context, backup_id, {'status': 'deleting'})
         self.backup_rpcapi.delete_backup(context,
@@ -97,13 +100,25 @@ class API(base.Base):
         return False
 
     def create(self, context, name, description, volume_id,
-               container, availability_zone=None):
-        """Make the RPC call to create a volume backup."""
+               container, availability_zone=None, parent_id=None):
+        """Make the RPC call to create a volume backup.
+
+        If parent_id is given the backup is incremental: only the data
+        changed since the parent backup of the same volume is stored.
+        """
         check_policy(context, 'create')
         volume = self.volume_api.get(context, volume_id)
         if volume['status'] != "available":
             msg = _('Volume to be backed up must be available')
             raise exception.InvalidVolume(reason=msg)
+        if parent_id is not None:
+            parent = self.get(context, parent_id)
+            if parent['volume_id'] != volume_id:
+                msg = _('Parent backup must be a backup of the same volume')
+                raise exception.InvalidBackup(reason=msg)
+            if parent['status'] != 'available':
+                msg = _('Parent backup must be available')
+                raise exception.InvalidBackup(reason=msg)
         self.db.volume_update(context, volume_id, {'status': 'backing-up'})
 
         options = {'user_id': context.user_id,
@@ -114,6 +129,7 @@ class API(base.Base):
                    'status': 'creating',
                    'container': container,
                    'size': volume['size'],
+                   'parent_id': parent_id,
                    # TODO(DuncanT): This will need de-managling once
                    #                multi-backend lands
                    'host': volume['host'], }
@@ -16,6 +16,8 @@
 """Base class for all backup drivers."""
 
 from cinder.db import base
+from cinder import units
+from cinder import utils
 
 
 class BackupDriver(base.Base):
@@ -31,3 +33,28 @@ class BackupDriver(base.Base):
     def delete(self, backup):
         """Deletes a saved backup"""
         raise NotImplementedError()
+
+    def _write_zeros(self, volume_file, length):
+        """Move volume_file forward past length bytes of zeros.
+
+        Zeros are only written where the file does not already read back
+        as zeros, so that restoring onto a thinly provisioned volume or a
+        sparse file leaves the zeroed ranges unallocated. Files that cannot
+        be read are always written.
+        """
+        offset = volume_file.tell()
+        end = offset + length
+        while offset < end:
+            size = min(units.MiB, end - offset)
+            # A buffered file must be repositioned between a write and the
+            # next read
+            volume_file.seek(offset)
+            try:
+                existing = volume_file.read(size)
+            except IOError:
+                existing = None
+            if (existing is None or len(existing) != size or
+                    not utils.is_all_zero(existing)):
+                volume_file.seek(offset)
+                volume_file.write('\0' * size)
+            offset += size
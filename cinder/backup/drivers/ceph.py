@@ -222,8 +222,7 @@ class CephBackupDriver(BackupDriver):
         for chunk in xrange(0, chunks):
             before = time.time()
             data = src.read(self.chunk_size)
-            dest.write(data)
-            dest.flush()
+            self._write_data(dest, data)
             delta = (time.time() - before)
             rate = (self.chunk_size / delta) / 1024
             LOG.debug((_("transferred chunk %(chunk)s of %(chunks)s "
@@ -238,11 +237,19 @@ class CephBackupDriver(BackupDriver):
         if rem:
             LOG.debug(_("transferring remaining %s bytes") % (rem))
             data = src.read(rem)
-            dest.write(data)
-            dest.flush()
+            self._write_data(dest, data)
             # yield to any other pending backups
             eventlet.sleep(0)
 
+    def _write_data(self, dest, data):
+        """Write a chunk of data, skipping it if it is all zeros."""
+        if utils.is_all_zero(data):
+            LOG.debug(_("skipping %s bytes of zeros") % len(data))
+            self._write_zeros(dest, len(data))
+        else:
+            dest.write(data)
+        dest.flush()
+
     def _create_base_image(self, name, size, rados_client):
         """Create a base backup image.
 
@@ -27,7 +27,32 @@
                                     failed Swift operations (default: 10).
 :backup_compression_algorithm: Compression algorithm to use for volume
                                backups. Supported options are:
-                               None (to disable), zlib and bz2 (default: zlib)
+                               None (to disable), zlib, bz2, lz4, zstd and
+                               auto (default: zlib)
+:backup_compression_level: The compression level passed to the compression
+                           algorithm (default: the algorithm's default).
+:backup_compression_auto_threshold: The compressed size, as a fraction of the
+                                    original size, of a sample of each chunk
+                                    above which the auto algorithm stores the
+                                    chunk uncompressed (default: 0.9).
+:backup_swift_upload_concurrency: The number of backup chunks compressed and
+                                  uploaded to Swift in parallel; 1 disables
+                                  the pipelined backup mode (default: 1).
+:backup_swift_max_inflight_chunks: The maximum number of chunks read from the
+                                   volume but not yet uploaded when the
+                                   pipelined backup mode is used (default: 8).
+:backup_swift_block_size: The size in bytes of the blocks whose SHA-256
+                          digests are compared to find the data changed
+                          since the parent of an incremental backup
+                          (default: 1048576).
+:backup_swift_restore_concurrency: The number of backup objects downloaded,
+                                   decompressed and written to the volume
+                                   in parallel during a restore
+                                   (default: 1).
+:backup_swift_restore_fsync_interval: The number of bytes written to the
+                                      volume between fsync calls during a
+                                      restore; 0 syncs only once the restore
+                                      is complete (default: 0).
 """
 
 import hashlib
@@ -36,14 +61,19 @@ import json
 import os
 import socket
 import StringIO
+import sys
 
 import eventlet
+from eventlet import pools
+from eventlet import tpool
 from oslo.config import cfg
 
 from cinder.backup.driver import BackupDriver
 from cinder import exception
+from cinder.openstack.common import importutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import timeutils
+from cinder import utils
 from swiftclient import client as swift
 
 
@@ -76,31 +106,114 @@ swiftbackup_service_opts = [
                help='The backoff time in seconds between Swift retries'),
     cfg.StrOpt('backup_compression_algorithm',
                default='zlib',
-               help='Compression algorithm (None to disable)'),
+               help='Compression algorithm (None to disable, zlib, bz2, '
+                    'lz4, zstd or auto)'),
+    cfg.IntOpt('backup_compression_level',
+               default=None,
+               help='Compression level for the compression algorithm '
+                    '(None for the algorithm default)'),
+    cfg.FloatOpt('backup_compression_auto_threshold',
+                 default=0.9,
+                 help='With the auto compression algorithm, chunks whose '
+                      'sample compresses to more than this fraction of its '
+                      'size are stored uncompressed'),
+    cfg.IntOpt('backup_swift_upload_concurrency',
+               default=1,
+               help='The number of backup chunks to compress and upload to '
+                    'Swift in parallel (1 disables pipelined backups)'),
+    cfg.IntOpt('backup_swift_max_inflight_chunks',
+               default=8,
+               help='The maximum number of chunks held in memory while '
+                    'waiting to be uploaded by a pipelined backup'),
+    cfg.IntOpt('backup_swift_block_size',
+               default=1048576,
+               help='The size in bytes of the blocks compared to find '
+                    'changed data for incremental backups'),
+    cfg.IntOpt('backup_swift_restore_concurrency',
+               default=1,
+               help='The number of backup objects to download and '
+                    'decompress in parallel during a restore'),
+    cfg.IntOpt('backup_swift_restore_fsync_interval',
+               default=0,
+               help='The number of bytes to write between fsync calls when '
+                    'restoring a backup (0 to sync at the end only)'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(swiftbackup_service_opts)
 
+# Compression algorithms by name, with the module providing them. Each
+# module's compress() takes the compression level as its second argument.
+COMPRESSION_MODULES = {
+    'zlib': 'zlib',
+    'bz2': 'bz2',
+    'lz4': 'lz4.frame',
+    'zstd': 'zstd',
+}
+COMPRESSION_ALIASES = {'gzip': 'zlib', 'bzip2': 'bz2'}
+# The auto algorithm uses the fastest of these that is installed
+AUTO_COMPRESSION_PREFERENCE = ['zstd', 'lz4', 'zlib']
+# The amount of each chunk the auto algorithm tries to compress
+AUTO_COMPRESSION_SAMPLE_SIZE = 65536
+
+
+class Compressor(object):
+    """Compresses backup data with one algorithm at a set level."""
+
+    def __init__(self, name, module, level=None):
+        self.name = name
+        self.module = module
+        self.level = level
+
+    def compress(self, data):
+        if self.level is None:
+            return self.module.compress(data)
+        return self.module.compress(data, self.level)
+
+    def decompress(self, data):
+        return self.module.decompress(data)
+
+
+class SwiftConnectionPool(pools.Pool):
+    """A simple eventlet pool to hold Swift connections.
+
+    A swiftclient Connection must not be shared by greenthreads issuing
+    requests concurrently, so each uploader borrows its own.
+    """
+
+    def __init__(self, connection_factory, *args, **kwargs):
+        self.connection_factory = connection_factory
+        super(SwiftConnectionPool, self).__init__(*args, **kwargs)
+
+    def create(self):
+        return self.connection_factory()
+
 
 class SwiftBackupDriver(BackupDriver):
     """Provides backup, restore and delete of backup objects within Swift."""
 
-    DRIVER_VERSION = '1.0.0'
-    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1'}
+    DRIVER_VERSION = '1.1.0'
+    DRIVER_VERSION_MAPPING = {'1.0.0': '_restore_v1',
+                              '1.1.0': '_restore_v2'}
 
-    def _get_compressor(self, algorithm):
-        try:
-            if algorithm.lower() in ('none', 'off', 'no'):
-                return None
-            elif algorithm.lower() in ('zlib', 'gzip'):
-                import zlib as compressor
-                return compressor
-            elif algorithm.lower() in ('bz2', 'bzip2'):
-                import bz2 as compressor
-                return compressor
-        except ImportError:
-            pass
+    def _get_compressor(self, algorithm, level=None):
+        name = algorithm.lower()
+        if name in ('none', 'off', 'no'):
+            return None
+        if name == 'auto':
+            for preferred in AUTO_COMPRESSION_PREFERENCE:
+                try:
+                    return self._get_compressor(preferred, level)
+                except ValueError:
+                    pass
+        name = COMPRESSION_ALIASES.get(name, name)
+        if name in COMPRESSION_MODULES:
+            try:
+                module = importutils.import_module(COMPRESSION_MODULES[name])
+            except ImportError:
+                pass
+            else:
+                return Compressor(name, module, level)
 
         err = _('unsupported compression algorithm: %s') % algorithm
         raise ValueError(unicode(err))
@@ -111,10 +224,20 @@ class SwiftBackupDriver(BackupDriver):
                                    self.context.project_id)
         self.az = CONF.storage_availability_zone
         self.data_block_size_bytes = CONF.backup_swift_object_size
+        self.sha_block_size_bytes = CONF.backup_swift_block_size
         self.swift_attempts = CONF.backup_swift_retry_attempts
         self.swift_backoff = CONF.backup_swift_retry_backoff
         self.compressor = \
-            self._get_compressor(CONF.backup_compression_algorithm)
+            self._get_compressor(CONF.backup_compression_algorithm,
+                                 CONF.backup_compression_level)
+        self.auto_compression = \
+            CONF.backup_compression_algorithm.lower() == 'auto'
+        self.upload_concurrency = max(CONF.backup_swift_upload_concurrency, 1)
+        self.max_inflight_chunks = max(CONF.backup_swift_max_inflight_chunks,
+                                       self.upload_concurrency)
+        self.restore_concurrency = max(
+            CONF.backup_swift_restore_concurrency, 1)
+        self.restore_fsync_interval = CONF.backup_swift_restore_fsync_interval
         LOG.debug('Connect to %s in "%s" mode' % (CONF.backup_swift_url,
                                                   CONF.backup_swift_auth))
         if CONF.backup_swift_auth == 'single_user':
@@ -123,19 +246,25 @@ class SwiftBackupDriver(BackupDriver):
                             "but %(param)s not set")
                           % {'param': 'backup_swift_user'})
                 raise exception.ParameterNotFound(param='backup_swift_user')
-            self.conn = swift.Connection(authurl=CONF.backup_swift_url,
-                                         user=CONF.backup_swift_user,
-                                         key=CONF.backup_swift_key,
-                                         retries=self.swift_attempts,
-                                         starting_backoff=self.swift_backoff)
-        else:
-            self.conn = swift.Connection(retries=self.swift_attempts,
-                                         preauthurl=self.swift_url,
-                                         preauthtoken=self.context.auth_token,
-                                         starting_backoff=self.swift_backoff)
+        self.conn = self._create_connection()
+        self.conn_pool = SwiftConnectionPool(
+            self._create_connection,
+            max_size=max(self.upload_concurrency, self.restore_concurrency))
 
         super(SwiftBackupDriver, self).__init__(db_driver)
 
+    def _create_connection(self):
+        if CONF.backup_swift_auth == 'single_user':
+            return swift.Connection(authurl=CONF.backup_swift_url,
+                                    user=CONF.backup_swift_user,
+                                    key=CONF.backup_swift_key,
+                                    retries=self.swift_attempts,
+                                    starting_backoff=self.swift_backoff)
+        return swift.Connection(retries=self.swift_attempts,
+                                preauthurl=self.swift_url,
+                                preauthtoken=self.context.auth_token,
+                                starting_backoff=self.swift_backoff)
+
     def _check_container_exists(self, container):
         LOG.debug(_('_check_container_exists: container: %s') % container)
         try:
@@ -186,7 +315,26 @@ class SwiftBackupDriver(BackupDriver):
         filename = '%s_metadata' % swift_object_name
         return filename
 
-    def _write_metadata(self, backup, volume_id, container, object_list):
+    def _sha256_filename(self, backup):
+        swift_object_name = backup['service_metadata']
+        filename = '%s_sha256file' % swift_object_name
+        return filename
+
+    def _put_json_object(self, container, filename, contents):
+        contents_json = json.dumps(contents, sort_keys=True, indent=2)
+        reader = StringIO.StringIO(contents_json)
+        etag = self.conn.put_object(container, filename, reader,
+                                    content_length=reader.len)
+        md5 = hashlib.md5(contents_json).hexdigest()
+        if etag != md5:
+            err = _('error writing metadata file to swift, MD5 of metadata'
+                    ' file in swift [%(etag)s] is not the same as MD5 of '
+                    'metadata file sent to swift [%(md5)s]') % {'etag': etag,
+                                                                'md5': md5}
+            raise exception.InvalidBackup(reason=err)
+
+    def _write_metadata(self, backup, volume_id, container, object_list,
+                        holes=None):
         filename = self._metadata_filename(backup)
         LOG.debug(_('_write_metadata started, container name: %(container)s,'
                     ' metadata filename: %(filename)s') %
@@ -198,20 +346,26 @@ class SwiftBackupDriver(BackupDriver):
         metadata['backup_name'] = backup['display_name']
         metadata['backup_description'] = backup['display_description']
         metadata['created_at'] = str(backup['created_at'])
+        metadata['parent_id'] = backup.get('parent_id')
         metadata['objects'] = object_list
-        metadata_json = json.dumps(metadata, sort_keys=True, indent=2)
-        reader = StringIO.StringIO(metadata_json)
-        etag = self.conn.put_object(container, filename, reader,
-                                    content_length=reader.len)
-        md5 = hashlib.md5(metadata_json).hexdigest()
-        if etag != md5:
-            err = _('error writing metadata file to swift, MD5 of metadata'
-                    ' file in swift [%(etag)s] is not the same as MD5 of '
-                    'metadata file sent to swift [%(md5)s]') % {'etag': etag,
-                                                                'md5': md5}
-            raise exception.InvalidBackup(reason=err)
+        metadata['holes'] = holes or []
+        self._put_json_object(container, filename, metadata)
         LOG.debug(_('_write_metadata finished'))
 
+    def _write_sha256file(self, backup, volume_id, container, sha256_list):
+        filename = self._sha256_filename(backup)
+        LOG.debug(_('_write_sha256file started, container name: '
+                    '%(container)s, sha256file filename: %(filename)s') %
+                  {'container': container, 'filename': filename})
+        sha256file = {}
+        sha256file['version'] = self.DRIVER_VERSION
+        sha256file['backup_id'] = backup['id']
+        sha256file['volume_id'] = volume_id
+        sha256file['chunk_size'] = self.sha_block_size_bytes
+        sha256file['sha256s'] = sha256_list
+        self._put_json_object(container, filename, sha256file)
+        LOG.debug(_('_write_sha256file finished'))
+
     def _read_metadata(self, backup):
         container = backup['container']
         filename = self._metadata_filename(backup)
@@ -223,6 +377,42 @@ class SwiftBackupDriver(BackupDriver):
         LOG.debug(_('_read_metadata finished (%s)') % metadata)
         return metadata
 
+    def _read_sha256file(self, backup):
+        container = backup['container']
+        filename = self._sha256_filename(backup)
+        LOG.debug(_('_read_sha256file started, container name: '
+                    '%(container)s, sha256file filename: %(filename)s') %
+                  {'container': container, 'filename': filename})
+        (resp, body) = self.conn.get_object(container, filename)
+        sha256file = json.loads(body)
+        LOG.debug(_('_read_sha256file finished'))
+        return sha256file
+
+    def _get_parent_sha256s(self, backup):
+        """Return the block digests of the parent of an incremental backup.
+
+        Returns None, and turns the backup into a full one, when the parent
+        was made by an older driver or with a different block size, as its
+        digests cannot be compared with ours.
+        """
+        parent = self.db.backup_get(self.context, backup['parent_id'])
+        try:
+            sha256file = None
+            if self._read_metadata(parent)['version'] != '1.0.0':
+                sha256file = self._read_sha256file(parent)
+        except socket.error as err:
+            raise exception.SwiftConnectionFailed(reason=str(err))
+        if (sha256file is None or
+                sha256file['chunk_size'] != self.sha_block_size_bytes):
+            LOG.warn(_('cannot make an incremental backup from parent '
+                       'backup %s, making a full backup instead') %
+                     parent['id'])
+            backup['parent_id'] = None
+            self.db.backup_update(self.context, backup['id'],
+                                  {'parent_id': None})
+            return None
+        return sha256file['sha256s']
+
     def _prepare_backup(self, backup):
         """Prepare the backup process and return the backup metadata"""
         backup_id = backup['id']
@@ -254,56 +444,137 @@ class SwiftBackupDriver(BackupDriver):
                       'object_prefix': object_prefix,
                       'availability_zone': availability_zone,
                   })
-        object_meta = {'id': 1, 'list': [], 'prefix': object_prefix}
+        parent_sha256s = None
+        if backup.get('parent_id'):
+            parent_sha256s = self._get_parent_sha256s(backup)
+        object_meta = {'id': 1, 'list': [], 'prefix': object_prefix,
+                       'sha256s': [], 'parent_sha256s': parent_sha256s,
+                       'holes': []}
         return object_meta, container
 
-    def _backup_chunk(self, backup, container, data, data_offset, object_meta):
-        """Backup data chunk based on the object metadata and offset"""
-        object_prefix = object_meta['prefix']
-        object_list = object_meta['list']
-        object_id = object_meta['id']
-        object_name = '%s-%05d' % (object_prefix, object_id)
+    def _read_extents(self, volume_file, object_meta):
+        """Read the volume and yield the (offset, data) extents to upload.
+
+        The SHA-256 digest of every backup_swift_block_size block is
+        recorded in object_meta. Runs of blocks that changed since the
+        parent backup, or all blocks for a full backup, are yielded unless
+        they are all zeros, in which case they are recorded as holes in
+        object_meta instead of being uploaded.
+        """
+        sha256s = object_meta['sha256s']
+        parent_sha256s = object_meta['parent_sha256s']
+        holes = object_meta['holes']
+        block_size = self.sha_block_size_bytes
+        offset = volume_file.tell()
+        while True:
+            data = volume_file.read(self.data_block_size_bytes)
+            if data == '':
+                break
+            extent_start = None
+            for pos in xrange(0, len(data), block_size):
+                block = data[pos:pos + block_size]
+                sha256 = hashlib.sha256(block).hexdigest()
+                index = len(sha256s)
+                sha256s.append(sha256)
+                changed = (parent_sha256s is None or
+                           index >= len(parent_sha256s) or
+                           parent_sha256s[index] != sha256)
+                upload = changed and not utils.is_all_zero(block)
+                if changed and not upload:
+                    self._add_hole(holes, offset + pos, len(block))
+                if upload and extent_start is None:
+                    extent_start = pos
+                elif not upload and extent_start is not None:
+                    yield offset + extent_start, data[extent_start:pos]
+                    extent_start = None
+            if extent_start is not None:
+                yield offset + extent_start, data[extent_start:]
+            offset += len(data)
+
+    @staticmethod
+    def _add_hole(holes, offset, length):
+        """Record a run of zeros, merging it with the previous one."""
+        if holes and holes[-1][0] + holes[-1][1] == offset:
+            holes[-1][1] += length
+        else:
+            holes.append([offset, length])
+
+    def _compress_chunk(self, object_name, data, data_offset):
+        """Compress a chunk and describe it for the backup metadata.
+
+        Returns the object metadata entry, the data to upload and its MD5.
+        This is CPU bound and is run in a native thread by pipelined backups,
+        so it must not log: the logging locks are green locks.
+        """
         obj = {}
         obj[object_name] = {}
         obj[object_name]['offset'] = data_offset
         obj[object_name]['length'] = len(data)
-        LOG.debug(_('reading chunk of data from volume'))
-        if self.compressor is not None:
-            algorithm = CONF.backup_compression_algorithm.lower()
-            obj[object_name]['compression'] = algorithm
-            data_size_bytes = len(data)
-            data = self.compressor.compress(data)
-            comp_size_bytes = len(data)
+        compressor = self.compressor
+        if compressor is not None and self.auto_compression:
+            # Already compressed or encrypted data is not worth compressing
+            sample = data[:AUTO_COMPRESSION_SAMPLE_SIZE]
+            threshold = CONF.backup_compression_auto_threshold
+            if len(compressor.compress(sample)) > len(sample) * threshold:
+                compressor = None
+        if compressor is not None:
+            obj[object_name]['compression'] = compressor.name
+            data = compressor.compress(data)
+        else:
+            obj[object_name]['compression'] = 'none'
+
+        md5 = hashlib.md5(data).hexdigest()
+        obj[object_name]['md5'] = md5
+        return obj, data, md5
+
+    def _log_chunk(self, object_name, obj, data):
+        """Log how a chunk prepared by _compress_chunk was compressed."""
+        algorithm = obj[object_name]['compression']
+        if algorithm != 'none':
             LOG.debug(_('compressed %(data_size_bytes)d bytes of data '
                         'to %(comp_size_bytes)d bytes using '
                         '%(algorithm)s') %
                       {
-                          'data_size_bytes': data_size_bytes,
-                          'comp_size_bytes': comp_size_bytes,
+                          'data_size_bytes': obj[object_name]['length'],
+                          'comp_size_bytes': len(data),
                           'algorithm': algorithm,
                       })
+        elif self.compressor is not None:
+            LOG.debug(_('sample of %s does not compress well') %
+                      object_name)
         else:
             LOG.debug(_('not compressing data'))
-            obj[object_name]['compression'] = 'none'
+        LOG.debug(_('backup MD5 for %(object_name)s: %(md5)s') %
+                  {'object_name': object_name,
+                   'md5': obj[object_name]['md5']})
 
+    def _put_chunk(self, conn, container, object_name, data, md5):
+        """Upload a prepared chunk and verify the MD5 returned by Swift."""
         reader = StringIO.StringIO(data)
         LOG.debug(_('About to put_object'))
         try:
-            etag = self.conn.put_object(container, object_name, reader,
-                                        content_length=len(data))
+            etag = conn.put_object(container, object_name, reader,
+                                   content_length=len(data))
         except socket.error as err:
             raise exception.SwiftConnectionFailed(reason=str(err))
         LOG.debug(_('swift MD5 for %(object_name)s: %(etag)s') %
                   {'object_name': object_name, 'etag': etag, })
-        md5 = hashlib.md5(data).hexdigest()
-        obj[object_name]['md5'] = md5
-        LOG.debug(_('backup MD5 for %(object_name)s: %(md5)s') %
-                  {'object_name': object_name, 'md5': md5})
         if etag != md5:
             err = _('error writing object to swift, MD5 of object in '
                     'swift %(etag)s is not the same as MD5 of object sent '
                     'to swift %(md5)s') % {'etag': etag, 'md5': md5}
             raise exception.InvalidBackup(reason=err)
+
+    def _backup_chunk(self, backup, container, data, data_offset, object_meta):
+        """Backup data chunk based on the object metadata and offset"""
+        object_prefix = object_meta['prefix']
+        object_list = object_meta['list']
+        object_id = object_meta['id']
+        object_name = '%s-%05d' % (object_prefix, object_id)
+        LOG.debug(_('reading chunk of data from volume'))
+        obj, data, md5 = self._compress_chunk(object_name, data, data_offset)
+        self._log_chunk(object_name, obj, data)
+        self._put_chunk(self.conn, container, object_name, data, md5)
         object_list.append(obj)
         object_id += 1
         object_meta['list'] = object_list
@@ -311,15 +582,67 @@ class SwiftBackupDriver(BackupDriver):
         LOG.debug(_('Calling eventlet.sleep(0)'))
         eventlet.sleep(0)
 
+    def _backup_pipelined(self, backup, container, volume_file, object_meta):
+        """Backup the volume with concurrent compression and uploads.
+
+        The calling greenthread reads the volume extent by extent and hands
+        each one to a greenthread which compresses and hashes it in a
+        native thread (zlib and bz2 release the GIL) and then uploads it
+        over one of backup_swift_upload_concurrency pooled connections.
+        Reading blocks once backup_swift_max_inflight_chunks chunks are
+        pending, which bounds memory usage. Objects are recorded in the
+        metadata in volume order, whatever order the uploads complete in.
+        """
+        object_prefix = object_meta['prefix']
+        first_object_id = object_meta['id']
+        inflight = eventlet.GreenPool(self.max_inflight_chunks)
+        uploaded = {}
+        failures = []
+
+        def _upload(object_id, data, data_offset):
+            try:
+                object_name = '%s-%05d' % (object_prefix, object_id)
+                obj, data, md5 = tpool.execute(self._compress_chunk,
+                                               object_name, data, data_offset)
+                self._log_chunk(object_name, obj, data)
+                with self.conn_pool.item() as conn:
+                    self._put_chunk(conn, container, object_name, data, md5)
+                uploaded[object_id] = obj
+            except Exception:
+                failures.append(sys.exc_info())
+
+        object_id = first_object_id
+        for data_offset, data in self._read_extents(volume_file, object_meta):
+            if failures:
+                break
+            LOG.debug(_('queueing chunk %d for upload') % object_id)
+            # Blocks while the maximum number of chunks are in flight
+            inflight.spawn_n(_upload, object_id, data, data_offset)
+            object_id += 1
+        inflight.waitall()
+
+        if failures:
+            exc_info = failures[0]
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+        object_meta['list'].extend(uploaded[i] for i in
+                                   xrange(first_object_id, object_id))
+        object_meta['id'] = object_id
+
     def _finalize_backup(self, backup, container, object_meta):
         """Finalize the backup by updating its metadata on Swift"""
         object_list = object_meta['list']
         object_id = object_meta['id']
         try:
+            self._write_sha256file(backup,
+                                   backup['volume_id'],
+                                   container,
+                                   object_meta['sha256s'])
             self._write_metadata(backup,
                                  backup['volume_id'],
                                  container,
-                                 object_list)
+                                 object_list,
+                                 holes=object_meta['holes'])
         except socket.error as err:
             raise exception.SwiftConnectionFailed(reason=str(err))
         self.db.backup_update(self.context, backup['id'],
@@ -329,25 +652,30 @@ class SwiftBackupDriver(BackupDriver):
     def backup(self, backup, volume_file):
         """Backup the given volume to swift using the given backup metadata."""
         object_meta, container = self._prepare_backup(backup)
-        while True:
-            data = volume_file.read(self.data_block_size_bytes)
-            data_offset = volume_file.tell()
-            if data == '':
-                break
-            self._backup_chunk(backup, container, data,
-                               data_offset, object_meta)
+        if self.upload_concurrency > 1:
+            self._backup_pipelined(backup, container, volume_file,
+                                   object_meta)
+        else:
+            for data_offset, data in self._read_extents(volume_file,
+                                                        object_meta):
+                self._backup_chunk(backup, container, data,
+                                   data_offset, object_meta)
         self._finalize_backup(backup, container, object_meta)
 
-    def _restore_v1(self, backup, volume_id, metadata, volume_file):
-        """Restore a v1 swift volume backup from swift."""
+    def _restore_objects(self, backup, volume_id, metadata, volume_file):
+        """Write the objects of a single swift backup to the volume.
+
+        Each object is written at its recorded offset as soon as it is
+        fetched, whatever the order the fetches complete in.
+        """
         backup_id = backup['id']
-        LOG.debug(_('v1 swift volume backup restore of %s started'), backup_id)
         container = backup['container']
         metadata_objects = metadata['objects']
         metadata_object_names = sum((obj.keys() for obj in metadata_objects),
                                     [])
         LOG.debug(_('metadata_object_names = %s') % metadata_object_names)
-        prune_list = [self._metadata_filename(backup)]
+        prune_list = [self._metadata_filename(backup),
+                      self._sha256_filename(backup)]
         swift_object_names = [swift_object_name for swift_object_name in
                               self._generate_object_names(backup)
                               if swift_object_name not in prune_list]
@@ -356,7 +684,16 @@ class SwiftBackupDriver(BackupDriver):
                     'swift does not match object list stored in metadata')
             raise exception.InvalidBackup(reason=err)
 
-        for metadata_object in metadata_objects:
+        unsynced_bytes = [0]
+        failures = []
+
+        def _restore_object(metadata_object):
+            try:
+                _write_object(metadata_object)
+            except Exception:
+                failures.append(sys.exc_info())
+
+        def _write_object(metadata_object):
             object_name = metadata_object.keys()[0]
             LOG.debug(_('restoring object from swift. backup: %(backup_id)s, '
                         'container: %(container)s, swift object name: '
@@ -368,7 +705,8 @@ class SwiftBackupDriver(BackupDriver):
                           'volume_id': volume_id,
                       })
             try:
-                (resp, body) = self.conn.get_object(container, object_name)
+                with self.conn_pool.item() as conn:
+                    (resp, body) = conn.get_object(container, object_name)
             except socket.error as err:
                 raise exception.SwiftConnectionFailed(reason=str(err))
             compression_algorithm = metadata_object[object_name]['compression']
@@ -376,30 +714,94 @@ class SwiftBackupDriver(BackupDriver):
             if decompressor is not None:
                 LOG.debug(_('decompressing data using %s algorithm') %
                           compression_algorithm)
-                decompressed = decompressor.decompress(body)
-                volume_file.write(decompressed)
-            else:
-                volume_file.write(body)
-
-            # force flush every write to avoid long blocking write on close
-            volume_file.flush()
-
-            # Be tolerant to IO implementations that do not support fileno()
-            try:
-                fileno = volume_file.fileno()
-            except IOError:
-                LOG.info("volume_file does not support fileno() so skipping "
-                         "fsync()")
-            else:
-                os.fsync(fileno)
+                body = tpool.execute(decompressor.decompress, body)
+
+            # The seek and the write do not yield, so the writes of other
+            # objects can not come in between
+            volume_file.seek(metadata_object[object_name]['offset'])
+            volume_file.write(body)
+            unsynced_bytes[0] += len(body)
+            if (self.restore_fsync_interval and
+                    unsynced_bytes[0] >= self.restore_fsync_interval):
+                self._sync_volume_file(volume_file)
+                unsynced_bytes[0] = 0
 
             # Restoring a backup to a volume can take some time. Yield so other
             # threads can run, allowing for among other things the service
             # status to be updated
             eventlet.sleep(0)
+
+        # Objects are fetched, decompressed and written up to
+        # restore_concurrency at a time; a slow object does not hold back
+        # the writes of the ones after it.
+        restorer = eventlet.GreenPool(self.restore_concurrency)
+        for metadata_object in metadata_objects:
+            if failures:
+                break
+            # Blocks while the maximum number of objects are in flight
+            restorer.spawn_n(_restore_object, metadata_object)
+        restorer.waitall()
+
+        if failures:
+            exc_info = failures[0]
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+        # Runs of zeros were not uploaded; only zero the parts of them that
+        # do not already read back as zeros so the volume stays thin.
+        for hole_offset, hole_length in metadata.get('holes', []):
+            volume_file.seek(hole_offset)
+            self._write_zeros(volume_file, hole_length)
+            eventlet.sleep(0)
+
+    def _sync_volume_file(self, volume_file):
+        # force flush the writes to avoid long blocking write on close
+        volume_file.flush()
+
+        # Be tolerant to IO implementations that do not support fileno()
+        try:
+            fileno = volume_file.fileno()
+        except IOError:
+            LOG.info("volume_file does not support fileno() so skipping "
+                     "fsync()")
+        else:
+            os.fsync(fileno)
+
+    def _restore_v1(self, backup, volume_id, metadata, volume_file):
+        """Restore a v1 swift volume backup from swift."""
+        backup_id = backup['id']
+        LOG.debug(_('v1 swift volume backup restore of %s started'), backup_id)
+        self._restore_objects(backup, volume_id, metadata, volume_file)
         LOG.debug(_('v1 swift volume backup restore of %s finished'),
                   backup_id)
 
+    def _restore_v2(self, backup, volume_id, metadata, volume_file):
+        """Restore a v1.1 swift volume backup, which may be incremental.
+
+        The chain of backups is walked from this backup through its parents
+        to the full backup it is based on. The full backup is then restored
+        and each incremental backup applied on top of it in turn, so that
+        the newest copy of every block is what ends up on the volume.
+        """
+        backup_id = backup['id']
+        LOG.debug(_('v1.1 swift volume backup restore of %s started'),
+                  backup_id)
+        chain = [(backup, metadata)]
+        while metadata.get('parent_id'):
+            parent = self.db.backup_get(self.context, metadata['parent_id'])
+            try:
+                metadata = self._read_metadata(parent)
+            except socket.error as err:
+                raise exception.SwiftConnectionFailed(reason=str(err))
+            chain.append((parent, metadata))
+        LOG.debug(_('restoring backup %(backup_id)s from a chain of '
+                    '%(count)d backups') %
+                  {'backup_id': backup_id, 'count': len(chain)})
+        for chain_backup, chain_metadata in reversed(chain):
+            self._restore_objects(chain_backup, volume_id, chain_metadata,
+                                  volume_file)
+        LOG.debug(_('v1.1 swift volume backup restore of %s finished'),
+                  backup_id)
+
     def restore(self, backup, volume_id, volume_file):
         """Restore the given volume backup from swift."""
         backup_id = backup['id']
@@ -428,6 +830,7 @@ class SwiftBackupDriver(BackupDriver):
                    % metadata_version)
             raise exception.InvalidBackup(reason=err)
         restore_func(backup, volume_id, metadata, volume_file)
+        self._sync_volume_file(volume_file)
         LOG.debug(_('restore %(backup_id)s to %(volume_id)s finished.') %
                   {'backup_id': backup_id, 'volume_id': volume_id})
 
@@ -49,11 +49,11 @@ CONF.register_opts(connector_opts)
 synchronized = lockutils.synchronized_with_prefix('brick-')
 
 
-def get_connector_properties(root_helper):
+def get_connector_properties(root_helper, execute=putils.execute):
     """Get the connection properties for all protocols."""
 
-    iscsi = ISCSIConnector(root_helper=root_helper)
-    fc = linuxfc.LinuxFibreChannel(root_helper=root_helper)
+    iscsi = ISCSIConnector(root_helper=root_helper, execute=execute)
+    fc = linuxfc.LinuxFibreChannel(root_helper=root_helper, execute=execute)
 
     props = {}
     props['ip'] = CONF.my_ip
@@ -118,6 +118,16 @@ global_opts = [
                help='http/https timeout value for glance operations. If no '
                     'value (None) is supplied here, the glanceclient default '
                     'value is used.'),
+    cfg.IntOpt('glance_download_concurrency',
+               default=1,
+               help='Number of byte ranges of an image downloaded in '
+                    'parallel, over separate connections, when glance '
+                    'supports range requests. 1 downloads images as a '
+                    'single stream'),
+    cfg.IntOpt('glance_download_range_size_mb',
+               default=64,
+               help='Size in MB of the byte ranges of parallel image '
+                    'downloads'),
     cfg.StrOpt('scheduler_topic',
                default='cinder-scheduler',
                help='the topic scheduler nodes listen on'),
@@ -178,6 +188,11 @@ global_opts = [
                default=None,
                help='Path to the rootwrap configuration file to use for '
                     'running commands as root'),
+    cfg.BoolOpt('use_rootwrap_daemon',
+                default=False,
+                help='Run commands as root through a long-lived '
+                     'cinder-rootwrap-daemon instead of starting '
+                     'cinder-rootwrap for every command'),
     cfg.BoolOpt('monkey_patch',
                 default=False,
                 help='Whether to log monkey patching'),
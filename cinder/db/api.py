@@ -213,9 +213,11 @@ def volume_get(context, volume_id):
     return IMPL.volume_get(context, volume_id)
 
 
-def volume_get_all(context, marker, limit, sort_key, sort_dir):
-    """Get all volumes."""
-    return IMPL.volume_get_all(context, marker, limit, sort_key, sort_dir)
+def volume_get_all(context, marker, limit, sort_key, sort_dir, filters=None,
+                   offset=None):
+    """Get all volumes, optionally only those matching filters."""
+    return IMPL.volume_get_all(context, marker, limit, sort_key, sort_dir,
+                               filters=filters, offset=offset)
 
 
 def volume_get_all_by_host(context, host):
@@ -229,10 +231,11 @@ def volume_get_all_by_instance_uuid(context, instance_uuid):
 
 
 def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
-                              sort_dir):
-    """Get all volumes belonging to a project."""
+                              sort_dir, filters=None, offset=None):
+    """Get all volumes belonging to a project, optionally filtered."""
     return IMPL.volume_get_all_by_project(context, project_id, marker, limit,
-                                          sort_key, sort_dir)
+                                          sort_key, sort_dir, filters=filters,
+                                          offset=offset)
 
 
 def volume_get_iscsi_target_num(context, volume_id):
@@ -267,14 +270,23 @@ def snapshot_get(context, snapshot_id):
     return IMPL.snapshot_get(context, snapshot_id)
 
 
-def snapshot_get_all(context):
-    """Get all snapshots."""
-    return IMPL.snapshot_get_all(context)
+def snapshot_get_all(context, filters=None, marker=None, limit=None,
+                     sort_key='created_at', sort_dir='desc', offset=None):
+    """Get all snapshots, optionally only those matching filters."""
+    return IMPL.snapshot_get_all(context, filters=filters, marker=marker,
+                                 limit=limit, sort_key=sort_key,
+                                 sort_dir=sort_dir, offset=offset)
 
 
-def snapshot_get_all_by_project(context, project_id):
-    """Get all snapshots belonging to a project."""
-    return IMPL.snapshot_get_all_by_project(context, project_id)
+def snapshot_get_all_by_project(context, project_id, filters=None,
+                                marker=None, limit=None,
+                                sort_key='created_at', sort_dir='desc',
+                                offset=None):
+    """Get all snapshots belonging to a project, optionally filtered."""
+    return IMPL.snapshot_get_all_by_project(context, project_id,
+                                            filters=filters, marker=marker,
+                                            limit=limit, sort_key=sort_key,
+                                            sort_dir=sort_dir, offset=offset)
 
 
 def snapshot_get_all_for_volume(context, volume_id):
@@ -549,6 +561,11 @@ def volume_glance_metadata_get(context, volume_id):
     return IMPL.volume_glance_metadata_get(context, volume_id)
 
 
+def volume_glance_metadata_list_get(context, volume_id_list):
+    """Return the glance metadata for a list of volumes."""
+    return IMPL.volume_glance_metadata_list_get(context, volume_id_list)
+
+
 def volume_snapshot_glance_metadata_get(context, snapshot_id):
     """Return the Glance metadata for the specified snapshot."""
     return IMPL.volume_snapshot_glance_metadata_get(context, snapshot_id)
@@ -736,9 +753,13 @@ def quota_destroy_all_by_project(context, project_id):
     return IMPL.quota_destroy_all_by_project(context, project_id)
 
 
-def reservation_expire(context):
-    """Roll back any expired reservations."""
-    return IMPL.reservation_expire(context)
+def reservation_expire(context, batch_size=1000, max_reservations=None):
+    """Roll back expired reservations, in batches of batch_size.
+
+    At most max_reservations are rolled back, if given.
+    """
+    return IMPL.reservation_expire(context, batch_size=batch_size,
+                                   max_reservations=max_reservations)
 
 
 ###################
@@ -759,6 +780,11 @@ def backup_get_all_by_host(context, host):
     return IMPL.backup_get_all_by_host(context, host)
 
 
+def backup_get_all_by_parent(context, parent_id):
+    """Get all incremental backups based on the given backup."""
+    return IMPL.backup_get_all_by_parent(context, parent_id)
+
+
 def backup_create(context, values):
     """Create a backup from the values dictionary."""
     return IMPL.backup_create(context, values)
@@ -814,3 +840,34 @@ def transfer_destroy(context, transfer_id):
 def transfer_accept(context, transfer_id, user_id, project_id):
     """Accept a volume transfer."""
     return IMPL.transfer_accept(context, transfer_id, user_id, project_id)
+
+
+###################
+
+
+def image_volume_cache_create(context, host, image_id, image_updated_at,
+                              volume_id, size):
+    """Create an image volume cache entry."""
+    return IMPL.image_volume_cache_create(context, host, image_id,
+                                          image_updated_at, volume_id, size)
+
+
+def image_volume_cache_delete(context, entry_id):
+    """Delete an image volume cache entry."""
+    return IMPL.image_volume_cache_delete(context, entry_id)
+
+
+def image_volume_cache_get_and_update_last_used(context, image_id, host):
+    """Get the cache entry of an image on a host and mark it as used."""
+    return IMPL.image_volume_cache_get_and_update_last_used(context,
+                                                            image_id, host)
+
+
+def image_volume_cache_get_by_volume_id(context, volume_id):
+    """Get the cache entry held by a volume, if any."""
+    return IMPL.image_volume_cache_get_by_volume_id(context, volume_id)
+
+
+def image_volume_cache_get_all_for_host(context, host):
+    """Get the cache entries of a host, least recently used first."""
+    return IMPL.image_volume_cache_get_all_for_host(context, host)
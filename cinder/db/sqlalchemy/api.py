@@ -20,15 +20,19 @@
 """Implementation of SQLAlchemy backend."""
 
 
+import functools
 import sys
+import time
 import uuid
 import warnings
 
+from eventlet import greenthread
 from oslo.config import cfg
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy import or_
+from sqlalchemy import types as sqltypes
 from sqlalchemy.orm import joinedload, joinedload_all
-from sqlalchemy.sql.expression import literal_column
+from sqlalchemy.sql.expression import literal_column, not_
 from sqlalchemy.sql import func
 
 from cinder.common import sqlalchemyutils
@@ -38,6 +42,7 @@ from cinder import exception
 from cinder.openstack.common.db import exception as db_exc
 from cinder.openstack.common.db.sqlalchemy import session as db_session
 from cinder.openstack.common import log as logging
+from cinder.openstack.common import strutils
 from cinder.openstack.common import timeutils
 from cinder.openstack.common import uuidutils
 
@@ -53,6 +58,9 @@ get_session = db_session.get_session
 
 _DEFAULT_QUOTA_NAME = 'default'
 
+_DEADLOCK_RETRIES = 5
+_DEADLOCK_RETRY_INTERVAL = 0.1
+
 
 def get_backend():
     """The backend is this module itself."""
@@ -121,6 +129,25 @@ def require_admin_context(f):
     return wrapper
 
 
+def _retry_on_deadlock(f):
+    """Decorator to retry a DB API call a few times on a deadlock."""
+
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        attempt = 1
+        while True:
+            try:
+                return f(*args, **kwargs)
+            except db_exc.DBDeadlock:
+                if attempt >= _DEADLOCK_RETRIES:
+                    raise
+                LOG.warn(_("Deadlock detected when running %(func)s, "
+                           "retrying it") % {'func': f.__name__})
+                time.sleep(_DEADLOCK_RETRY_INTERVAL * attempt)
+                attempt += 1
+    return wrapper
+
+
 def require_context(f):
     """Decorator to require *any* user or admin context.
 
@@ -744,40 +771,88 @@ def reservation_destroy(context, uuid):
 
 
 # NOTE(johannes): The quota code uses SQL locking to ensure races don't
-# cause under or over counting of resources. To avoid deadlocks, this
-# code always acquires the lock on quota_usages before acquiring the lock
-# on reservations.
+# cause under or over counting of resources.
+#
+# Reserving locks the usages of the reserved resources only, always in the
+# same order, so that reservations of other resources of the project do
+# not wait for it.  Committing or rolling back a reservation locks nothing
+# ahead: it deletes the reservation and applies its delta to its usage with
+# conditional UPDATEs.  The calls are retried on deadlocks.
 
-def _get_quota_usages(context, session, project_id):
+def _get_quota_usages(context, session, project_id, resources=None):
     # Broken out for testability
-    rows = model_query(context, models.QuotaUsage,
-                       read_deleted="no",
-                       session=session).\
-        filter_by(project_id=project_id).\
+    query = model_query(context, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+        filter_by(project_id=project_id)
+    if resources is not None:
+        query = query.filter(models.QuotaUsage.resource.in_(resources))
+    rows = query.order_by(models.QuotaUsage.resource).\
         with_lockmode('update').\
         all()
     return dict((row.resource, row) for row in rows)
 
 
-@require_context
+def _sync_quota_usages(context, session, project_id, resource):
+    sync = QUOTA_SYNC_FUNCTIONS[resource.sync]
+    return sync(context, project_id,
+                volume_type_id=getattr(resource, 'volume_type_id', None),
+                volume_type_name=getattr(resource, 'volume_type_name', None),
+                session=session)
+
+
+def _quota_usage_refresh(context, project_id, resources, until_refresh):
+    """Recount the usage of resources, out of the reservation path.
+
+    The usages are locked before they are counted, so that no reservation
+    is committed between the count and the update of a usage.  Only the
+    usages of resources are updated, even when their sync routine counts
+    other ones too.
+    """
+    try:
+        session = get_session()
+        with session.begin():
+            usages = _get_quota_usages(context, session, project_id,
+                                       [resource.name
+                                        for resource in resources])
+            updates = {}
+            for resource in resources:
+                if resource.name not in updates:
+                    updates.update(_sync_quota_usages(context, session,
+                                                      project_id, resource))
+            for res, usage in usages.items():
+                if res in updates:
+                    usage.in_use = updates[res]
+                    usage.until_refresh = until_refresh or None
+                    usage.save(session=session)
+    except Exception:
+        LOG.exception(_("Failed to refresh the quota usages of project %s") %
+                      project_id)
+
+
+@require_context
+@_retry_on_deadlock
 def quota_reserve(context, resources, quotas, deltas, expire,
                   until_refresh, max_age, project_id=None):
     elevated = context.elevated()
     session = get_session()
+    refresh = []
     with session.begin():
         if project_id is None:
             project_id = context.project_id
 
         # Get the current usages
-        usages = _get_quota_usages(context, session, project_id)
+        usages = _get_quota_usages(context, session, project_id,
+                                   deltas.keys())
 
         # Handle usage refresh
         work = set(deltas.keys())
         while work:
             resource = work.pop()
 
-            # Do we need to refresh the usage?
-            refresh = False
+            # A new usage, or a negative in_use count, which indicates a
+            # desync, has to be counted before it is checked
+            recount = False
             if resource not in usages:
                 usages[resource] = _quota_usage_create(elevated,
                                                        project_id,
@@ -785,33 +860,16 @@ def quota_reserve(context, resources, quotas, deltas, expire,
                                                        0, 0,
                                                        until_refresh or None,
                                                        session=session)
-                refresh = True
+                recount = True
             elif usages[resource].in_use < 0:
-                # Negative in_use count indicates a desync, so try to
-                # heal from that...
-                refresh = True
-            elif usages[resource].until_refresh is not None:
-                usages[resource].until_refresh -= 1
-                if usages[resource].until_refresh <= 0:
-                    refresh = True
-            elif max_age and usages[resource].updated_at is not None and (
-                (usages[resource].updated_at -
-                    timeutils.utcnow()).seconds >= max_age):
-                refresh = True
-
-            # OK, refresh the usage
-            if refresh:
-                # Grab the sync routine
-                sync = QUOTA_SYNC_FUNCTIONS[resources[resource].sync]
-                volume_type_id = getattr(resources[resource],
-                                         'volume_type_id', None)
-                volume_type_name = getattr(resources[resource],
-                                           'volume_type_name', None)
-                updates = sync(elevated, project_id,
-                               volume_type_id=volume_type_id,
-                               volume_type_name=volume_type_name,
-                               session=session)
+                recount = True
+            if recount:
+                updates = _sync_quota_usages(elevated, session, project_id,
+                                             resources[resource])
                 for res, in_use in updates.items():
+                    if res not in usages and res not in deltas:
+                        # Its usage is not locked by this reservation
+                        continue
                     # Make sure we have a destination for the usage!
                     if res not in usages:
                         usages[res] = _quota_usage_create(
@@ -822,22 +880,21 @@ def quota_reserve(context, resources, quotas, deltas, expire,
                             until_refresh or None,
                             session=session
                         )
-
-                    # Update the usage
                     usages[res].in_use = in_use
                     usages[res].until_refresh = until_refresh or None
-
-                    # Because more than one resource may be refreshed
-                    # by the call to the sync routine, and we don't
-                    # want to double-sync, we make sure all refreshed
-                    # resources are dropped from the work set.
                     work.discard(res)
+                continue
 
-                    # NOTE(Vek): We make the assumption that the sync
-                    #            routine actually refreshes the
-                    #            resources that it is the sync routine
-                    #            for.  We don't check, because this is
-                    #            a best-effort mechanism.
+            # Do we need to refresh the usage?  Counting the resources
+            # takes a while, so it is done once the reservation is made
+            if usages[resource].until_refresh is not None:
+                usages[resource].until_refresh -= 1
+                if usages[resource].until_refresh <= 0:
+                    refresh.append(resources[resource])
+            elif max_age and usages[resource].updated_at is not None and (
+                (usages[resource].updated_at -
+                    timeutils.utcnow()).seconds >= max_age):
+                refresh.append(resources[resource])
 
         # Check for deltas that would go negative
         unders = [r for r, delta in deltas.items()
@@ -890,6 +947,10 @@ def quota_reserve(context, resources, quotas, deltas, expire,
         for usage_ref in usages.values():
             usage_ref.save(session=session)
 
+    if refresh:
+        greenthread.spawn_n(_quota_usage_refresh, elevated, project_id,
+                            refresh, until_refresh)
+
     if unders:
         LOG.warning(_("Change will make usage less than 0 for the following "
                       "resources: %s") % unders)
@@ -910,43 +971,54 @@ def _quota_reservations(session, context, reservations):
                        read_deleted="no",
                        session=session).\
         filter(models.Reservation.uuid.in_(reservations)).\
-        with_lockmode('update').\
         all()
 
 
-@require_context
+def _reservation_apply(context, session, reservation, commit):
+    """Delete a reservation and release it from its usage.
+
+    The delta of a committed reservation is added to the usage.  Nothing
+    happens if the reservation was deleted concurrently, e.g. when it
+    expired.
+    """
+    now = timeutils.utcnow()
+    deleted = session.query(models.Reservation).\
+        filter_by(id=reservation.id, deleted=False).\
+        update({'deleted': True,
+                'deleted_at': now,
+                'updated_at': literal_column('updated_at')},
+               synchronize_session=False)
+    if not deleted:
+        return
+
+    values = {}
+    if reservation.delta >= 0:
+        values['reserved'] = models.QuotaUsage.reserved - reservation.delta
+    if commit:
+        values['in_use'] = models.QuotaUsage.in_use + reservation.delta
+    if values:
+        values['updated_at'] = now
+        session.query(models.QuotaUsage).\
+            filter_by(id=reservation.usage_id).\
+            update(values, synchronize_session=False)
+
+
+@require_context
+@_retry_on_deadlock
 def reservation_commit(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
-        usages = _get_quota_usages(context, session, project_id)
-
         for reservation in _quota_reservations(session, context, reservations):
-            usage = usages[reservation.resource]
-            if reservation.delta >= 0:
-                usage.reserved -= reservation.delta
-            usage.in_use += reservation.delta
-
-            reservation.delete(session=session)
-
-        for usage in usages.values():
-            usage.save(session=session)
+            _reservation_apply(context, session, reservation, True)
 
 
 @require_context
+@_retry_on_deadlock
 def reservation_rollback(context, reservations, project_id=None):
     session = get_session()
     with session.begin():
-        usages = _get_quota_usages(context, session, project_id)
-
         for reservation in _quota_reservations(session, context, reservations):
-            usage = usages[reservation.resource]
-            if reservation.delta >= 0:
-                usage.reserved -= reservation.delta
-
-            reservation.delete(session=session)
-
-        for usage in usages.values():
-            usage.save(session=session)
+            _reservation_apply(context, session, reservation, False)
 
 
 @require_admin_context
@@ -978,23 +1050,69 @@ def quota_destroy_all_by_project(context, project_id):
             reservation_ref.delete(session=session)
 
 
-@require_admin_context
-def reservation_expire(context):
+def _reservation_expire_batch(context, now, batch_size):
+    """Roll back up to batch_size expired reservations.
+
+    Returns the number of reservations rolled back.
+    """
     session = get_session()
     with session.begin():
-        current_time = timeutils.utcnow()
-        results = model_query(context, models.Reservation, session=session,
-                              read_deleted="no").\
-            filter(models.Reservation.expire < current_time).\
+        rows = model_query(context, models.Reservation.id,
+                           models.Reservation.usage_id,
+                           models.Reservation.delta,
+                           session=session, read_deleted="no").\
+            filter(models.Reservation.expire < now).\
+            order_by(models.Reservation.id).\
+            limit(batch_size).\
+            with_lockmode('update').\
             all()
+        if not rows:
+            return 0
 
-        if results:
-            for reservation in results:
-                if reservation.delta >= 0:
-                    reservation.usage.reserved -= reservation.delta
-                    reservation.usage.save(session=session)
-
-                reservation.delete(session=session)
+        session.query(models.Reservation).\
+            filter(models.Reservation.id.in_([row.id for row in rows])).\
+            update({'deleted': True,
+                    'deleted_at': now,
+                    'updated_at': literal_column('updated_at')},
+                   synchronize_session=False)
+
+        # Release what the reservations held, once per usage
+        reserved = {}
+        for row in rows:
+            if row.delta >= 0:
+                reserved[row.usage_id] = (reserved.get(row.usage_id, 0) +
+                                          row.delta)
+        for usage_id in sorted(reserved):
+            session.query(models.QuotaUsage).\
+                filter_by(id=usage_id).\
+                update({'reserved': (models.QuotaUsage.reserved -
+                                     reserved[usage_id]),
+                        'updated_at': now},
+                       synchronize_session=False)
+    return len(rows)
+
+
+@require_admin_context
+def reservation_expire(context, batch_size=1000, max_reservations=None):
+    """Roll back the expired reservations, batch_size ones at a time.
+
+    Each batch is its own short transaction.  At most max_reservations are
+    rolled back by a call, the next call carries on.
+    """
+    now = timeutils.utcnow()
+    expire_batch = _retry_on_deadlock(_reservation_expire_batch)
+    expired = 0
+    while not max_reservations or expired < max_reservations:
+        limit = batch_size
+        if max_reservations:
+            limit = min(limit, max_reservations - expired)
+        count = expire_batch(context, now, limit)
+        expired += count
+        if count < limit:
+            break
+    if expired:
+        LOG.info(_("Expired %d quota reservations") % expired)
+    return expired
 
 
 ###################
@@ -1179,6 +1297,68 @@ def _volume_get_query(context, session=None, project_only=False):
             options(joinedload('volume_type'))
 
 
+def _coerce_filter_value(column, value):
+    """Convert a filter value given as a string to the type of column.
+
+    Raises ValueError when the value can not be one of the column.
+    """
+    if not isinstance(value, basestring):
+        return value
+    if isinstance(column.type, sqltypes.Boolean):
+        return strutils.bool_from_string(value, strict=True)
+    if isinstance(column.type, sqltypes.Integer):
+        return int(value)
+    return value
+
+
+def _process_model_filters(query, model, filters):
+    """Apply exact match filters on the columns of model to query.
+
+    Values given as strings, e.g. from a query string, are converted to the
+    type of Boolean and Integer columns.  Returns None when a filter names
+    something that is not a column of model, or a value that is not one of
+    the column, as no row can match it.
+    """
+    columns = model.__table__.columns
+    coerced = {}
+    for key, value in filters.iteritems():
+        if key not in columns:
+            return None
+        try:
+            if isinstance(value, (list, tuple, set, frozenset)):
+                coerced[key] = [_coerce_filter_value(columns[key], item)
+                                for item in value]
+            else:
+                coerced[key] = _coerce_filter_value(columns[key], value)
+        except ValueError:
+            return None
+    return exact_filter(query, model, coerced, coerced.keys())
+
+
+def _process_volume_filters(query, filters):
+    """Compile the volume list search options into query.
+
+    Besides exact matches on volume columns this understands 'metadata',
+    a dict every item of which must be present in the volume metadata, and
+    'no_migration_targets', which hides the temporary destination volumes
+    of a migration.  Returns None when no volume can match.
+    """
+    filters = filters.copy()
+
+    if filters.pop('no_migration_targets', False):
+        status = models.Volume.migration_status
+        query = query.filter(or_(status == None,
+                                 not_(status.like('target:%'))))
+
+    metadata = filters.pop('metadata', None)
+    if metadata:
+        for key, value in metadata.iteritems():
+            query = query.filter(
+                models.Volume.volume_metadata.any(key=key, value=value))
+
+    return _process_model_filters(query, models.Volume, filters)
+
+
 @require_context
 def _volume_get(context, volume_id, session=None):
     result = _volume_get_query(context, session=session, project_only=True).\
@@ -1197,10 +1377,15 @@ def volume_get(context, volume_id):
 
 
 @require_admin_context
-def volume_get_all(context, marker, limit, sort_key, sort_dir):
+def volume_get_all(context, marker, limit, sort_key, sort_dir, filters=None,
+                   offset=None):
     session = get_session()
     with session.begin():
         query = _volume_get_query(context, session=session)
+        if filters:
+            query = _process_volume_filters(query, filters)
+            if query is None:
+                return []
 
         marker_volume = None
         if marker is not None:
@@ -1210,6 +1395,8 @@ def volume_get_all(context, marker, limit, sort_key, sort_dir):
                                                [sort_key, 'created_at', 'id'],
                                                marker=marker_volume,
                                                sort_dir=sort_dir)
+        if offset:
+            query = query.offset(offset)
 
         return query.all()
 
@@ -1236,12 +1423,16 @@ def volume_get_all_by_instance_uuid(context, instance_uuid):
 
 @require_context
 def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
-                              sort_dir):
+                              sort_dir, filters=None, offset=None):
     session = get_session()
     with session.begin():
         authorize_project_context(context, project_id)
         query = _volume_get_query(context, session).\
             filter_by(project_id=project_id)
+        if filters:
+            query = _process_volume_filters(query, filters)
+            if query is None:
+                return []
 
         marker_volume = None
         if marker is not None:
@@ -1251,6 +1442,8 @@ def volume_get_all_by_project(context, project_id, marker, limit, sort_key,
                                                [sort_key, 'created_at', 'id'],
                                                marker=marker_volume,
                                                sort_dir=sort_dir)
+        if offset:
+            query = query.offset(offset)
 
         return query.all()
 
@@ -1527,11 +1720,35 @@ def snapshot_get(context, snapshot_id):
     return _snapshot_get(context, snapshot_id)
 
 
+def _snapshot_paginate(context, session, query, marker, limit, sort_key,
+                       sort_dir, offset):
+    """Sort query and restrict it to the page after marker."""
+    marker_snapshot = None
+    if marker is not None:
+        marker_snapshot = _snapshot_get(context, marker, session=session)
+    query = sqlalchemyutils.paginate_query(query, models.Snapshot, limit,
+                                           [sort_key, 'created_at', 'id'],
+                                           marker=marker_snapshot,
+                                           sort_dir=sort_dir)
+    if offset:
+        query = query.offset(offset)
+    return query
+
+
 @require_admin_context
-def snapshot_get_all(context):
-    return model_query(context, models.Snapshot).\
-        options(joinedload('snapshot_metadata')).\
-        all()
+def snapshot_get_all(context, filters=None, marker=None, limit=None,
+                     sort_key='created_at', sort_dir='desc', offset=None):
+    session = get_session()
+    with session.begin():
+        query = model_query(context, models.Snapshot, session=session).\
+            options(joinedload('snapshot_metadata'))
+        if filters:
+            query = _process_model_filters(query, models.Snapshot, filters)
+            if query is None:
+                return []
+        query = _snapshot_paginate(context, session, query, marker, limit,
+                                   sort_key, sort_dir, offset)
+        return query.all()
 
 
 @require_context
@@ -1544,12 +1761,23 @@ def snapshot_get_all_for_volume(context, volume_id):
 
 
 @require_context
-def snapshot_get_all_by_project(context, project_id):
+def snapshot_get_all_by_project(context, project_id, filters=None,
+                                marker=None, limit=None,
+                                sort_key='created_at', sort_dir='desc',
+                                offset=None):
     authorize_project_context(context, project_id)
-    return model_query(context, models.Snapshot).\
-        filter_by(project_id=project_id).\
-        options(joinedload('snapshot_metadata')).\
-        all()
+    session = get_session()
+    with session.begin():
+        query = model_query(context, models.Snapshot, session=session).\
+            filter_by(project_id=project_id).\
+            options(joinedload('snapshot_metadata'))
+        if filters:
+            query = _process_model_filters(query, models.Snapshot, filters)
+            if query is None:
+                return []
+        query = _snapshot_paginate(context, session, query, marker, limit,
+                                   sort_key, sort_dir, offset)
+        return query.all()
 
 
 @require_context
@@ -2344,6 +2572,21 @@ def volume_glance_metadata_get(context, volume_id):
     return _volume_glance_metadata_get(context, volume_id)
 
 
+@require_context
+def volume_glance_metadata_list_get(context, volume_id_list):
+    """Return the Glance metadata for all the specified volumes.
+
+    Uses a single query; volumes without Glance metadata are simply
+    absent from the result.
+    """
+    if not volume_id_list:
+        return []
+    return model_query(context, models.VolumeGlanceMetadata).\
+        filter(models.VolumeGlanceMetadata.volume_id.in_(volume_id_list)).\
+        filter_by(deleted=False).\
+        all()
+
+
 @require_context
 @require_snapshot_exists
 def _volume_snapshot_glance_metadata_get(context, snapshot_id, session=None):
@@ -2516,6 +2759,12 @@ def backup_get_all_by_project(context, project_id):
         filter_by(project_id=project_id).all()
 
 
+@require_context
+def backup_get_all_by_parent(context, parent_id):
+    return model_query(context, models.Backup).\
+        filter_by(parent_id=parent_id).all()
+
+
 @require_context
 def backup_create(context, values):
     backup = models.Backup()
@@ -2688,3 +2937,60 @@ def transfer_accept(context, transfer_id, user_id, project_id):
             update({'deleted': True,
                     'deleted_at': timeutils.utcnow(),
                     'updated_at': literal_column('updated_at')})
+
+
+###############################
+
+
+@require_admin_context
+def image_volume_cache_create(context, host, image_id, image_updated_at,
+                              volume_id, size):
+    entry = models.ImageVolumeCacheEntry()
+    entry.host = host
+    entry.image_id = image_id
+    entry.image_updated_at = image_updated_at
+    entry.volume_id = volume_id
+    entry.size = size
+    entry.last_used = timeutils.utcnow()
+    entry.save()
+    return entry
+
+
+@require_admin_context
+def image_volume_cache_delete(context, entry_id):
+    model_query(context, models.ImageVolumeCacheEntry).\
+        filter_by(id=entry_id).\
+        update({'deleted': True,
+                'deleted_at': timeutils.utcnow(),
+                'updated_at': literal_column('updated_at')})
+
+
+@require_admin_context
+def image_volume_cache_get_and_update_last_used(context, image_id, host):
+    session = get_session()
+    with session.begin():
+        entry = model_query(context, models.ImageVolumeCacheEntry,
+                            session=session).\
+            filter_by(image_id=image_id).\
+            filter_by(host=host).\
+            order_by(models.ImageVolumeCacheEntry.last_used.desc()).\
+            first()
+        if entry:
+            entry.last_used = timeutils.utcnow()
+            entry.save(session=session)
+    return entry
+
+
+@require_admin_context
+def image_volume_cache_get_by_volume_id(context, volume_id):
+    return model_query(context, models.ImageVolumeCacheEntry).\
+        filter_by(volume_id=volume_id).\
+        first()
+
+
+@require_admin_context
+def image_volume_cache_get_all_for_host(context, host):
+    return model_query(context, models.ImageVolumeCacheEntry).\
+        filter_by(host=host).\
+        order_by(models.ImageVolumeCacheEntry.last_used.asc()).\
+        all()
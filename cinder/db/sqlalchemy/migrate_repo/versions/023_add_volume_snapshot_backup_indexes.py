@@ -0,0 +1,78 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+from cinder.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+# (table, index name, columns, leading column is a foreign key)
+INDEXES = [
+    # volume_get_all_by_project pagination, quota usage sync
+    ('volumes', 'volumes_project_id_deleted_created_at_idx',
+     ('project_id', 'deleted', 'created_at'), False),
+    # volume_get_all_by_host
+    ('volumes', 'volumes_host_deleted_idx', ('host', 'deleted'), False),
+    # volume_get_all_by_instance_uuid
+    ('volumes', 'volumes_instance_uuid_deleted_idx',
+     ('instance_uuid', 'deleted'), False),
+    ('snapshots', 'snapshots_project_id_deleted_idx',
+     ('project_id', 'deleted'), False),
+    ('snapshots', 'snapshots_volume_id_deleted_idx',
+     ('volume_id', 'deleted'), True),
+    ('backups', 'backups_project_id_deleted_idx',
+     ('project_id', 'deleted'), False),
+    ('backups', 'backups_host_deleted_idx', ('host', 'deleted'), False),
+    ('volume_metadata', 'volume_metadata_volume_id_deleted_idx',
+     ('volume_id', 'deleted'), True),
+    ('volume_glance_metadata', 'volume_glance_metadata_volume_id_deleted_idx',
+     ('volume_id', 'deleted'), True),
+    ('volume_glance_metadata',
+     'volume_glance_metadata_snapshot_id_deleted_idx',
+     ('snapshot_id', 'deleted'), True),
+]
+
+
+def _indexes(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    tables = {}
+    for table_name, name, columns, foreign_key in INDEXES:
+        # NOTE: InnoDB indexes foreign keys already, and would not let the
+        # index be dropped again once it took over the foreign key
+        if foreign_key and migrate_engine.name == 'mysql':
+            continue
+        if table_name not in tables:
+            tables[table_name] = Table(table_name, meta, autoload=True)
+        table = tables[table_name]
+        yield Index(name, *[table.c[column] for column in columns])
+
+
+def upgrade(migrate_engine):
+    for index in _indexes(migrate_engine):
+        try:
+            index.create(migrate_engine)
+        except Exception:
+            LOG.error(_("Index %s not created!"), index.name)
+            raise
+
+
+def downgrade(migrate_engine):
+    for index in _indexes(migrate_engine):
+        try:
+            index.drop(migrate_engine)
+        except Exception:
+            LOG.error(_("Index %s not dropped!"), index.name)
+            raise
@@ -436,6 +436,7 @@ class Backup(BASE, CinderBase):
     service = Column(String(255))
     size = Column(Integer)
     object_count = Column(Integer)
+    parent_id = Column(String(36))
 
 
 class Encryption(BASE, CinderBase):
@@ -479,6 +480,18 @@ class Transfer(BASE, CinderBase):
                           'Transfer.deleted == False)')
 
 
+class ImageVolumeCacheEntry(BASE, CinderBase):
+    """Represents a volume holding a cached image on a volume backend."""
+    __tablename__ = 'image_volume_cache_entries'
+    id = Column(Integer, primary_key=True)
+    host = Column(String(255), nullable=False)
+    image_id = Column(String(36), nullable=False)
+    image_updated_at = Column(DateTime)
+    volume_id = Column(String(36), nullable=False)
+    size = Column(Integer, nullable=False)
+    last_used = Column(DateTime, nullable=False)
+
+
 def register_models():
     """Register Models and create metadata.
 
@@ -497,6 +510,7 @@ def register_models():
               VolumeTypeExtraSpecs,
               VolumeTypes,
               VolumeGlanceMetadata,
+              ImageVolumeCacheEntry,
               )
     engine = create_engine(CONF.database.connection, echo=False)
     for model in models:
@@ -22,12 +22,15 @@
 from __future__ import absolute_import
 
 import copy
+import hashlib
 import itertools
 import random
 import sys
 import time
+import urllib
 import urlparse
 
+import eventlet
 import glanceclient
 import glanceclient.exc
 from oslo.config import cfg
@@ -36,6 +39,7 @@ from cinder import exception
 from cinder.openstack.common import jsonutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import timeutils
+from cinder import units
 
 
 CONF = cfg.CONF
@@ -43,6 +47,11 @@ CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
+class RangeNotSupported(Exception):
+    """Glance answered a range request with the whole image."""
+    pass
+
+
 def _parse_image_ref(image_href):
     """Parse an image href into composite parts.
 
@@ -140,6 +149,37 @@ class GlanceClientWrapper(object):
         if version in kwargs:
             version = kwargs['version']
 
+        def _call(client):
+            return getattr(client.images, method)(*args, **kwargs)
+
+        return self._call_with_retries(context, method, version, _call)
+
+    def get_data_range(self, context, image_id, start, end):
+        """Return an iterator over bytes start to end of an image data.
+
+        :raises: RangeNotSupported if glance does not honour the range
+        """
+        version = self.version or CONF.glance_api_version
+
+        def _get_data_range(client):
+            if str(version) == '2':
+                url = '/v2/images/%s/file' % urllib.quote(str(image_id))
+            else:
+                url = '/v1/images/%s' % urllib.quote(str(image_id))
+            # NOTE: v1 clients are themselves the http client
+            http_client = getattr(client, 'http_client', client)
+            resp, body = http_client.raw_request(
+                'GET', url, headers={'Range': 'bytes=%d-%d' % (start, end)})
+            if resp.status != 206:
+                # Do not leave the connection streaming the whole image
+                resp.close()
+                raise RangeNotSupported()
+            return body
+
+        return self._call_with_retries(context, 'data', version,
+                                       _get_data_range)
+
+    def _call_with_retries(self, context, method, version, func):
         retry_excs = (glanceclient.exc.ServiceUnavailable,
                       glanceclient.exc.InvalidEndpoint,
                       glanceclient.exc.CommunicationError)
@@ -149,7 +189,7 @@ class GlanceClientWrapper(object):
             client = self.client or self._create_onetime_client(context,
                                                                 version)
             try:
-                return getattr(client.images, method)(*args, **kwargs)
+                return func(client)
             except retry_excs as e:
                 netloc = self.netloc
                 extra = "retrying"
@@ -242,6 +282,11 @@ class GlanceImageService(object):
 
     def download(self, context, image_id, data):
         """Calls out to Glance for metadata and data and writes data."""
+        if (CONF.glance_download_concurrency > 1 and
+                isinstance(data, file) and
+                self._download_ranges(context, image_id, data)):
+            return
+
         try:
             image_chunks = self._client.call(context, 'data', image_id)
         except Exception:
@@ -250,6 +295,80 @@ class GlanceImageService(object):
         for chunk in image_chunks:
             data.write(chunk)
 
+    def _download_ranges(self, context, image_id, data):
+        """Download byte ranges of an image in parallel into a file.
+
+        Each range is written at its offset through its own handle on the
+        file.  Returns False, having written nothing, if the image is too
+        small to be split or glance does not support range requests.
+        """
+        image_meta = self.show(context, image_id)
+        size = image_meta.get('size')
+        range_size = CONF.glance_download_range_size_mb * units.MiB
+        if not size or range_size <= 0 or size <= range_size:
+            return False
+        ranges = [(start, min(start + range_size, size) - 1)
+                  for start in xrange(0, size, range_size)]
+
+        try:
+            first_body = self._client.get_data_range(context, image_id,
+                                                     *ranges[0])
+        except RangeNotSupported:
+            LOG.debug(_("Glance does not support range requests, "
+                        "downloading image %s as a single stream") %
+                      image_id)
+            return False
+        except Exception:
+            _reraise_translated_image_exception(image_id)
+
+        pool = eventlet.GreenPool(CONF.glance_download_concurrency)
+        failures = []
+
+        def _fetch(start, end, body=None):
+            try:
+                if body is None:
+                    body = self._client.get_data_range(context, image_id,
+                                                       start, end)
+                received = 0
+                with open(data.name, 'r+b') as f:
+                    f.seek(start)
+                    for chunk in body:
+                        f.write(chunk)
+                        received += len(chunk)
+                if received != end - start + 1:
+                    raise IOError(_("Received %(received)d bytes of range "
+                                    "%(start)d-%(end)d") %
+                                  {'received': received, 'start': start,
+                                   'end': end})
+            except Exception:
+                failures.append(sys.exc_info())
+
+        pool.spawn_n(_fetch, ranges[0][0], ranges[0][1], first_body)
+        for start, end in ranges[1:]:
+            if failures:
+                break
+            # Blocks while glance_download_concurrency ranges are in flight
+            pool.spawn_n(_fetch, start, end)
+        pool.waitall()
+
+        if failures:
+            exc_info = failures[0]
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+        checksum = image_meta.get('checksum')
+        if checksum:
+            md5 = hashlib.md5()
+            with open(data.name, 'rb') as f:
+                for chunk in iter(lambda: f.read(units.MiB), ''):
+                    md5.update(chunk)
+            if md5.hexdigest() != checksum:
+                raise exception.ImageUnacceptable(
+                    image_id=image_id,
+                    reason=_("Checksum %(actual)s of the downloaded data "
+                             "does not match %(expected)s") %
+                    {'actual': md5.hexdigest(), 'expected': checksum})
+        return True
+
     def create(self, context, image_meta, data=None):
         """Store the image data and return the new image object."""
         sent_service_image_meta = self._translate_to_glance(image_meta)
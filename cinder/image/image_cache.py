@@ -0,0 +1,196 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Local cache of raw images on volume nodes.
+
+Entries are files named <image id>-<checksum> in image_cache_dir, holding
+the image already converted to raw.  The modification time of an entry is
+its last use; the least recently used entries are evicted once the cache
+grows beyond image_cache_max_size_gb.
+
+Readers hold a shared flock on the entry they read, which keeps any
+process from evicting it until they are done.
+"""
+
+import contextlib
+import errno
+import fcntl
+import os
+
+from oslo.config import cfg
+
+from cinder.openstack.common import fileutils
+from cinder.openstack.common import log as logging
+from cinder import units
+from cinder import utils
+
+
+LOG = logging.getLogger(__name__)
+
+image_cache_opts = [
+    cfg.StrOpt('image_cache_dir',
+               default='$state_path/image_cache',
+               help='Directory where the volume node caches the raw images '
+                    'it copies to volumes'),
+    cfg.IntOpt('image_cache_max_size_gb',
+               default=0,
+               help='Maximum size of the image cache, in GB. The least '
+                    'recently used images are evicted beyond it. 0 '
+                    'disables the cache'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(image_cache_opts)
+
+PART_SUFFIX = '.part'
+
+
+def is_enabled():
+    return CONF.image_cache_max_size_gb > 0
+
+
+class ImageCache(object):
+    """Size bounded, LRU evicted cache of raw images."""
+
+    def __init__(self, cache_dir=None, max_size_gb=None):
+        self.cache_dir = cache_dir or CONF.image_cache_dir
+        if max_size_gb is None:
+            max_size_gb = CONF.image_cache_max_size_gb
+        self.max_size = max_size_gb * units.GiB
+
+    def _entry_name(self, image_id, checksum):
+        return '%s-%s' % (image_id, checksum)
+
+    def _entry_path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    @contextlib.contextmanager
+    def fetch(self, image_id, checksum, fill):
+        """Yield the path of the cached copy of an image.
+
+        On a miss fill(path) is called to write the raw image to path.
+        Concurrent fetches of the same image, from this process or another
+        one, wait for a single fill instead of downloading it again.
+        """
+        fileutils.ensure_tree(self.cache_dir)
+        name = self._entry_name(image_id, checksum)
+        path = self._entry_path(name)
+
+        @utils.synchronized('image-cache-%s' % name, external=True)
+        def _get_entry():
+            if os.path.exists(path):
+                LOG.debug(_("Image cache hit for %s") % name)
+                # Mark the entry as the most recently used one
+                os.utime(path, None)
+                return self._acquire(path)
+
+            LOG.debug(_("Image cache miss for %s, filling it") % name)
+            tmp = path + PART_SUFFIX
+            with fileutils.remove_path_on_error(tmp):
+                # Create the file ourselves so that we keep owning it
+                # when fill() writes to it as root
+                open(tmp, 'wb').close()
+                fill(tmp)
+                os.rename(tmp, path)
+            return self._acquire(path)
+
+        fd = _get_entry()
+        try:
+            self.evict()
+            yield path
+        finally:
+            os.close(fd)
+
+    def _acquire(self, path):
+        """Return a descriptor of path holding a shared lock on it.
+
+        The lock is released when the descriptor is closed.
+        """
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+        except Exception:
+            os.close(fd)
+            raise
+        return fd
+
+    def list_entries(self):
+        """Return the entries as (name, size, last use), oldest first."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(PART_SUFFIX):
+                continue
+            try:
+                st = os.stat(self._entry_path(name))
+            except OSError:
+                # Removed under us
+                continue
+            entries.append((name, st.st_size, st.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def _remove(self, name):
+        path = self._entry_path(name)
+
+        @utils.synchronized('image-cache-%s' % name, external=True)
+        def _remove_entry():
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except OSError as e:
+                if e.errno == errno.ENOENT:
+                    return True
+                raise
+            try:
+                # Readers, in any process, hold a shared lock
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError as e:
+                if e.errno in (errno.EAGAIN, errno.EACCES):
+                    return False
+                raise
+            else:
+                fileutils.delete_if_exists(path)
+                return True
+            finally:
+                os.close(fd)
+
+        return _remove_entry()
+
+    def evict(self):
+        """Remove the least recently used entries beyond the size limit."""
+        entries = self.list_entries()
+        total = sum(size for _name, size, _mtime in entries)
+        for name, size, _mtime in entries:
+            if total <= self.max_size:
+                break
+            if self._remove(name):
+                LOG.info(_("Evicted %s from the image cache") % name)
+                total -= size
+
+    def purge(self, image_id=None):
+        """Remove every entry, or every entry of one image.
+
+        Returns the names of the removed entries.
+        """
+        removed = []
+        for name, _size, _mtime in self.list_entries():
+            if image_id is not None and not name.startswith(image_id + '-'):
+                continue
+            if self._remove(name):
+                removed.append(name)
+        return removed
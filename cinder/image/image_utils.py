@@ -27,16 +27,21 @@ we should look at maybe pushign this up to OSLO
 
 
 import contextlib
+import hashlib
 import os
 import re
+import stat
 import tempfile
 
 from oslo.config import cfg
 
 from cinder import exception
+from cinder.image import image_cache
 from cinder.openstack.common import fileutils
 from cinder.openstack.common import log as logging
+from cinder.openstack.common import processutils
 from cinder.openstack.common import strutils
+from cinder import units
 from cinder import utils
 
 
@@ -44,11 +49,24 @@ LOG = logging.getLogger(__name__)
 
 image_helper_opt = [cfg.StrOpt('image_conversion_dir',
                     default='/tmp',
-                    help='parent dir for tempdir used for image conversion'), ]
+                    help='parent dir for tempdir used for image conversion'),
+                    cfg.BoolOpt('image_stream_raw',
+                                default=False,
+                                help='Write raw images to the volume while '
+                                     'downloading them instead of going '
+                                     'through a file in '
+                                     'image_conversion_dir'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(image_helper_opt)
 
+# Size of the writes done when streaming a raw image to a volume
+STREAM_WRITE_SIZE = 4 * units.MiB
+
+# Number of bytes qemu-img reads to detect the format of an image.  An image
+# announced as raw is only streamed if qemu-img finds its header is raw.
+HEADER_PROBE_SIZE = 2048
+
 
 class QemuImgInfo(object):
     BACKING_FILE_RE = re.compile((r"^(.*?)\s*\(actual\s+path\s*:"
@@ -247,6 +265,203 @@ def fetch_to_raw(context, image_service,
                            user_id, project_id)
 
 
+class NotRawImage(Exception):
+    """The data of an image announced as raw is in another format."""
+    pass
+
+
+def is_raw_header(header):
+    """Check with qemu-img that the first bytes of an image are raw."""
+    if (CONF.image_conversion_dir and not
+            os.path.exists(CONF.image_conversion_dir)):
+        os.makedirs(CONF.image_conversion_dir)
+
+    with tempfile.NamedTemporaryFile(dir=CONF.image_conversion_dir) as f:
+        f.write(header)
+        f.flush()
+        try:
+            data = qemu_img_info(f.name)
+        except processutils.ProcessExecutionError:
+            # qemu-img may fail to open the truncated header of an image
+            # in another format
+            LOG.debug(_("qemu-img failed to probe the image header, not "
+                        "treating it as raw"))
+            return False
+    return data.file_format == 'raw' and data.backing_file is None
+
+
+class RawImageWriter(object):
+    """File-like object writing a raw image to a file descriptor.
+
+    The data is buffered into STREAM_WRITE_SIZE writes and checksummed on
+    the fly.  NotRawImage is raised from the first write() calls, before
+    anything is written, if qemu-img does not detect the image header as
+    raw.
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.checksum = hashlib.md5()
+        self.size = 0
+        self._probed = False
+        self._buffer = []
+        self._buffered = 0
+
+    def _probe(self):
+        if not is_raw_header(''.join(self._buffer)[:HEADER_PROBE_SIZE]):
+            raise NotRawImage()
+        self._probed = True
+
+    def _flush(self, final=False):
+        data = ''.join(self._buffer)
+        if final:
+            length = len(data)
+        else:
+            length = len(data) - len(data) % STREAM_WRITE_SIZE
+        view = buffer(data, 0, length)
+        while view:
+            written = os.write(self.fd, view)
+            view = buffer(view, written)
+        rest = data[length:]
+        self._buffer = [rest] if rest else []
+        self._buffered = len(rest)
+
+    def write(self, data):
+        self.checksum.update(data)
+        self.size += len(data)
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if not self._probed:
+            if self._buffered < HEADER_PROBE_SIZE:
+                return
+            self._probe()
+        if self._buffered >= STREAM_WRITE_SIZE:
+            self._flush()
+
+    def close(self):
+        if not self._probed:
+            self._probe()
+        self._flush(final=True)
+        os.fsync(self.fd)
+
+
+def stream_raw_image(context, image_service, image_id, dest):
+    """Download a raw image straight to dest, without a temporary file.
+
+    Returns False, leaving dest untouched, if the image is not announced
+    as a bare raw image or its data turns out not to be raw.
+    """
+    if not CONF.image_stream_raw or not os.path.exists(dest):
+        return False
+    image_meta = image_service.show(context, image_id)
+    if (image_meta.get('disk_format') != 'raw' or
+            image_meta.get('container_format') not in (None, 'bare')):
+        return False
+
+    LOG.debug("Streaming raw image %s to %s" % (image_id, dest))
+    with utils.temporary_chown(dest):
+        flags = os.O_WRONLY
+        if not stat.S_ISBLK(os.stat(dest).st_mode):
+            flags |= os.O_TRUNC
+        fd = os.open(dest, flags)
+        try:
+            writer = RawImageWriter(fd)
+            try:
+                image_service.download(context, image_id, writer)
+                writer.close()
+            except NotRawImage:
+                LOG.warn(_("Image %s is announced as raw but is not, "
+                           "converting it") % image_id)
+                return False
+        finally:
+            os.close(fd)
+
+    checksum = image_meta.get('checksum')
+    if checksum and writer.checksum.hexdigest() != checksum:
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("Checksum %(actual)s of the downloaded data does not "
+                     "match %(expected)s") %
+            {'actual': writer.checksum.hexdigest(), 'expected': checksum})
+    size = image_meta.get('size')
+    if size is not None and writer.size != size:
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("Downloaded %(actual)d bytes instead of "
+                     "%(expected)d") % {'actual': writer.size,
+                                        'expected': size})
+    return True
+
+
+def _fetch_and_check(context, image_service, image_id, path,
+                     user_id=None, project_id=None):
+    fetch(context, image_service, image_id, path, user_id, project_id)
+
+    if is_xenserver_image(context, image_service, image_id):
+        replace_xenserver_image_with_coalesced_vhd(path)
+
+    data = qemu_img_info(path)
+    fmt = data.file_format
+    if fmt is None:
+        raise exception.ImageUnacceptable(
+            reason=_("'qemu-img info' parsing failed."),
+            image_id=image_id)
+
+    backing_file = data.backing_file
+    if backing_file is not None:
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("fmt=%(fmt)s backed by:"
+                     "%(backing_file)s") % {
+                         'fmt': fmt,
+                         'backing_file': backing_file,
+                     })
+    return fmt
+
+
+def _convert_and_check(image_id, source, dest, volume_format):
+    convert_image(source, dest, volume_format)
+
+    data = qemu_img_info(dest)
+    if data.file_format != volume_format:
+        raise exception.ImageUnacceptable(
+            image_id=image_id,
+            reason=_("Converted to %(vol_format)s, but format is "
+                     "now %(file_format)s") % {'vol_format': volume_format,
+                                               'file_format': data.
+                                               file_format})
+
+
+@contextlib.contextmanager
+def cached_image(context, image_service, image_id,
+                 user_id=None, project_id=None):
+    """Yield the path of the raw copy of an image in the image cache.
+
+    Yields None when the cache is disabled or the image has no checksum
+    to tell its versions apart.
+    """
+    if not image_cache.is_enabled():
+        yield None
+        return
+
+    checksum = image_service.show(context, image_id).get('checksum')
+    if not checksum:
+        yield None
+        return
+
+    def _fill(path):
+        if stream_raw_image(context, image_service, image_id, path):
+            return
+        with temporary_file() as tmp:
+            fmt = _fetch_and_check(context, image_service, image_id, tmp,
+                                   user_id, project_id)
+            LOG.debug("%s was %s, caching it as raw" % (image_id, fmt))
+            _convert_and_check(image_id, tmp, path, 'raw')
+
+    with image_cache.ImageCache().fetch(image_id, checksum, _fill) as path:
+        yield path
+
+
 def fetch_to_volume_format(context, image_service,
                            image_id, dest, volume_format,
                            user_id=None, project_id=None):
@@ -254,52 +469,33 @@ def fetch_to_volume_format(context, image_service,
             os.path.exists(CONF.image_conversion_dir)):
         os.makedirs(CONF.image_conversion_dir)
 
+    with cached_image(context, image_service, image_id,
+                      user_id, project_id) as cached:
+        if cached is not None:
+            LOG.debug("Copying cached image %s to %s" % (image_id, dest))
+            _convert_and_check(image_id, cached, dest, volume_format)
+            return
+
+    if (volume_format == 'raw' and
+            stream_raw_image(context, image_service, image_id, dest)):
+        return
+
     # NOTE(avishay): I'm not crazy about creating temp files which may be
     # large and cause disk full errors which would confuse users.
     # Unfortunately it seems that you can't pipe to 'qemu-img convert' because
     # it seeks. Maybe we can think of something for a future version.
     with temporary_file() as tmp:
-        fetch(context, image_service, image_id, tmp, user_id, project_id)
-
-        if is_xenserver_image(context, image_service, image_id):
-            replace_xenserver_image_with_coalesced_vhd(tmp)
-
-        data = qemu_img_info(tmp)
-        fmt = data.file_format
-        if fmt is None:
-            raise exception.ImageUnacceptable(
-                reason=_("'qemu-img info' parsing failed."),
-                image_id=image_id)
-
-        backing_file = data.backing_file
-        if backing_file is not None:
-            raise exception.ImageUnacceptable(
-                image_id=image_id,
-                reason=_("fmt=%(fmt)s backed by:"
-                         "%(backing_file)s") % {
-                             'fmt': fmt,
-                             'backing_file': backing_file,
-                         })
+        fmt = _fetch_and_check(context, image_service, image_id, tmp,
+                               user_id, project_id)
 
         # NOTE(jdg): I'm using qemu-img convert to write
         # to the volume regardless if it *needs* conversion or not
-        # TODO(avishay): We can speed this up by checking if the image is raw
-        # and if so, writing directly to the device. However, we need to keep
-        # check via 'qemu-img info' that what we copied was in fact a raw
-        # image and not a different format with a backing file, which may be
-        # malicious.
+        # NOTE: raw images were already streamed to the volume above, once
+        # their header was checked not to be another format, which may
+        # have a malicious backing file.
         LOG.debug("%s was %s, converting to %s " % (image_id, fmt,
                                                     volume_format))
-        convert_image(tmp, dest, volume_format)
-
-        data = qemu_img_info(dest)
-        if data.file_format != volume_format:
-            raise exception.ImageUnacceptable(
-                image_id=image_id,
-                reason=_("Converted to %(vol_format)s, but format is "
-                         "now %(file_format)s") % {'vol_format': volume_format,
-                                                   'file_format': data.
-                                                   file_format})
+        _convert_and_check(image_id, tmp, dest, volume_format)
 
 
 def upload_volume(context, image_service, image_meta, volume_path,
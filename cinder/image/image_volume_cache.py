@@ -0,0 +1,211 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Cache of image volumes on a volume backend.
+
+An image volume is an internal volume, owned by no project, holding an
+image as it was copied to a volume.  Volumes created later from the same
+image on the same backend are cloned from it by the driver instead of
+downloading and writing the image again.  There is at most one image volume
+per image and host; the least recently used ones are deleted once the
+configured count or size limit of the backend is reached.
+
+Volumes being cloned from an image volume hold a shared flock on a lock file
+of the image volume, which keeps any process from evicting it meanwhile.
+"""
+
+import contextlib
+import errno
+import fcntl
+import os
+
+from oslo.config import cfg
+
+from cinder import exception
+from cinder.openstack.common import fileutils
+from cinder.openstack.common import log as logging
+from cinder.openstack.common import timeutils
+
+
+LOG = logging.getLogger(__name__)
+
+CONF = cfg.CONF
+CONF.import_opt('lock_path', 'cinder.openstack.common.lockutils')
+CONF.import_opt('state_path', 'cinder.common.config')
+
+
+def _image_updated_at(image_meta):
+    updated_at = image_meta.get('updated_at')
+    if updated_at is not None:
+        # The database keeps naive UTC datetimes
+        updated_at = timeutils.normalize_time(updated_at)
+    return updated_at
+
+
+class ImageVolumeCache(object):
+
+    def __init__(self, db, driver, host, max_size_gb=0, max_count=0):
+        self.db = db
+        self.driver = driver
+        self.host = host
+        self.max_size_gb = max_size_gb
+        self.max_count = max_count
+
+    def get_entry(self, context, image_id, image_meta):
+        """Return the usable cache entry of an image, or None.
+
+        Entries of an image that was updated since it was cached, or whose
+        volume is gone or unusable, are evicted.
+        """
+        entry = self.db.image_volume_cache_get_and_update_last_used(
+            context, image_id, self.host)
+        if not entry:
+            return None
+
+        if entry['image_updated_at'] != _image_updated_at(image_meta):
+            LOG.debug(_("Image %s was updated since it was cached, "
+                        "evicting it") % image_id)
+            self.evict(context, entry)
+            return None
+
+        try:
+            volume = self.db.volume_get(context, entry['volume_id'])
+        except exception.VolumeNotFound:
+            self.db.image_volume_cache_delete(context, entry['id'])
+            return None
+        if volume['status'] != 'available':
+            LOG.warn(_("Image volume %(volume_id)s of image %(image_id)s is "
+                       "%(status)s, evicting it") %
+                     {'volume_id': volume['id'], 'image_id': image_id,
+                      'status': volume['status']})
+            self.evict(context, entry)
+            return None
+        return entry
+
+    def create_entry(self, context, volume_ref, image_id, image_meta):
+        """Record volume_ref as the image volume of image_id."""
+        LOG.debug(_("Caching image %(image_id)s in volume %(volume_id)s") %
+                  {'image_id': image_id, 'volume_id': volume_ref['id']})
+        return self.db.image_volume_cache_create(
+            context, self.host, image_id, _image_updated_at(image_meta),
+            volume_ref['id'], volume_ref['size'])
+
+    def ensure_space(self, context, size):
+        """Evict entries until an image volume of size GB fits.
+
+        Returns False if it can never fit in the cache.
+        """
+        if self.max_size_gb and size > self.max_size_gb:
+            return False
+
+        entries = self.db.image_volume_cache_get_all_for_host(context,
+                                                              self.host)
+        count = len(entries)
+        total = sum(entry['size'] for entry in entries)
+
+        def _fits():
+            return ((not self.max_count or count < self.max_count) and
+                    (not self.max_size_gb or total + size <= self.max_size_gb))
+
+        for entry in entries:
+            if _fits():
+                break
+            if self.evict(context, entry):
+                count -= 1
+                total -= entry['size']
+        return _fits()
+
+    def _lock_file_path(self, volume_id):
+        lock_dir = CONF.lock_path or CONF.state_path
+        fileutils.ensure_tree(lock_dir)
+        return os.path.join(lock_dir, 'cinder-image-volume-%s' % volume_id)
+
+    def _lock(self, volume_id, operation):
+        """Return the lock file of an image volume locked with operation.
+
+        Returns None instead of waiting if it is locked by someone else.
+        The lock is released when the file is closed.
+        """
+        lock_file = open(self._lock_file_path(volume_id), 'a')
+        try:
+            fcntl.flock(lock_file, operation | fcntl.LOCK_NB)
+        except IOError as e:
+            lock_file.close()
+            if e.errno in (errno.EAGAIN, errno.EACCES):
+                return None
+            raise
+        except Exception:
+            lock_file.close()
+            raise
+        return lock_file
+
+    @contextlib.contextmanager
+    def use_image_volume(self, context, volume_id):
+        """Keep an image volume from being evicted while it is used.
+
+        Yields the image volume, or None if it is being evicted or is gone.
+        """
+        lock_file = self._lock(volume_id, fcntl.LOCK_SH)
+        if lock_file is None:
+            yield None
+            return
+        try:
+            try:
+                volume = self.db.volume_get(context, volume_id)
+            except exception.VolumeNotFound:
+                volume = None
+            yield volume
+        finally:
+            lock_file.close()
+
+    def evict(self, context, entry):
+        """Delete the image volume of a cache entry.
+
+        Returns False if the image volume is being cloned, or if the backend
+        refused to delete it, e.g. because clones of it still depend on it.
+        """
+        lock_file = self._lock(entry['volume_id'], fcntl.LOCK_EX)
+        if lock_file is None:
+            LOG.debug(_("Image volume %s is being cloned, not evicting it") %
+                      entry['volume_id'])
+            return False
+        try:
+            LOG.info(_("Evicting image %(image_id)s from the image volume "
+                       "cache of %(host)s") % {'image_id': entry['image_id'],
+                                               'host': self.host})
+            try:
+                volume = self.db.volume_get(context, entry['volume_id'])
+            except exception.VolumeNotFound:
+                volume = None
+            if volume is not None:
+                try:
+                    self.delete_image_volume(context, volume)
+                except exception.VolumeIsBusy:
+                    LOG.warn(_("Image volume %s is busy, not evicting it") %
+                             volume['id'])
+                    return False
+            self.db.image_volume_cache_delete(context, entry['id'])
+            fileutils.delete_if_exists(
+                self._lock_file_path(entry['volume_id']))
+            return True
+        finally:
+            lock_file.close()
+
+    def delete_image_volume(self, context, volume):
+        self.driver.delete_volume(volume)
+        self.db.volume_destroy(context, volume['id'])
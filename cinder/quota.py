@@ -47,6 +47,14 @@ quota_opts = [
     cfg.IntOpt('reservation_expire',
                default=86400,
                help='number of seconds until a reservation expires'),
+    cfg.IntOpt('reservation_expire_batch_size',
+               default=1000,
+               help='number of expired reservations rolled back per '
+                    'transaction'),
+    cfg.IntOpt('reservation_expire_max_per_run',
+               default=10000,
+               help='maximum number of expired reservations rolled back by '
+                    'one run of the periodic task, 0 for no limit'),
     cfg.IntOpt('until_refresh',
                default=0,
                help='count of reservations until usage is refreshed'),
@@ -58,7 +66,11 @@ quota_opts = [
                help='default driver to use for quota checks'),
     cfg.BoolOpt('use_default_quota_class',
                 default=True,
-                help='whether to use default quota class for default quota'), ]
+                help='whether to use default quota class for default quota'),
+    cfg.IntOpt('quota_resources_cache_ttl',
+               default=30,
+               help='number of seconds the quota resources of the volume '
+                    'types are cached for, 0 to reload them on each use'), ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
@@ -411,7 +423,9 @@ class DbQuotaDriver(object):
         :param context: The request context, for access checks.
         """
 
-        db.reservation_expire(context)
+        db.reservation_expire(
+            context, batch_size=CONF.reservation_expire_batch_size,
+            max_reservations=CONF.reservation_expire_max_per_run)
 
 
 class BaseResource(object):
@@ -860,10 +874,27 @@ class QuotaEngine(object):
 class VolumeTypeQuotaEngine(QuotaEngine):
     """Represent the set of all quotas."""
 
+    def __init__(self, quota_driver_class=None):
+        super(VolumeTypeQuotaEngine, self).__init__(quota_driver_class)
+        self._resources_loaded_at = None
+
     @property
     def resources(self):
-        """Fetches all possible quota resources."""
+        """Fetches all possible quota resources.
+
+        The resources are cached, until a volume type is created or deleted
+        in this process or for quota_resources_cache_ttl seconds when it
+        happens in another one.
+        """
+
+        if (self._resources_loaded_at is None or
+                timeutils.is_older_than(self._resources_loaded_at,
+                                        CONF.quota_resources_cache_ttl)):
+            self._resources = self._load_resources()
+            self._resources_loaded_at = timeutils.utcnow()
+        return self._resources
 
+    def _load_resources(self):
         result = {}
         # Global quotas.
         argses = [('volumes', '_sync_volumes', 'quota_volumes'),
@@ -884,6 +915,26 @@ class VolumeTypeQuotaEngine(QuotaEngine):
                 result[resource.name] = resource
         return result
 
+    def invalidate_resources(self):
+        """Reload the resources on their next use."""
+
+        self._resources_loaded_at = None
+
+    def _check_resources(self, names):
+        # A volume type created in another process may not be cached yet
+        if not set(names).issubset(self.resources):
+            self.invalidate_resources()
+
+    def limit_check(self, context, project_id=None, **values):
+        self._check_resources(values)
+        return super(VolumeTypeQuotaEngine, self).limit_check(
+            context, project_id=project_id, **values)
+
+    def reserve(self, context, expire=None, project_id=None, **deltas):
+        self._check_resources(deltas)
+        return super(VolumeTypeQuotaEngine, self).reserve(
+            context, expire=expire, project_id=project_id, **deltas)
+
     def register_resource(self, resource):
         raise NotImplementedError(_("Cannot register resource"))
 
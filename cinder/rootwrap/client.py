@@ -0,0 +1,126 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Client side of the rootwrap daemon.
+
+The client runs in the eventlet services, so it starts and talks to the
+daemon through green pipes and sockets which do not block the hub.
+"""
+
+import json
+
+from eventlet.green import socket
+from eventlet.green import subprocess
+from eventlet import semaphore
+
+from cinder.rootwrap import daemon
+
+
+class RootwrapDaemonError(Exception):
+    """Raised when the rootwrap daemon cannot be started or reached."""
+    pass
+
+
+class Client(object):
+    """Runs commands through a rootwrap daemon started on first use.
+
+    daemon_cmd is the full command line starting the daemon, e.g.
+    ['sudo', 'cinder-rootwrap-daemon', '/etc/cinder/rootwrap.conf'].
+    The daemon is restarted transparently if it went away.
+    """
+
+    def __init__(self, daemon_cmd):
+        self._daemon_cmd = daemon_cmd
+        self._lock = semaphore.Semaphore()
+        self._process = None
+        self._socket_path = None
+        self._token = None
+
+    def _initialize(self):
+        process = subprocess.Popen(self._daemon_cmd,
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   close_fds=True)
+        line = process.stdout.readline()
+        try:
+            info = json.loads(line)
+            self._socket_path = info['socket']
+            self._token = info['token']
+        except (ValueError, KeyError, TypeError):
+            process.stdin.close()
+            process.wait()
+            raise RootwrapDaemonError("Failed to start rootwrap daemon "
+                                      "%s (exit code %s)" %
+                                      (self._daemon_cmd, process.returncode))
+        self._process = process
+
+    def _ensure_initialized(self):
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                self._initialize()
+            return self._socket_path, self._token
+
+    def _reset(self, process):
+        with self._lock:
+            if self._process is process and process is not None:
+                try:
+                    process.stdin.close()
+                except IOError:
+                    pass
+                self._process = None
+
+    def _request(self, path, token, cmd, stdin):
+        request = json.dumps({'token': token,
+                              'cmd': [daemon.encode(str(c)) for c in cmd],
+                              'stdin': daemon.encode(stdin)})
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            sock.sendall(request + '\n')
+            reader = sock.makefile('rb')
+            try:
+                line = reader.readline()
+            finally:
+                reader.close()
+        finally:
+            sock.close()
+        if not line:
+            raise RootwrapDaemonError("Rootwrap daemon closed the "
+                                      "connection without replying")
+        return json.loads(line)
+
+    def execute(self, cmd, stdin=None):
+        """Run cmd through the daemon.
+
+        :returns: (returncode, stdout, stderr)
+        :raises: RootwrapDaemonError if the daemon cannot be reached
+        """
+        for attempt in (1, 2):
+            path, token = self._ensure_initialized()
+            process = self._process
+            try:
+                reply = self._request(path, token, cmd, stdin)
+                break
+            except (socket.error, RootwrapDaemonError, ValueError) as exc:
+                # The daemon may have died under us, restart it once
+                self._reset(process)
+                if attempt == 2:
+                    raise RootwrapDaemonError("Rootwrap daemon request "
+                                              "failed: %s" % exc)
+        return (reply['returncode'],
+                daemon.decode(reply['stdout']),
+                daemon.decode(reply['stderr']))
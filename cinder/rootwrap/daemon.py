@@ -0,0 +1,220 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Long-lived root wrapper.
+
+   The daemon loads the filter definitions once and then runs commands sent
+   to it over a unix socket, applying exactly the same filtering as
+   cinder-rootwrap does for a single command.
+
+   On startup the daemon prints one JSON line on stdout holding the socket
+   path and an authentication token.  The socket lives in a private
+   directory owned by the user that started the daemon through sudo.  The
+   daemon exits as soon as its stdin is closed, i.e. when the service that
+   spawned it goes away.
+
+   Each request is a single connection carrying one JSON line:
+   {"token": ..., "cmd": [...], "stdin": ...}, answered by one JSON line:
+   {"returncode": ..., "stdout": ..., "stderr": ...}.  Byte strings are
+   transported latin-1 decoded so that arbitrary binary data survives.
+"""
+
+import binascii
+import ConfigParser
+import json
+import logging
+import os
+import shutil
+import SocketServer
+import subprocess
+import sys
+import tempfile
+import threading
+
+from cinder.openstack.common.rootwrap import cmd
+from cinder.openstack.common.rootwrap import wrapper
+
+
+SOCKET_NAME = 'rootwrap.sock'
+
+
+def encode(data):
+    """Turn a byte string into something JSON can carry losslessly."""
+    if data is None:
+        return None
+    return data.decode('latin-1')
+
+
+def decode(data):
+    """Reverse of encode()."""
+    if data is None:
+        return None
+    return data.encode('latin-1')
+
+
+def run_one_command(config, filters, userargs, stdin=None):
+    """Run userargs if they match one of the filters.
+
+    Returns a (returncode, stdout, stderr) tuple.  Filtering failures are
+    reported with the same return codes cinder-rootwrap exits with.
+    """
+    try:
+        filtermatch = wrapper.match_filter(filters, userargs,
+                                           exec_dirs=config.exec_dirs)
+    except wrapper.FilterMatchNotExecutable as exc:
+        msg = ("Executable not found: %s (filter match = %s)"
+               % (exc.match.exec_path, exc.match.name))
+        if config.use_syslog:
+            logging.error(msg)
+        return cmd.RC_NOEXECFOUND, '', msg
+    except wrapper.NoFilterMatched:
+        msg = ("Unauthorized command: %s (no filter matched)"
+               % ' '.join(userargs))
+        if config.use_syslog:
+            logging.error(msg)
+        return cmd.RC_UNAUTHORIZED, '', msg
+
+    command = filtermatch.get_command(userargs, exec_dirs=config.exec_dirs)
+    if config.use_syslog:
+        logging.info("Executing %s (filter match = %s)" % (command,
+                                                           filtermatch.name))
+
+    obj = subprocess.Popen(command,
+                           stdin=subprocess.PIPE,
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.PIPE,
+                           close_fds=True,
+                           preexec_fn=cmd._subprocess_setup,
+                           env=filtermatch.get_environment(userargs))
+    out, err = obj.communicate(stdin)
+    return obj.returncode, out, err
+
+
+class RootwrapHandler(SocketServer.StreamRequestHandler):
+    """Handles a single command request."""
+
+    def handle(self):
+        server = self.server
+        try:
+            request = json.loads(self.rfile.readline())
+            token = request.get('token') or ''
+            if not _compare_tokens(token, server.token):
+                logging.error("Rejected rootwrap request with a bad token")
+                return
+            userargs = [decode(arg) for arg in request['cmd']]
+            stdin = decode(request.get('stdin'))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logging.error("Rejected malformed rootwrap request")
+            return
+
+        if not userargs:
+            reply = (cmd.RC_NOCOMMAND, '', 'No command specified')
+        else:
+            reply = run_one_command(server.config, server.filters,
+                                    userargs, stdin)
+        returncode, out, err = reply
+        self.wfile.write(json.dumps({'returncode': returncode,
+                                     'stdout': encode(out),
+                                     'stderr': encode(err)}) + '\n')
+
+
+class RootwrapServer(SocketServer.ThreadingMixIn,
+                     SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, token, config, filters):
+        SocketServer.UnixStreamServer.__init__(self, path, RootwrapHandler)
+        self.token = token
+        self.config = config
+        self.filters = filters
+
+
+def _compare_tokens(a, b):
+    """Constant time comparison of two tokens."""
+    if len(a) != len(b):
+        return False
+    result = 0
+    for x, y in zip(a, b):
+        result |= ord(x) ^ ord(y)
+    return result == 0
+
+
+def _wait_for_eof(server, stream):
+    try:
+        stream.read()
+    finally:
+        server.shutdown()
+
+
+def daemon_start(config, filters):
+    """Serve commands until our stdin is closed."""
+    temp_dir = tempfile.mkdtemp(prefix='rootwrap-')
+    try:
+        # Only the user that started us through sudo may reach the socket
+        uid = int(os.environ.get('SUDO_UID', os.getuid()))
+        gid = int(os.environ.get('SUDO_GID', os.getgid()))
+        os.chmod(temp_dir, 0o700)
+        os.chown(temp_dir, uid, gid)
+
+        path = os.path.join(temp_dir, SOCKET_NAME)
+        token = binascii.hexlify(os.urandom(16))
+        server = RootwrapServer(path, token, config, filters)
+        os.chown(path, uid, gid)
+
+        sys.stdout.write(json.dumps({'socket': path, 'token': token}) + '\n')
+        sys.stdout.flush()
+
+        watcher = threading.Thread(target=_wait_for_eof,
+                                   args=(server, sys.stdin))
+        watcher.daemon = True
+        watcher.start()
+
+        server.serve_forever()
+        server.server_close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def main():
+    """Start the daemon with the configuration file given on the command line.
+
+    Configuration errors are reported as cinder-rootwrap reports them.
+    """
+    execname = sys.argv.pop(0)
+    if len(sys.argv) != 1:
+        cmd._exit_error(execname, "Daemon takes only a configuration file",
+                        cmd.RC_NOCOMMAND, log=False)
+    configfile = sys.argv.pop(0)
+
+    try:
+        rawconfig = ConfigParser.RawConfigParser()
+        rawconfig.read(configfile)
+        config = wrapper.RootwrapConfig(rawconfig)
+    except ValueError as exc:
+        msg = "Incorrect value in %s: %s" % (configfile, exc.message)
+        cmd._exit_error(execname, msg, cmd.RC_BADCONFIG, log=False)
+    except ConfigParser.Error:
+        cmd._exit_error(execname,
+                        "Incorrect configuration file: %s" % configfile,
+                        cmd.RC_BADCONFIG, log=False)
+
+    if config.use_syslog:
+        wrapper.setup_syslog(execname,
+                             config.syslog_log_facility,
+                             config.syslog_log_level)
+
+    daemon_start(config, wrapper.load_filters(config.filters_path))
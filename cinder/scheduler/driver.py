@@ -21,9 +21,12 @@
 Scheduler base class that all Schedulers should inherit from
 """
 
+import copy
+
 from oslo.config import cfg
 
 from cinder import db
+from cinder import exception
 from cinder.openstack.common import importutils
 from cinder.openstack.common import timeutils
 from cinder import utils
@@ -95,3 +98,19 @@ class Scheduler(object):
     def schedule_create_volume(self, context, request_spec, filter_properties):
         """Must override schedule method for scheduler to work."""
         raise NotImplementedError(_("Must implement schedule_create_volume"))
+
+    def schedule_create_volumes(self, context, request_specs,
+                                filter_properties):
+        """Place several volumes, one after the other by default.
+
+        :returns: dict of the exceptions, by volume id, of the volumes that
+                  could not be placed or whose creation could not be cast
+        """
+        failures = {}
+        for request_spec in request_specs:
+            try:
+                self.schedule_create_volume(context, request_spec,
+                                            copy.deepcopy(filter_properties))
+            except Exception as ex:
+                failures[request_spec['volume_id']] = ex
+        return failures
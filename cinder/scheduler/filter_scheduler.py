@@ -20,6 +20,9 @@ You can customize this scheduler by specifying your own volume Filters and
 Weighing Functions.
 """
 
+import collections
+import copy
+
 from oslo.config import cfg
 
 from cinder import exception
@@ -67,14 +70,102 @@ class FilterScheduler(driver.Scheduler):
         if not weighed_host:
             raise exception.NoValidHost(reason="")
 
-        host = weighed_host.obj.host
+        self._create_volume_on_host(context, request_spec, filter_properties,
+                                    weighed_host.obj)
+
+    def schedule_create_volumes(self, context, request_specs,
+                                filter_properties):
+        """Place several volumes at once.
+
+        Hosts are filtered once for every group of volumes sharing a
+        volume type, a size and an availability zone.  The volumes of a
+        group are then placed one after the other on the best weighed
+        host that still has room for them, consuming its capacity so that
+        the following placements see it.  Volume creations are cast once
+        all the volumes are placed.
+
+        :returns: dict of the exceptions, by volume id, of the volumes that
+                  could not be placed or whose creation could not be cast
+        """
+        groups = collections.OrderedDict()
+        for request_spec in request_specs:
+            volume_properties = request_spec['volume_properties']
+            volume_type = request_spec.get('volume_type') or {}
+            key = (volume_type.get('id'), volume_properties['size'],
+                   volume_properties.get('availability_zone'))
+            groups.setdefault(key, []).append(request_spec)
+
+        placements = []
+        failures = {}
+        for group in groups.itervalues():
+            group_properties = copy.deepcopy(filter_properties)
+            try:
+                weighed_hosts = self._get_weighted_candidates(
+                    context, group[0], group_properties)
+            except exception.NoValidHost as ex:
+                for request_spec in group:
+                    failures[request_spec['volume_id']] = ex
+                continue
+            candidates = [weighed_host.obj for weighed_host in weighed_hosts]
+
+            for request_spec in group:
+                volume_properties = request_spec['volume_properties']
+                host_state = self._choose_batch_host(candidates,
+                                                     group_properties)
+                if host_state is None:
+                    failures[request_spec['volume_id']] = \
+                        exception.NoValidHost(reason="")
+                    continue
+                LOG.debug(_("Choosing %s") % host_state)
+                host_state.consume_from_volume(volume_properties)
+
+                volume_filter_properties = dict(group_properties,
+                                                request_spec=request_spec)
+                if 'retry' in group_properties:
+                    volume_filter_properties['retry'] = copy.deepcopy(
+                        group_properties['retry'])
+                placements.append((request_spec, volume_filter_properties,
+                                   host_state))
+
+        for request_spec, volume_filter_properties, host_state in placements:
+            volume_id = request_spec['volume_id']
+            try:
+                self._create_volume_on_host(context, request_spec,
+                                            volume_filter_properties,
+                                            host_state)
+            except Exception as ex:
+                # The volumes already cast are being created, only this
+                # one failed
+                LOG.exception(_("Failed to cast the creation of volume "
+                                "%s") % volume_id)
+                failures[volume_id] = ex
+        return failures
+
+    def _choose_batch_host(self, candidates, filter_properties):
+        """Pick the best candidate still passing the group's filters.
+
+        The previous placements consumed capacity on the candidates, so
+        the filters the group was run through are run again over them.
+        """
+        candidates = self.host_manager.get_filtered_hosts(candidates,
+                                                          filter_properties)
+        if not candidates:
+            return None
+        weighed_hosts = self.host_manager.get_weighed_hosts(candidates,
+                                                            filter_properties)
+        return weighed_hosts[0].obj
+
+    def _create_volume_on_host(self, context, request_spec, filter_properties,
+                               host_state):
+        """Record the host chosen for a volume and cast its creation."""
+        host = host_state.host
         volume_id = request_spec['volume_id']
         snapshot_id = request_spec['snapshot_id']
         image_id = request_spec['image_id']
 
         updated_volume = driver.volume_update_db(context, volume_id, host)
         self._post_select_populate_filter_properties(filter_properties,
-                                                     weighed_host.obj)
+                                                     host_state)
 
         # context is not serializable
         filter_properties.pop('context', None)
@@ -0,0 +1,99 @@
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from cinder.openstack.common import log as logging
+from cinder.openstack.common.scheduler.filters import capabilities_filter
+from cinder.scheduler.filters import extra_specs_ops
+
+
+LOG = logging.getLogger(__name__)
+
+
+class CapabilitiesFilter(capabilities_filter.CapabilitiesFilter):
+    """CapabilitiesFilter compiling the extra specs once for all hosts."""
+
+    # Matchers compiled from the extra specs of the resource types seen
+    # so far, see _get_matchers()
+    _matchers_cache = {}
+    _matchers_cache_size = 256
+
+    def _compile_extra_specs(self, extra_specs):
+        """Turn extra specs into a list of (scope, matcher) pairs.
+
+        scope is the path of the capability in the capabilities dict and
+        matcher a function telling whether its value satisfies the spec.
+        """
+        matchers = []
+        for key, req in extra_specs.iteritems():
+            # Either not scope format, or in capabilities scope
+            scope = key.split(':')
+            if len(scope) > 1 and scope[0] != "capabilities":
+                continue
+            elif scope[0] == "capabilities":
+                del scope[0]
+            matchers.append((tuple(scope),
+                             extra_specs_ops.make_matcher(req)))
+        return matchers
+
+    def _get_matchers(self, resource_type):
+        extra_specs = resource_type.get('extra_specs')
+        if not extra_specs:
+            return []
+        # Extra specs can be modified without the resource type being
+        # updated, hence they are part of the key.
+        try:
+            key = (resource_type.get('id'),
+                   frozenset(extra_specs.iteritems()))
+            matchers = self._matchers_cache.get(key)
+        except TypeError:
+            # Unhashable spec values, nothing we can cache
+            return self._compile_extra_specs(extra_specs)
+        if matchers is None:
+            matchers = self._compile_extra_specs(extra_specs)
+            if len(self._matchers_cache) >= self._matchers_cache_size:
+                self._matchers_cache.clear()
+            self._matchers_cache[key] = matchers
+        return matchers
+
+    def _satisfies_matchers(self, capabilities, matchers):
+        for scope, matcher in matchers:
+            cap = capabilities
+            for name in scope:
+                try:
+                    cap = cap.get(name, None)
+                except AttributeError:
+                    return False
+                if cap is None:
+                    return False
+            if not matcher(cap):
+                return False
+        return True
+
+    def _satisfies_extra_specs(self, capabilities, resource_type):
+        """Check that the capabilities provided by the services
+        satisfy the extra specs associated with the volume type"""
+        return self._satisfies_matchers(capabilities,
+                                        self._get_matchers(resource_type))
+
+    def filter_all(self, filter_obj_list, filter_properties):
+        """Yield the hosts satisfying the extra specs.
+
+        The extra specs are only compiled once for all the hosts.
+        """
+        resource_type = filter_properties.get('resource_type') or {}
+        matchers = self._get_matchers(resource_type)
+        for obj in filter_obj_list:
+            if self._satisfies_matchers(obj.capabilities, matchers):
+                yield obj
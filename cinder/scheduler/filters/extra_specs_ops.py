@@ -0,0 +1,83 @@
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Extra specs requirements compiled into matchers.
+
+The operators and their semantics are the ones of
+cinder.openstack.common.scheduler.filters.extra_specs_ops.match().
+"""
+
+import operator
+
+from cinder.openstack.common.scheduler.filters import extra_specs_ops
+from cinder.openstack.common import strutils
+
+
+_numeric_ops = {'=': operator.ge,
+                '==': operator.eq,
+                '!=': operator.ne,
+                '>=': operator.ge,
+                '<=': operator.le}
+
+
+def _never(value):
+    return False
+
+
+def make_matcher(req):
+    """Parse an extra spec requirement once.
+
+    Returns a function telling whether a capability value satisfies req,
+    so that the requirement is not parsed again for every host.
+    """
+    words = req.split()
+
+    op = method = None
+    if words:
+        op = words.pop(0)
+        method = extra_specs_ops._op_methods.get(op)
+
+    if op != '<or>' and not method:
+        return lambda value: value == req
+
+    if op == '<or>':  # Ex: <or> v1 <or> v2 <or> v3
+        choices = tuple(words[::2])
+        return lambda value: value is not None and value in choices
+
+    if not words:
+        return _never
+    operand = words[0]
+
+    if op in _numeric_ops:
+        try:
+            operand = float(operand)
+        except ValueError:
+            return _never
+        compare = _numeric_ops[op]
+
+        def matcher(value):
+            try:
+                return value is not None and compare(float(value), operand)
+            except ValueError:
+                return False
+        return matcher
+
+    if op == '<is>':
+        operand = strutils.bool_from_string(operand)
+        return lambda value: (value is not None and
+                              strutils.bool_from_string(value) is operand)
+
+    return lambda value: value is not None and method(value, operand)
@@ -17,6 +17,8 @@
 Manage hosts in the current zone.
 """
 
+import collections
+import time
 import UserDict
 
 from oslo.config import cfg
@@ -25,8 +27,11 @@ from cinder import db
 from cinder import exception
 from cinder.openstack.common import log as logging
 from cinder.openstack.common.scheduler import filters
+from cinder.openstack.common.scheduler.filters import extra_specs_ops
 from cinder.openstack.common.scheduler import weights
+from cinder.openstack.common import strutils
 from cinder.openstack.common import timeutils
+from cinder.scheduler import stats
 from cinder import utils
 
 
@@ -43,7 +48,18 @@ host_manager_opts = [
                 default=[
                     'CapacityWeigher'
                 ],
-                help='Which weigher class names to use for weighing hosts.')
+                help='Which weigher class names to use for weighing hosts.'),
+    cfg.IntOpt('scheduler_service_cache_time',
+               default=10,
+               help='Seconds the list of volume services is cached by the '
+                    'scheduler before being read again from the database.  '
+                    'Set to 0 to read it for every request.'),
+    cfg.BoolOpt('scheduler_collect_stats',
+                default=False,
+                help='Time every filter and weigher run by the scheduler, '
+                     'count the hosts they get and keep, and report it '
+                     'through the logs and the os-scheduler-stats API '
+                     'extension.'),
 ]
 
 CONF = cfg.CONF
@@ -117,7 +133,8 @@ class HostState(object):
     def update_from_volume_capability(self, capability):
         """Update information about a host from its volume_node info."""
         if capability:
-            if self.updated and self.updated > capability['timestamp']:
+            timestamp = capability['timestamp']
+            if self.updated and timestamp and self.updated > timestamp:
                 return
 
             self.volume_backend = capability.get('volume_backend_name', None)
@@ -158,12 +175,21 @@ class HostManager(object):
     def __init__(self):
         self.service_states = {}  # { <host>: {<service>: {cap k : v}}}
         self.host_state_map = {}
+        self.services = {}  # { <host>: <volume service db record> }
+        self.services_refreshed_at = None
+        # Inverted index of the string and boolean capabilities:
+        # { <capability>: {<value>: set([<host>, ...])} }
+        self.capability_index = {}
+        # Hosts reporting a capability with a value of another type:
+        # { <capability>: set([<host>, ...]) }
+        self.unindexed_capabilities = {}
         self.filter_handler = filters.HostFilterHandler('cinder.scheduler.'
                                                         'filters')
         self.filter_classes = self.filter_handler.get_all_classes()
         self.weight_handler = weights.HostWeightHandler('cinder.scheduler.'
                                                         'weights')
         self.weight_classes = self.weight_handler.get_all_classes()
+        self.stats = stats.SchedulerStats()
 
     def _choose_host_filters(self, filter_cls_names):
         """Since the caller may specify which filters to use we need
@@ -222,18 +248,69 @@ class HostManager(object):
                            filter_class_names=None):
         """Filter hosts and return only ones passing all filters"""
         filter_classes = self._choose_host_filters(filter_class_names)
+        if any(cls.__name__ == 'CapabilitiesFilter'
+               for cls in filter_classes):
+            # Drop the hosts the capability index already rules out
+            candidates = self._get_indexed_candidates(filter_properties)
+            if candidates is not None:
+                hosts = [host_state for host_state in hosts
+                         if host_state.host in candidates]
+        if CONF.scheduler_collect_stats:
+            return self._get_filtered_hosts_with_stats(filter_classes, hosts,
+                                                       filter_properties)
         return self.filter_handler.get_filtered_objects(filter_classes,
                                                         hosts,
                                                         filter_properties)
 
+    def _get_filtered_hosts_with_stats(self, filter_classes, hosts,
+                                       filter_properties):
+        """Run the filters one at a time, recording their statistics."""
+        hosts = list(hosts)
+        trace = []
+        for filter_cls in filter_classes:
+            start = time.time()
+            passed = list(filter_cls().filter_all(hosts, filter_properties))
+            elapsed = time.time() - start
+            name = filter_cls.__name__
+            self.stats.record('filter', name, elapsed, len(hosts),
+                              len(passed))
+            trace.append('%s %d->%d hosts in %.4fs' %
+                         (name, len(hosts), len(passed), elapsed))
+            hosts = passed
+        LOG.debug(_("Filters run: %s") % '; '.join(trace))
+        return hosts
+
     def get_weighed_hosts(self, hosts, weight_properties,
                           weigher_class_names=None):
         """Weigh the hosts"""
         weigher_classes = self._choose_host_weighers(weigher_class_names)
+        if CONF.scheduler_collect_stats:
+            return self._get_weighed_hosts_with_stats(weigher_classes, hosts,
+                                                      weight_properties)
         return self.weight_handler.get_weighed_objects(weigher_classes,
                                                        hosts,
                                                        weight_properties)
 
+    def _get_weighed_hosts_with_stats(self, weigher_classes, hosts,
+                                      weight_properties):
+        """Run the weighers one at a time, recording their statistics."""
+        if not hosts:
+            return []
+        weighed_hosts = [self.weight_handler.object_class(host, 0.0)
+                         for host in hosts]
+        trace = []
+        for weigher_cls in weigher_classes:
+            start = time.time()
+            weigher_cls().weigh_objects(weighed_hosts, weight_properties)
+            elapsed = time.time() - start
+            name = weigher_cls.__name__
+            self.stats.record('weigher', name, elapsed, len(weighed_hosts),
+                              len(weighed_hosts))
+            trace.append('%s %d hosts in %.4fs' %
+                         (name, len(weighed_hosts), elapsed))
+        LOG.debug(_("Weighers run: %s") % '; '.join(trace))
+        return sorted(weighed_hosts, key=lambda x: x.weight, reverse=True)
+
     def update_service_capabilities(self, service_name, host, capabilities):
         """Update the per-service capabilities based on this notification."""
         if service_name != 'volume':
@@ -249,8 +326,145 @@ class HostManager(object):
         # Copy the capabilities, so we don't modify the original dict
         capab_copy = dict(capabilities)
         capab_copy["timestamp"] = timeutils.utcnow()  # Reported time
+        self._update_capability_index(host, self.service_states.get(host),
+                                      capab_copy)
         self.service_states[host] = capab_copy
 
+        if host not in self.services:
+            # A new service started, read it on the next request
+            self.services_refreshed_at = None
+
+    @staticmethod
+    def _is_indexable(value):
+        return isinstance(value, (basestring, bool))
+
+    def _update_capability_index(self, host, old_capabilities,
+                                 capabilities):
+        """Move host from its old capability values to the new ones."""
+        for name, value in (old_capabilities or {}).iteritems():
+            if self._is_indexable(value):
+                hosts = self.capability_index[name][value]
+                hosts.discard(host)
+                if not hosts:
+                    del self.capability_index[name][value]
+            else:
+                self.unindexed_capabilities[name].discard(host)
+
+        for name, value in capabilities.iteritems():
+            if self._is_indexable(value):
+                values = self.capability_index.setdefault(name, {})
+                values.setdefault(value, set()).add(host)
+            else:
+                hosts = self.unindexed_capabilities.setdefault(name, set())
+                hosts.add(host)
+
+    def _lookup_capability_index(self, name, req):
+        """Return the hosts whose capability satisfies req.
+
+        Only requirements checking equality are answered, None is
+        returned for the others or when some host reports a value of
+        this capability that is not indexed.
+        """
+        if self.unindexed_capabilities.get(name):
+            return None
+        values = self.capability_index.get(name, {})
+
+        words = req.split()
+        op = words[0] if words else None
+        if op == '<is>' and len(words) > 1:
+            wanted = strutils.bool_from_string(words[1])
+            hosts = set()
+            for value, value_hosts in values.iteritems():
+                if strutils.bool_from_string(value) is wanted:
+                    hosts |= value_hosts
+            return hosts
+        if op == '<or>':
+            hosts = set()
+            for choice in words[1::2]:
+                hosts |= values.get(choice, set())
+            return hosts
+        if op == 's==' and len(words) > 1:
+            return set(values.get(words[1], ()))
+        if op in extra_specs_ops._op_methods:
+            return None
+        return set(values.get(req, ()))
+
+    def _get_indexed_candidates(self, filter_properties):
+        """Return the hosts matching the equality-style extra specs.
+
+        None means the extra specs do not restrict the candidates.
+        """
+        resource_type = filter_properties.get('resource_type') or {}
+        extra_specs = resource_type.get('extra_specs') or {}
+        candidates = None
+        for key, req in extra_specs.iteritems():
+            # Same scoping rules as the CapabilitiesFilter, only top level
+            # capabilities are indexed.
+            scope = key.split(':')
+            if len(scope) > 1 and scope[0] != 'capabilities':
+                continue
+            elif scope[0] == 'capabilities':
+                del scope[0]
+            if len(scope) != 1:
+                continue
+            hosts = self._lookup_capability_index(scope[0], req)
+            if hosts is None:
+                continue
+            if candidates is None:
+                candidates = hosts
+            else:
+                candidates &= hosts
+            if not candidates:
+                break
+        return candidates
+
+    def _service_is_up(self, host, service):
+        """Whether the service reported in, in the db or through an RPC."""
+        if utils.service_is_up(service):
+            return True
+        # A recent capability update proves the service is alive even if
+        # our copy of its db record is older.
+        capabilities = self.service_states.get(host)
+        if not capabilities or not capabilities.get('timestamp'):
+            return False
+        elapsed = timeutils.utcnow() - capabilities['timestamp']
+        return utils.total_seconds(elapsed) <= CONF.service_down_time
+
+    def refresh_services(self, context):
+        """Read the volume services from the db into the service cache.
+
+        The cached dict of a service whose record only changed by its
+        heartbeat is kept, so that host states built from it do not need
+        to be rebuilt.
+        """
+        topic = CONF.volume_topic
+        volume_services = db.service_get_all_by_topic(context, topic)
+        services = collections.OrderedDict()
+        for service in volume_services:
+            service = dict(service.iteritems())
+            host = service['host']
+            cached = self.services.get(host)
+            if (cached is not None and
+                    dict(cached, updated_at=None) ==
+                    dict(service, updated_at=None)):
+                cached['updated_at'] = service['updated_at']
+                service = cached
+            services[host] = service
+        self.services = services
+        self.services_refreshed_at = timeutils.utcnow()
+
+        for host in set(self.host_state_map) - set(services):
+            # The service was removed from the db
+            del self.host_state_map[host]
+
+    def _services_are_stale(self):
+        if self.services_refreshed_at is None:
+            return True
+        cache_time = CONF.scheduler_service_cache_time
+        if cache_time <= 0:
+            return True
+        return timeutils.is_older_than(self.services_refreshed_at, cache_time)
+
     def get_all_host_states(self, context):
         """Returns a dict of all the hosts the HostManager
           knows about. Also, each of the consumable resources in HostState
@@ -258,29 +472,32 @@ class HostManager(object):
 
           For example:
           {'192.168.1.100': HostState(), ...}
+
+          Host states are kept between calls and only updated when their
+          service or capabilities changed, the list of services itself is
+          only read from the db once scheduler_service_cache_time expired.
         """
+        if self._services_are_stale():
+            self.refresh_services(context)
 
-        # Get resource usage across the available volume nodes:
-        topic = CONF.volume_topic
-        volume_services = db.service_get_all_by_topic(context, topic)
-        self.host_state_map.clear()
-        for service in volume_services:
-            host = service['host']
-            if not utils.service_is_up(service) or service['disabled']:
+        for host, service in self.services.iteritems():
+            if not self._service_is_up(host, service) or service['disabled']:
                 LOG.warn(_("volume service is down or disabled. "
                            "(host: %s)") % host)
+                self.host_state_map.pop(host, None)
                 continue
             capabilities = self.service_states.get(host, None)
             host_state = self.host_state_map.get(host)
             if host_state:
-                # copy capabilities to host_state.capabilities
-                host_state.update_capabilities(capabilities,
-                                               dict(service.iteritems()))
+                if (host_state.service.data is not service or
+                        (capabilities is not None and
+                         host_state.capabilities.data is not capabilities)):
+                    # copy capabilities to host_state.capabilities
+                    host_state.update_capabilities(capabilities, service)
             else:
                 host_state = self.host_state_cls(host,
                                                  capabilities=capabilities,
-                                                 service=
-                                                 dict(service.iteritems()))
+                                                 service=service)
                 self.host_state_map[host] = host_state
             # update host_state
             host_state.update_from_volume_capability(capabilities)
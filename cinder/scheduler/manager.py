@@ -31,6 +31,8 @@ from cinder.openstack.common import excutils
 from cinder.openstack.common import importutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common.notifier import api as notifier
+from cinder.openstack.common import periodic_task
+from cinder import quota
 from cinder.volume.flows import create_volume
 from cinder.volume import rpcapi as volume_rpcapi
 
@@ -43,14 +45,17 @@ scheduler_driver_opt = cfg.StrOpt('scheduler_driver',
 
 CONF = cfg.CONF
 CONF.register_opt(scheduler_driver_opt)
+CONF.import_opt('scheduler_collect_stats', 'cinder.scheduler.host_manager')
 
 LOG = logging.getLogger(__name__)
 
+QUOTAS = quota.QUOTAS
+
 
 class SchedulerManager(manager.Manager):
     """Chooses a host to create volumes."""
 
-    RPC_API_VERSION = '1.3'
+    RPC_API_VERSION = '1.5'
 
     def __init__(self, scheduler_driver=None, service_name=None,
                  *args, **kwargs):
@@ -96,6 +101,49 @@ class SchedulerManager(manager.Manager):
             LOG.warn(_("Failed to successfully complete"
                        " schedule volume using flow: %s"), flow)
 
+    def create_volumes(self, context, topic, request_specs,
+                       filter_properties=None):
+        """Place several volumes at once and cast their creation."""
+        if filter_properties is None:
+            filter_properties = {}
+        volume_state = {'volume_state': {'status': 'error'}}
+        try:
+            failures = self.driver.schedule_create_volumes(context,
+                                                           request_specs,
+                                                           filter_properties)
+        except Exception as ex:
+            # Drivers report the failures of the volumes they cast in the
+            # returned dict, so none of the volumes was cast
+            with excutils.save_and_reraise_exception():
+                for request_spec in request_specs:
+                    self._set_volume_state_and_notify('create_volume',
+                                                      volume_state,
+                                                      context, ex,
+                                                      request_spec)
+
+        for request_spec in request_specs:
+            ex = failures.get(request_spec['volume_id'])
+            if ex is not None:
+                self._set_volume_state_and_notify('create_volume',
+                                                  volume_state,
+                                                  context, ex, request_spec)
+
+    def get_scheduler_stats(self, context):
+        """Return the filter and weigher statistics of this scheduler."""
+        return self.driver.host_manager.stats.report()
+
+    @periodic_task.periodic_task
+    def _report_scheduler_stats(self, context):
+        if not CONF.scheduler_collect_stats:
+            return
+        summary = self.driver.host_manager.stats.summary()
+        if summary:
+            LOG.info(_("Scheduler stats: %s") % summary)
+
+    @periodic_task.periodic_task
+    def _expire_reservations(self, context):
+        QUOTAS.expire(context)
+
     def request_service_capabilities(self, context):
         volume_rpcapi.VolumeAPI().publish_service_capabilities(context)
 
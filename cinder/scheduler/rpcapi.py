@@ -37,6 +37,8 @@ class SchedulerAPI(cinder.openstack.common.rpc.proxy.RpcProxy):
         1.2 - Add request_spec, filter_properties arguments
               to create_volume()
         1.3 - Add migrate_volume_to_host() method
+        1.4 - Add create_volumes() method
+        1.5 - Add get_scheduler_stats() method
     '''
 
     RPC_API_VERSION = '1.0'
@@ -74,6 +76,21 @@ class SchedulerAPI(cinder.openstack.common.rpc.proxy.RpcProxy):
             filter_properties=filter_properties),
             version='1.3')
 
+    def create_volumes(self, ctxt, topic, request_specs,
+                       filter_properties=None):
+        request_specs_p = [jsonutils.to_primitive(request_spec)
+                           for request_spec in request_specs]
+        return self.cast(ctxt, self.make_msg(
+            'create_volumes',
+            topic=topic,
+            request_specs=request_specs_p,
+            filter_properties=filter_properties),
+            version='1.4')
+
+    def get_scheduler_stats(self, ctxt):
+        return self.call(ctxt, self.make_msg('get_scheduler_stats'),
+                         version='1.5')
+
     def update_service_capabilities(self, ctxt,
                                     service_name, host,
                                     capabilities):
@@ -0,0 +1,88 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+SchedulerStats aggregates how long each filter and weigher took and how
+many hosts it was given and kept, so that the expensive steps of the
+scheduling chain can be found.
+"""
+
+import bisect
+
+
+# Upper bounds, in seconds, of the buckets of the time histograms
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class SchedulerStats(object):
+    """Per filter and per weigher statistics."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # { (<kind>, <name>): {statistic: value} }
+        self._entries = {}
+
+    def record(self, kind, name, elapsed, hosts_in, hosts_out):
+        """Account for one run of a filter or weigher.
+
+        :param kind: 'filter' or 'weigher'
+        :param name: class name of the filter or weigher
+        :param elapsed: wall time it took, in seconds
+        :param hosts_in: number of hosts it was given
+        :param hosts_out: number of hosts it kept
+        """
+        entry = self._entries.get((kind, name))
+        if entry is None:
+            entry = {'calls': 0,
+                     'total_time': 0.0,
+                     'max_time': 0.0,
+                     'hosts_in': 0,
+                     'hosts_out': 0,
+                     # One more bucket for the times above the last bound
+                     'histogram': [0] * (len(BUCKETS) + 1)}
+            self._entries[(kind, name)] = entry
+        entry['calls'] += 1
+        entry['total_time'] += elapsed
+        entry['max_time'] = max(entry['max_time'], elapsed)
+        entry['hosts_in'] += hosts_in
+        entry['hosts_out'] += hosts_out
+        entry['histogram'][bisect.bisect_left(BUCKETS, elapsed)] += 1
+
+    def report(self):
+        """Return the statistics as a dict of lists, by kind."""
+        report = {'filters': [], 'weighers': []}
+        for (kind, name), entry in sorted(self._entries.iteritems()):
+            histogram = dict(('%s' % bound, count) for bound, count
+                             in zip(BUCKETS, entry['histogram']))
+            histogram['+inf'] = entry['histogram'][-1]
+            item = dict(entry, name=name, histogram=histogram)
+            item['average_time'] = entry['total_time'] / entry['calls']
+            report[kind + 's'].append(item)
+        return report
+
+    def summary(self):
+        """Return a one line summary of the statistics."""
+        items = []
+        for (kind, name), entry in sorted(self._entries.iteritems()):
+            items.append('%s %d calls %.4fs avg %.4fs max %d->%d hosts' %
+                         (name, entry['calls'],
+                          entry['total_time'] / entry['calls'],
+                          entry['max_time'], entry['hosts_in'],
+                          entry['hosts_out']))
+        return '; '.join(items)
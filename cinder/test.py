@@ -41,6 +41,7 @@ from cinder.db import migration
 from cinder.openstack.common.db.sqlalchemy import session
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import timeutils
+from cinder import quota
 from cinder import service
 from cinder.tests import conf_fixture
 
@@ -169,6 +170,9 @@ class TestCase(testtools.TestCase):
         self._services = []
 
         CONF.set_override('fatal_exception_format_errors', True)
+        # Do not keep the quota resources of the volume types of a
+        # previous test
+        quota.QUOTAS.invalidate_resources()
         # This will be cleaned up by the NestedTempfile fixture
         CONF.set_override('lock_path', tempfile.mkdtemp())
 
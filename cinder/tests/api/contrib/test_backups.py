@@ -59,7 +59,7 @@ class BackupsAPITestCase(test.TestCase):
                        display_description='this is a test backup',
                        container='volumebackups',
                        status='creating',
-                       size=0, object_count=0):
+                       size=0, object_count=0, parent_id=None):
         """Create a backup object."""
         backup = {}
         backup['volume_id'] = volume_id
@@ -74,6 +74,7 @@ class BackupsAPITestCase(test.TestCase):
         backup['fail_reason'] = ''
         backup['size'] = size
         backup['object_count'] = object_count
+        backup['parent_id'] = parent_id
         return db.backup_create(context.get_admin_context(), backup)['id']
 
     @staticmethod
@@ -212,7 +213,7 @@ class BackupsAPITestCase(test.TestCase):
         res_dict = json.loads(res.body)
 
         self.assertEqual(res.status_int, 200)
-        self.assertEqual(len(res_dict['backups'][0]), 12)
+        self.assertEqual(len(res_dict['backups'][0]), 13)
         self.assertEqual(res_dict['backups'][0]['availability_zone'], 'az1')
         self.assertEqual(res_dict['backups'][0]['container'],
                          'volumebackups')
@@ -226,7 +227,7 @@ class BackupsAPITestCase(test.TestCase):
         self.assertEqual(res_dict['backups'][0]['status'], 'creating')
         self.assertEqual(res_dict['backups'][0]['volume_id'], '1')
 
-        self.assertEqual(len(res_dict['backups'][1]), 12)
+        self.assertEqual(len(res_dict['backups'][1]), 13)
         self.assertEqual(res_dict['backups'][1]['availability_zone'], 'az1')
         self.assertEqual(res_dict['backups'][1]['container'],
                          'volumebackups')
@@ -240,7 +241,7 @@ class BackupsAPITestCase(test.TestCase):
         self.assertEqual(res_dict['backups'][1]['status'], 'creating')
         self.assertEqual(res_dict['backups'][1]['volume_id'], '1')
 
-        self.assertEqual(len(res_dict['backups'][2]), 12)
+        self.assertEqual(len(res_dict['backups'][2]), 13)
         self.assertEqual(res_dict['backups'][2]['availability_zone'], 'az1')
         self.assertEqual(res_dict['backups'][2]['container'],
                          'volumebackups')
@@ -273,7 +274,7 @@ class BackupsAPITestCase(test.TestCase):
         dom = minidom.parseString(res.body)
         backup_detail = dom.getElementsByTagName('backup')
 
-        self.assertEqual(backup_detail.item(0).attributes.length, 11)
+        self.assertEqual(backup_detail.item(0).attributes.length, 12)
         self.assertEqual(
             backup_detail.item(0).getAttribute('availability_zone'), 'az1')
         self.assertEqual(
@@ -294,7 +295,7 @@ class BackupsAPITestCase(test.TestCase):
         self.assertEqual(
             int(backup_detail.item(0).getAttribute('volume_id')), 1)
 
-        self.assertEqual(backup_detail.item(1).attributes.length, 11)
+        self.assertEqual(backup_detail.item(1).attributes.length, 12)
         self.assertEqual(
             backup_detail.item(1).getAttribute('availability_zone'), 'az1')
         self.assertEqual(
@@ -315,7 +316,7 @@ class BackupsAPITestCase(test.TestCase):
         self.assertEqual(
             int(backup_detail.item(1).getAttribute('volume_id')), 1)
 
-        self.assertEqual(backup_detail.item(2).attributes.length, 11)
+        self.assertEqual(backup_detail.item(2).attributes.length, 12)
         self.assertEqual(
             backup_detail.item(2).getAttribute('availability_zone'), 'az1')
         self.assertEqual(
@@ -367,6 +368,58 @@ class BackupsAPITestCase(test.TestCase):
 
         db.volume_destroy(context.get_admin_context(), volume_id)
 
+    def test_create_incremental_backup_json(self):
+        self.stubs.Set(cinder.db, 'service_get_all_by_topic',
+                       self._stub_service_get_all_by_topic)
+
+        volume_id = utils.create_volume(self.context, size=5)['id']
+        parent_id = self._create_backup(volume_id, status='available')
+
+        body = {"backup": {"display_name": "nightly002",
+                           "volume_id": volume_id,
+                           "container": "nightlybackups",
+                           "parent_id": parent_id,
+                           }
+                }
+        req = webob.Request.blank('/v2/fake/backups')
+        req.method = 'POST'
+        req.headers['Content-Type'] = 'application/json'
+        req.body = json.dumps(body)
+        res = req.get_response(fakes.wsgi_app())
+        res_dict = json.loads(res.body)
+
+        self.assertEqual(res.status_int, 202)
+        self.assertEqual(
+            self._get_backup_attrib(res_dict['backup']['id'], 'parent_id'),
+            parent_id)
+
+        db.volume_destroy(context.get_admin_context(), volume_id)
+
+    def test_create_incremental_backup_of_other_volume(self):
+        volume_id = utils.create_volume(self.context, size=5)['id']
+        parent_id = self._create_backup(status='available')
+
+        body = {"backup": {"display_name": "nightly002",
+                           "volume_id": volume_id,
+                           "container": "nightlybackups",
+                           "parent_id": parent_id,
+                           }
+                }
+        req = webob.Request.blank('/v2/fake/backups')
+        req.method = 'POST'
+        req.headers['Content-Type'] = 'application/json'
+        req.body = json.dumps(body)
+        res = req.get_response(fakes.wsgi_app())
+        res_dict = json.loads(res.body)
+
+        self.assertEqual(res.status_int, 400)
+        self.assertEqual(res_dict['badRequest']['message'],
+                         'Invalid backup: Parent backup must be a backup '
+                         'of the same volume')
+
+        db.volume_destroy(context.get_admin_context(), volume_id)
+        db.backup_destroy(context.get_admin_context(), parent_id)
+
     def test_create_backup_xml(self):
         self.stubs.Set(cinder.db, 'service_get_all_by_topic',
                        self._stub_service_get_all_by_topic)
@@ -611,6 +664,25 @@ class BackupsAPITestCase(test.TestCase):
 
         db.backup_destroy(context.get_admin_context(), backup_id)
 
+    def test_delete_backup_with_incremental_backups(self):
+        backup_id = self._create_backup(status='available')
+        child_id = self._create_backup(status='available',
+                                       parent_id=backup_id)
+        req = webob.Request.blank('/v2/fake/backups/%s' %
+                                  backup_id)
+        req.method = 'DELETE'
+        req.headers['Content-Type'] = 'application/json'
+        res = req.get_response(fakes.wsgi_app())
+        res_dict = json.loads(res.body)
+
+        self.assertEqual(res.status_int, 400)
+        self.assertEqual(res_dict['badRequest']['message'],
+                         'Invalid backup: Backup has incremental backups '
+                         'depending on it')
+
+        db.backup_destroy(context.get_admin_context(), child_id)
+        db.backup_destroy(context.get_admin_context(), backup_id)
+
     def test_restore_backup_volume_id_specified_json(self):
         backup_id = self._create_backup(status='available')
         # need to create the volume referenced below first
@@ -0,0 +1,73 @@
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from lxml import etree
+
+from cinder.api.contrib import scheduler_stats
+from cinder import context
+from cinder import exception
+from cinder.scheduler import rpcapi as scheduler_rpcapi
+from cinder import test
+
+
+FAKE_STATS = {'filters': [{'name': 'CapacityFilter',
+                           'calls': 2,
+                           'total_time': 0.5,
+                           'average_time': 0.25,
+                           'max_time': 0.3,
+                           'hosts_in': 10,
+                           'hosts_out': 4,
+                           'histogram': {'0.5': 2}}],
+              'weighers': []}
+
+
+def fake_get_scheduler_stats(self, ctxt):
+    return FAKE_STATS
+
+
+class FakeRequest(object):
+    environ = {'cinder.context': context.get_admin_context()}
+    GET = {}
+
+
+class SchedulerStatsTest(test.TestCase):
+
+    def setUp(self):
+        super(SchedulerStatsTest, self).setUp()
+        self.controller = scheduler_stats.SchedulerStatsController()
+        self.stubs.Set(scheduler_rpcapi.SchedulerAPI, 'get_scheduler_stats',
+                       fake_get_scheduler_stats)
+
+    def test_index(self):
+        result = self.controller.index(FakeRequest())
+        self.assertEqual({'scheduler_stats': FAKE_STATS}, result)
+
+    def test_index_non_admin(self):
+        req = FakeRequest()
+        req.environ = {'cinder.context': context.RequestContext('user',
+                                                                'project')}
+        self.assertRaises(exception.PolicyNotAuthorized,
+                          self.controller.index, req)
+
+    def test_index_xml_serializer(self):
+        serializer = scheduler_stats.SchedulerStatsTemplate()
+        text = serializer.serialize({'scheduler_stats': FAKE_STATS})
+        tree = etree.fromstring(text)
+
+        self.assertEqual('scheduler_stats', tree.tag)
+        filters = tree.find('filters').findall('filter')
+        self.assertEqual(1, len(filters))
+        self.assertEqual('CapacityFilter', filters[0].get('name'))
+        self.assertEqual('4', filters[0].get('hosts_out'))
@@ -0,0 +1,80 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+
+import webob
+
+from cinder import context
+from cinder import test
+from cinder.tests.api import fakes
+from cinder.tests.api.v2 import stubs
+from cinder import volume
+
+
+def app():
+    # no auth, just let environ['cinder.context'] pass through
+    api = fakes.router.APIRouter()
+    mapper = fakes.urlmap.URLMap()
+    mapper['/v2'] = api
+    return mapper
+
+
+class VolumeBatchTest(test.TestCase):
+
+    def setUp(self):
+        super(VolumeBatchTest, self).setUp()
+        self.requests = []
+
+        def fake_create_volumes(volume_api, ctxt, volume_requests):
+            self.requests.extend(volume_requests)
+            return [stubs.stub_volume(str(i), display_name=request['name'])
+                    for i, request in enumerate(volume_requests)]
+
+        self.stubs.Set(volume.API, 'create_volumes', fake_create_volumes)
+        self.stubs.Set(volume.API, 'get', stubs.stub_volume_get)
+
+    def _create(self, body):
+        req = webob.Request.blank('/v2/fake/os-volume-batch')
+        req.method = 'POST'
+        req.body = json.dumps(body)
+        req.headers['Content-Type'] = 'application/json'
+        req.environ['cinder.context'] = context.RequestContext('fake',
+                                                               'fake')
+        return req.get_response(app())
+
+    def test_create(self):
+        res = self._create({'volumes': [{'size': 1, 'name': 'vol1'},
+                                        {'size': 2, 'name': 'vol2',
+                                         'availability_zone': 'zone1'}]})
+
+        self.assertEqual(202, res.status_int)
+        volumes = json.loads(res.body)['volumes']
+        self.assertEqual(['0', '1'], [vol['id'] for vol in volumes])
+        self.assertEqual(['vol1', 'vol2'], [vol['name'] for vol in volumes])
+        self.assertEqual([1, 2], [request['size']
+                                  for request in self.requests])
+        self.assertEqual([None, 'zone1'],
+                         [request['availability_zone']
+                          for request in self.requests])
+
+    def test_create_without_volumes(self):
+        res = self._create({'volume': {'size': 1}})
+        self.assertEqual(400, res.status_int)
+        res = self._create({'volumes': {'size': 1}})
+        self.assertEqual(400, res.status_int)
+        self.assertEqual([], self.requests)
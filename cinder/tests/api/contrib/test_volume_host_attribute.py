@@ -96,6 +96,19 @@ class VolumeHostAttributeTest(test.TestCase):
         vol = json.loads(res.body)['volumes']
         self.assertEqual(vol[0]['os-vol-host-attr:host'], 'host001')
 
+    def test_list_detail_volumes_uses_listed_volumes(self):
+        def fail_volume_get(*args, **kwargs):
+            self.fail('volume_api.get called for a listed volume')
+
+        self.stubs.Set(volume.API, 'get', fail_volume_get)
+        ctx = context.RequestContext('admin', 'fake', True)
+        req = webob.Request.blank('/v2/fake/volumes/detail')
+        req.method = 'GET'
+        req.environ['cinder.context'] = ctx
+        res = req.get_response(app())
+        vol = json.loads(res.body)['volumes']
+        self.assertEqual(vol[0]['os-vol-host-attr:host'], 'host001')
+
     def test_list_detail_volumes_unallowed(self):
         ctx = context.RequestContext('non-admin', 'fake', False)
         req = webob.Request.blank('/v2/fake/volumes/detail')
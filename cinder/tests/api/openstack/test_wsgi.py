@@ -107,6 +107,17 @@ class RequestTest(test.TestCase):
         request.headers.pop('Accept-Language')
         self.assertEqual(request.best_match_language(), None)
 
+    def test_cache_and_retrieve_volumes(self):
+        request = wsgi.Request.blank('/foo')
+        volumes = [{'id': 'id%s' % i} for i in xrange(3)]
+        request.cache_db_volumes(volumes)
+        request.cache_db_volume({'id': 'id3'})
+
+        self.assertEqual(4, len(request.get_db_volumes()))
+        self.assertEqual(volumes[1], request.get_db_volume('id1'))
+        self.assertEqual(None, request.get_db_volume('id4'))
+        self.assertEqual(None, request.get_db_item('snapshots', 'id1'))
+
 
 class ActionDispatcherTest(test.TestCase):
     def test_dispatch(self):
@@ -97,16 +97,41 @@ def stub_volume_get_notfound(self, context, volume_id):
     raise exc.NotFound
 
 
-def stub_volume_get_all(context, search_opts=None):
+def stub_volume_get_all(context, marker=None, limit=None,
+                        sort_key='created_at', sort_dir='desc', filters=None,
+                        offset=None):
     return [stub_volume(100, project_id='fake'),
             stub_volume(101, project_id='superfake'),
             stub_volume(102, project_id='superduperfake')]
 
 
-def stub_volume_get_all_by_project(self, context, search_opts=None):
+def stub_volume_get_all_by_project(self, context, marker=None, limit=None,
+                                   sort_key=None, sort_dir=None, filters=None,
+                                   offset=None):
     return [stub_volume_get(self, context, '1')]
 
 
+def stub_filter_volumes(volumes, filters):
+    """Filter volumes the way volume_get_all* does in the database."""
+    def _matches(volume):
+        for key, value in (filters or {}).iteritems():
+            if key == 'metadata':
+                metadata = dict((item['key'], item['value'])
+                                for item in volume['volume_metadata'])
+                for meta_key, meta_value in value.iteritems():
+                    if metadata.get(meta_key) != meta_value:
+                        return False
+            elif key == 'no_migration_targets':
+                status = volume.get('migration_status')
+                if status and status.startswith('target:'):
+                    return False
+            elif volume.get(key) != value:
+                return False
+        return True
+
+    return [volume for volume in volumes if _matches(volume)]
+
+
 def stub_snapshot(id, **kwargs):
     snapshot = {'id': id,
                 'volume_id': 12,
@@ -121,16 +146,23 @@ def stub_snapshot(id, **kwargs):
     return snapshot
 
 
-def stub_snapshot_get_all(self):
+def stub_snapshot_get_all(self, filters=None, **kwargs):
     return [stub_snapshot(100, project_id='fake'),
             stub_snapshot(101, project_id='superfake'),
             stub_snapshot(102, project_id='superduperfake')]
 
 
-def stub_snapshot_get_all_by_project(self, context):
+def stub_snapshot_get_all_by_project(self, context, filters=None, **kwargs):
     return [stub_snapshot(1)]
 
 
+def stub_filter_snapshots(snapshots, filters):
+    """Filter snapshots the way snapshot_get_all* does in the database."""
+    return [snapshot for snapshot in snapshots
+            if all(snapshot.get(key) == value
+                   for key, value in (filters or {}).iteritems())]
+
+
 def stub_snapshot_update(self, context, *args, **param):
     pass
 
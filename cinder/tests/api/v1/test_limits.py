@@ -18,7 +18,9 @@ Tests dealing with HTTP rate-limiting.
 """
 
 import httplib
+import os
 import StringIO
+import tempfile
 from xml.dom import minidom
 
 from lxml import etree
@@ -578,6 +580,73 @@ class LimiterTest(BaseLimitTestSuite):
         results = list(self._check(2, "PUT", "/anything", "user0"))
         self.assertEqual(expected, results)
 
+    def test_only_limits_for_verb_are_checked(self):
+        """
+        Ensure a request doesn't look at limits set on other verbs.
+        """
+        checked = []
+        orig_matches = limits.Limit.matches
+
+        def fake_matches(limit, verb, url):
+            checked.append(limit.verb)
+            return orig_matches(limit, verb, url)
+
+        self.stubs.Set(limits.Limit, 'matches', fake_matches)
+        self.limiter.check_for_delay("POST", "/volumes")
+        self.assertTrue(checked)
+        self.assertEqual(set(["POST"]), set(checked))
+
+
+class SharedMemoryLimiterTest(LimiterTest):
+    """
+    Tests for the `limits.SharedMemoryLimiter` class.
+    """
+
+    def setUp(self):
+        """Run before each test."""
+        super(SharedMemoryLimiterTest, self).setUp()
+        fd, self.limiter_file = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.limiter_file)
+        self.userlimits = {'limits.user3': '',
+                           'limits.user0': '(get, *, .*, 4, minute);'
+                                           '(put, *, .*, 2, minute)'}
+        self.limiter = self._make_limiter()
+
+    def _make_limiter(self):
+        return limits.SharedMemoryLimiter(TEST_LIMITS,
+                                          limiter_file=self.limiter_file,
+                                          limiter_slots=64,
+                                          **self.userlimits)
+
+    def test_state_is_shared(self):
+        """
+        Ensure limiters using the same file, e.g. in different API
+        workers, enforce the limits together.
+        """
+        other = self._make_limiter()
+        for i in xrange(5):
+            self.assertEqual((None, None),
+                             self.limiter.check_for_delay("PUT", "/anything"))
+            self.assertEqual((None, None),
+                             other.check_for_delay("PUT", "/anything"))
+        self.assertEqual(6.0,
+                         other.check_for_delay("PUT", "/anything")[0])
+        self.assertEqual(0, self.limiter.get_limits()[3]['remaining'])
+
+    def test_drained_slots_are_recycled(self):
+        """
+        Ensure the file doesn't fill up with limits nobody hits anymore.
+        """
+        self.limiter = limits.SharedMemoryLimiter(
+            TEST_LIMITS, limiter_file=self.limiter_file, limiter_slots=1)
+        self.limiter.check_for_delay("GET", "/delayed", "user1")
+        self.assertEqual(60.0, self.limiter.check_for_delay(
+            "GET", "/delayed", "user1")[0])
+        self.time += 60.0
+        self.assertEqual((None, None), self.limiter.check_for_delay(
+            "GET", "/delayed", "user2"))
+
 
 class WsgiLimiterTest(BaseLimitTestSuite):
     """
@@ -349,12 +349,13 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_name(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
                 stubs.stub_volume(3, display_name='vol3'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
 
@@ -374,8 +375,9 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_metadata(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1',
                                   status='available',
                                   volume_metadata=[{'key': 'key1',
@@ -388,7 +390,7 @@ class VolumeApiTest(test.TestCase):
                                   status='in-use',
                                   volume_metadata=[{'key': 'key1',
                                                     'value': 'value2'}]),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
 
@@ -432,12 +434,13 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_status(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1', status='available'),
                 stubs.stub_volume(2, display_name='vol2', status='available'),
                 stubs.stub_volume(3, display_name='vol3', status='in-use'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
         # no status filter
@@ -558,11 +561,13 @@ class VolumeApiTest(test.TestCase):
     def test_volume_detail_limit_offset(self):
         def volume_detail_limit_offset(is_admin):
             def stub_volume_get_all_by_project(context, project_id, marker,
-                                               limit, sort_key, sort_dir):
-                return [
+                                               limit, sort_key, sort_dir,
+                                               filters=None, offset=None):
+                self.assertEqual((2, 1), (limit, offset))
+                return stubs.stub_filter_volumes([
                     stubs.stub_volume(1, display_name='vol1'),
                     stubs.stub_volume(2, display_name='vol2'),
-                ]
+                ], filters)[offset:offset + limit]
 
             self.stubs.Set(db, 'volume_get_all_by_project',
                            stub_volume_get_all_by_project)
@@ -579,6 +584,32 @@ class VolumeApiTest(test.TestCase):
         #non_admin case
         volume_detail_limit_offset(is_admin=False)
 
+    def test_volume_index_marker(self):
+        def stub_volume_get_all_by_project(context, project_id, marker, limit,
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            self.assertEqual(('1', 1, 0), (marker, limit, offset))
+            return [stubs.stub_volume(2)]
+
+        self.stubs.Set(db, 'volume_get_all_by_project',
+                       stub_volume_get_all_by_project)
+        req = fakes.HTTPRequest.blank('/v1/volumes?marker=1&limit=1')
+        res_dict = self.controller.index(req)
+        self.assertEqual([2], [vol['id'] for vol in res_dict['volumes']])
+
+    def test_volume_index_max_limit(self):
+        def stub_volume_get_all_by_project(context, project_id, marker, limit,
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            self.assertEqual(1000, limit)
+            return []
+
+        self.stubs.Set(db, 'volume_get_all_by_project',
+                       stub_volume_get_all_by_project)
+        for url in ('/v1/volumes', '/v1/volumes?limit=5000'):
+            req = fakes.HTTPRequest.blank(url)
+            self.assertEqual([], self.controller.index(req)['volumes'])
+
     def test_volume_delete(self):
         req = fakes.HTTPRequest.blank('/v1/volumes/1')
         resp = self.controller.delete(req, 1)
@@ -403,11 +403,12 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_index_with_marker(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
         req = fakes.HTTPRequest.blank('/v2/volumes?marker=1')
@@ -444,11 +445,12 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_index_limit_offset(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
         req = fakes.HTTPRequest.blank('/v2/volumes?limit=2&offset=1')
@@ -469,11 +471,12 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_detail_with_marker(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
         req = fakes.HTTPRequest.blank('/v2/volumes/detail?marker=1')
@@ -510,11 +513,12 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_detail_limit_offset(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
         req = fakes.HTTPRequest.blank('/v2/volumes/detail?limit=2&offset=1')
@@ -542,12 +546,13 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_name(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1'),
                 stubs.stub_volume(2, display_name='vol2'),
                 stubs.stub_volume(3, display_name='vol3'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
 
@@ -567,8 +572,9 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_metadata(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1',
                                   status='available',
                                   volume_metadata=[{'key': 'key1',
@@ -581,7 +587,7 @@ class VolumeApiTest(test.TestCase):
                                   status='in-use',
                                   volume_metadata=[{'key': 'key1',
                                                     'value': 'value2'}]),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
 
@@ -625,12 +631,13 @@ class VolumeApiTest(test.TestCase):
 
     def test_volume_list_by_status(self):
         def stub_volume_get_all_by_project(context, project_id, marker, limit,
-                                           sort_key, sort_dir):
-            return [
+                                           sort_key, sort_dir, filters=None,
+                                           offset=None):
+            return stubs.stub_filter_volumes([
                 stubs.stub_volume(1, display_name='vol1', status='available'),
                 stubs.stub_volume(2, display_name='vol2', status='available'),
                 stubs.stub_volume(3, display_name='vol3', status='in-use'),
-            ]
+            ], filters)
         self.stubs.Set(db, 'volume_get_all_by_project',
                        stub_volume_get_all_by_project)
         # no status filter
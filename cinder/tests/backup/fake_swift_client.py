@@ -85,11 +85,14 @@ class FakeSwiftConnection(object):
             metadata['backup_name'] = 'fake backup'
             metadata['backup_description'] = 'fake backup description'
             metadata['created_at'] = '2013-02-19 11:20:54,805'
-            metadata['objects'] = [{
-                'backup_001': {'compression': 'zlib', 'length': 10},
-                'backup_002': {'compression': 'zlib', 'length': 10},
-                'backup_003': {'compression': 'zlib', 'length': 10}
-            }]
+            metadata['objects'] = [
+                {'backup_001': {'compression': 'zlib', 'length': 10,
+                                'offset': 0}},
+                {'backup_002': {'compression': 'zlib', 'length': 10,
+                                'offset': 10}},
+                {'backup_003': {'compression': 'zlib', 'length': 10,
+                                'offset': 20}}
+            ]
             metadata_json = json.dumps(metadata, sort_keys=True, indent=2)
             fake_object_body = metadata_json
             return (fake_object_header, fake_object_body)
@@ -111,3 +114,45 @@ class FakeSwiftConnection(object):
         if container == 'socket_error_on_delete':
             raise socket.error(111, 'ECONNREFUSED')
         pass
+
+
+class FakeSwiftClientInMemory(object):
+    """Stores objects in memory so backups can be restored in tests."""
+    containers = {}
+
+    @classmethod
+    def Connection(self, *args, **kargs):
+        LOG.debug("fake FakeSwiftClientInMemory Connection")
+        return FakeSwiftConnectionInMemory(self.containers)
+
+
+class FakeSwiftConnectionInMemory(object):
+    """Keeps the objects put into each container in a shared dict"""
+    def __init__(self, containers):
+        self.containers = containers
+
+    def head_container(self, container):
+        if container not in self.containers:
+            raise swift.ClientException('fake exception',
+                                        http_status=httplib.NOT_FOUND)
+
+    def put_container(self, container):
+        self.containers.setdefault(container, {})
+
+    def get_container(self, container, prefix=None, **kwargs):
+        names = sorted(self.containers[container])
+        if prefix is not None:
+            names = [name for name in names if name.startswith(prefix)]
+        return None, [{'name': name} for name in names]
+
+    def get_object(self, container, name):
+        return None, self.containers[container][name]
+
+    def put_object(self, container, name, reader, content_length=None,
+                   etag=None, chunk_size=None, content_type=None,
+                   headers=None, query_string=None):
+        self.containers[container][name] = reader.read()
+        return 'fake-md5-sum'
+
+    def delete_object(self, container, name):
+        del self.containers[container][name]
@@ -17,6 +17,9 @@
 
 
 import datetime
+import hashlib
+import os
+import tempfile
 
 import glanceclient.exc
 import glanceclient.v2.client
@@ -27,6 +30,7 @@ from cinder import context
 from cinder import exception
 from cinder.image import glance
 from cinder import test
+from cinder import units
 from cinder.tests.glance import stubs as glance_stubs
 
 
@@ -470,6 +474,80 @@ class TestGlanceImageService(test.TestCase):
         self.flags(glance_num_retries=1)
         service.download(self.context, image_id, writer)
 
+    def _create_range_image_service(self, data, checksum=None,
+                                    range_status=206):
+        requests = []
+        self.closed_responses = []
+        closed_responses = self.closed_responses
+
+        class FakeResponse(object):
+            status = range_status
+
+            def close(self):
+                closed_responses.append(self)
+
+        class RangeGlanceStubClient(glance_stubs.StubGlanceClient):
+            def data(self, image_id):
+                self.get(image_id)
+                return [data]
+
+            def raw_request(self, method, url, headers=None):
+                requests.append(headers['Range'])
+                start, end = headers['Range'][len('bytes='):].split('-')
+                chunk = data[int(start):int(end) + 1]
+                return FakeResponse(), [chunk[:1000], chunk[1000:]]
+
+        checksum = checksum or hashlib.md5(data).hexdigest()
+        client = RangeGlanceStubClient(images=[
+            {'id': '1', 'status': 'active', 'is_public': True,
+             'size': len(data), 'checksum': checksum}])
+        return self._create_image_service(client), requests
+
+    def _download_to_file(self, service):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, path)
+        with open(path, 'wb') as f:
+            service.download(self.context, '1', f)
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_download_ranges(self):
+        self.flags(glance_download_concurrency=2,
+                   glance_download_range_size_mb=1)
+        data = ''.join(chr(i % 251) for i in xrange(5 * units.MiB / 2))
+        service, requests = self._create_range_image_service(data)
+        self.assertEqual(data, self._download_to_file(service))
+        self.assertEqual(['bytes=0-1048575',
+                          'bytes=1048576-2097151',
+                          'bytes=2097152-2621439'], sorted(requests))
+
+    def test_download_ranges_not_supported(self):
+        self.flags(glance_download_concurrency=2,
+                   glance_download_range_size_mb=1)
+        data = '\1' * (2 * units.MiB)
+        service, requests = self._create_range_image_service(
+            data, range_status=200)
+        self.assertEqual(data, self._download_to_file(service))
+        self.assertEqual(1, len(requests))
+        self.assertEqual(1, len(self.closed_responses))
+
+    def test_download_ranges_bad_checksum(self):
+        self.flags(glance_download_concurrency=2,
+                   glance_download_range_size_mb=1)
+        data = '\1' * (2 * units.MiB)
+        service, requests = self._create_range_image_service(
+            data, checksum='bad')
+        self.assertRaises(exception.ImageUnacceptable,
+                          self._download_to_file, service)
+
+    def test_download_small_image_single_stream(self):
+        self.flags(glance_download_concurrency=2,
+                   glance_download_range_size_mb=1)
+        service, requests = self._create_range_image_service('data')
+        self.assertEqual('data', self._download_to_file(service))
+        self.assertEqual([], requests)
+
     def test_client_forbidden_converts_to_imagenotauthed(self):
         class MyGlanceStubClient(glance_stubs.StubGlanceClient):
             """A client that raises a Forbidden exception."""
@@ -0,0 +1,126 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Unit tests for the image cache."""
+
+import fcntl
+import os
+import shutil
+import tempfile
+
+from cinder.image import image_cache
+from cinder import test
+from cinder import units
+
+
+class ImageCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ImageCacheTestCase, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir, ignore_errors=True)
+        self.flags(lock_path=self.tempdir)
+        self.cache_dir = os.path.join(self.tempdir, 'cache')
+        self.cache = image_cache.ImageCache(self.cache_dir, 1)
+        self.fills = []
+
+    def _fill(self, data='x'):
+        def fill(path):
+            self.fills.append(path)
+            with open(path, 'wb') as f:
+                f.write(data)
+        return fill
+
+    def _add_entry(self, name, size, mtime):
+        path = os.path.join(self.cache_dir, name)
+        with open(path, 'wb') as f:
+            f.truncate(size)
+        os.utime(path, (mtime, mtime))
+
+    def test_fetch_fills_once(self):
+        with self.cache.fetch('image', 'sum', self._fill('data')) as path:
+            self.assertEqual(os.path.join(self.cache_dir, 'image-sum'), path)
+            with open(path) as f:
+                self.assertEqual('data', f.read())
+        with self.cache.fetch('image', 'sum', self._fill()) as path:
+            self.assertTrue(os.path.exists(path))
+        self.assertEqual(1, len(self.fills))
+        self.assertTrue(self.fills[0].endswith(image_cache.PART_SUFFIX))
+
+    def test_fetch_new_checksum_fills_again(self):
+        with self.cache.fetch('image', 'sum1', self._fill()):
+            pass
+        with self.cache.fetch('image', 'sum2', self._fill()):
+            pass
+        self.assertEqual(2, len(self.fills))
+
+    def test_fetch_fill_failure_leaves_no_entry(self):
+        def fill(path):
+            raise test.TestingException()
+
+        def sut():
+            with self.cache.fetch('image', 'sum', fill):
+                pass
+
+        self.assertRaises(test.TestingException, sut)
+        self.assertEqual([], os.listdir(self.cache_dir))
+
+    def test_fetch_hit_updates_last_use(self):
+        os.makedirs(self.cache_dir)
+        self._add_entry('image-sum', 1, 1000)
+        with self.cache.fetch('image', 'sum', self._fill()) as path:
+            self.assertTrue(os.stat(path).st_mtime > 1000)
+        self.assertEqual([], self.fills)
+
+    def test_evict_least_recently_used(self):
+        os.makedirs(self.cache_dir)
+        self._add_entry('old-sum', units.GiB / 2, 1000)
+        self._add_entry('mid-sum', units.GiB / 2, 2000)
+        self._add_entry('new-sum', units.GiB / 2, 3000)
+        self.cache.evict()
+        self.assertEqual(['mid-sum', 'new-sum'],
+                         [e[0] for e in self.cache.list_entries()])
+
+    def test_evict_skips_entries_in_use(self):
+        os.makedirs(self.cache_dir)
+        self._add_entry('old-sum', units.GiB, 1000)
+        self._add_entry('new-sum', units.GiB, 3000)
+        with self.cache.fetch('old', 'sum', self._fill()):
+            self.cache.evict()
+            self.assertEqual(['old-sum'],
+                             [e[0] for e in self.cache.list_entries()])
+
+    def test_evict_skips_entries_read_by_other_processes(self):
+        os.makedirs(self.cache_dir)
+        self._add_entry('old-sum', units.GiB, 1000)
+        self._add_entry('new-sum', units.GiB, 3000)
+        # A reader in another process holds its own open file description
+        fd = os.open(os.path.join(self.cache_dir, 'old-sum'), os.O_RDONLY)
+        self.addCleanup(os.close, fd)
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        self.assertEqual([], self.cache.purge('old'))
+        self.cache.evict()
+        self.assertEqual(['old-sum'],
+                         [e[0] for e in self.cache.list_entries()])
+
+    def test_purge(self):
+        os.makedirs(self.cache_dir)
+        self._add_entry('image1-sum', 1, 1000)
+        self._add_entry('image2-sum', 1, 2000)
+        self._add_entry('image2-sum' + image_cache.PART_SUFFIX, 1, 2000)
+        self.assertEqual(['image1-sum'], self.cache.purge('image1'))
+        self.assertEqual(['image2-sum'], self.cache.purge())
+        self.assertEqual([], self.cache.list_entries())
@@ -0,0 +1,138 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Unit tests for the image volume cache."""
+
+import datetime
+import fcntl
+
+from cinder import context
+from cinder import db
+from cinder import exception
+from cinder.image import image_volume_cache
+from cinder import test
+from cinder.tests import utils as tests_utils
+
+
+class FakeDriver(object):
+    def __init__(self):
+        self.deleted = []
+        self.busy = set()
+
+    def delete_volume(self, volume):
+        if volume['id'] in self.busy:
+            raise exception.VolumeIsBusy(volume_name=volume['name'])
+        self.deleted.append(volume['id'])
+
+
+class ImageVolumeCacheTestCase(test.TestCase):
+
+    def setUp(self):
+        super(ImageVolumeCacheTestCase, self).setUp()
+        self.context = context.get_admin_context()
+        self.driver = FakeDriver()
+        self.image_meta = {'updated_at': datetime.datetime(2013, 1, 1)}
+
+    def _cache(self, max_size_gb=0, max_count=0):
+        return image_volume_cache.ImageVolumeCache(db, self.driver, 'host',
+                                                   max_size_gb=max_size_gb,
+                                                   max_count=max_count)
+
+    def _add_entry(self, cache, image_id, size=1):
+        volume = tests_utils.create_volume(self.context, host='host',
+                                           status='available', size=size)
+        cache.create_entry(self.context, volume, image_id, self.image_meta)
+        return volume
+
+    def _cached_images(self):
+        return [entry['image_id'] for entry in
+                db.image_volume_cache_get_all_for_host(self.context, 'host')]
+
+    def test_get_entry(self):
+        cache = self._cache()
+        volume = self._add_entry(cache, 'image')
+        entry = cache.get_entry(self.context, 'image', self.image_meta)
+        self.assertEqual(volume['id'], entry['volume_id'])
+        self.assertEqual(None, cache.get_entry(self.context, 'other',
+                                               self.image_meta))
+
+    def test_get_entry_updated_image(self):
+        cache = self._cache()
+        volume = self._add_entry(cache, 'image')
+        image_meta = {'updated_at': datetime.datetime(2013, 1, 2)}
+        self.assertEqual(None, cache.get_entry(self.context, 'image',
+                                               image_meta))
+        self.assertEqual([volume['id']], self.driver.deleted)
+        self.assertEqual([], self._cached_images())
+
+    def test_get_entry_volume_deleted(self):
+        cache = self._cache()
+        volume = self._add_entry(cache, 'image')
+        db.volume_destroy(self.context, volume['id'])
+        self.assertEqual(None, cache.get_entry(self.context, 'image',
+                                               self.image_meta))
+        self.assertEqual([], self._cached_images())
+
+    def test_ensure_space_evicts_least_recently_used(self):
+        cache = self._cache(max_count=2)
+        old = self._add_entry(cache, 'old')
+        self._add_entry(cache, 'new')
+        cache.get_entry(self.context, 'new', self.image_meta)
+        self.assertTrue(cache.ensure_space(self.context, 1))
+        self.assertEqual([old['id']], self.driver.deleted)
+        self.assertEqual(['new'], self._cached_images())
+
+    def test_ensure_space_by_size(self):
+        cache = self._cache(max_size_gb=10)
+        self._add_entry(cache, 'old', size=5)
+        self._add_entry(cache, 'new', size=4)
+        self.assertTrue(cache.ensure_space(self.context, 1))
+        self.assertEqual([], self.driver.deleted)
+        self.assertTrue(cache.ensure_space(self.context, 2))
+        self.assertEqual(['new'], self._cached_images())
+        self.assertFalse(cache.ensure_space(self.context, 11))
+
+    def test_ensure_space_skips_busy_volumes(self):
+        cache = self._cache(max_count=1)
+        volume = self._add_entry(cache, 'image')
+        self.driver.busy.add(volume['id'])
+        self.assertFalse(cache.ensure_space(self.context, 1))
+        self.assertEqual(['image'], self._cached_images())
+
+    def test_ensure_space_skips_volumes_being_cloned(self):
+        cache = self._cache(max_count=1)
+        volume = self._add_entry(cache, 'image')
+        # Another process is cloning the image volume
+        with open(cache._lock_file_path(volume['id']), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            self.assertFalse(cache.ensure_space(self.context, 1))
+            self.assertEqual([], self.driver.deleted)
+            self.assertEqual(['image'], self._cached_images())
+        self.assertTrue(cache.ensure_space(self.context, 1))
+        self.assertEqual([volume['id']], self.driver.deleted)
+
+    def test_use_image_volume(self):
+        cache = self._cache()
+        volume = self._add_entry(cache, 'image')
+        entry = cache.get_entry(self.context, 'image', self.image_meta)
+        with cache.use_image_volume(self.context,
+                                    volume['id']) as image_volume:
+            self.assertEqual(volume['id'], image_volume['id'])
+            self.assertFalse(cache.evict(self.context, entry))
+        self.assertTrue(cache.evict(self.context, entry))
+        with cache.use_image_volume(self.context,
+                                    volume['id']) as image_volume:
+            self.assertEqual(None, image_volume)
@@ -232,3 +232,90 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertRaises(exception.NoValidHost,
                           sched.host_passes_filters,
                           ctx, 'host1', request_spec, {})
+
+    def _batch_request_specs(self, count, size, type_id='fake-type'):
+        return [{'volume_id': 'fake-id%s-%s' % (type_id, x),
+                 'snapshot_id': None,
+                 'image_id': None,
+                 'volume_type': {'id': type_id, 'name': 'LVM_iSCSI'},
+                 'volume_properties': {'project_id': 1,
+                                       'size': size}}
+                for x in xrange(count)]
+
+    def _stub_batch_scheduling(self, sched):
+        placed = []
+
+        def fake_volume_update_db(context, volume_id, host):
+            return {'id': volume_id, 'host': host}
+
+        def fake_create_volume(context, volume, host, **kwargs):
+            placed.append((volume['id'], host))
+
+        self.stubs.Set(filter_scheduler.driver, 'volume_update_db',
+                       fake_volume_update_db)
+        self.stubs.Set(sched.volume_rpcapi, 'create_volume',
+                       fake_create_volume)
+        return placed
+
+    def test_schedule_create_volumes(self):
+        """Capacity consumed by a placement is seen by the next ones."""
+        sched, ctx = self._host_passes_filters_setup()
+        placed = self._stub_batch_scheduling(sched)
+        request_specs = self._batch_request_specs(4, 400)
+
+        failures = sched.schedule_create_volumes(ctx, request_specs, {})
+
+        self.assertEqual(['host1', 'host1', 'host3'],
+                         [host for volume_id, host in placed])
+        self.assertEqual([request_specs[3]['volume_id']], failures.keys())
+        self.assertTrue(isinstance(failures[request_specs[3]['volume_id']],
+                                   exception.NoValidHost))
+
+    def test_schedule_create_volumes_cast_failure(self):
+        """Only the volume whose cast failed is reported."""
+        sched, ctx = self._host_passes_filters_setup()
+        placed = self._stub_batch_scheduling(sched)
+        request_specs = self._batch_request_specs(3, 1)
+        failing_id = request_specs[1]['volume_id']
+        create_volume = sched.volume_rpcapi.create_volume
+
+        def fake_create_volume(context, volume, host, **kwargs):
+            if volume['id'] == failing_id:
+                raise exception.CinderException()
+            create_volume(context, volume, host, **kwargs)
+
+        self.stubs.Set(sched.volume_rpcapi, 'create_volume',
+                       fake_create_volume)
+
+        failures = sched.schedule_create_volumes(ctx, request_specs, {})
+
+        self.assertEqual([failing_id], failures.keys())
+        self.assertEqual([request_specs[0]['volume_id'],
+                          request_specs[2]['volume_id']],
+                         [volume_id for volume_id, host in placed])
+
+    def test_schedule_create_volumes_filters_once_per_group(self):
+        sched, ctx = self._host_passes_filters_setup()
+        placed = self._stub_batch_scheduling(sched)
+        request_specs = (self._batch_request_specs(3, 1, 'type1') +
+                         self._batch_request_specs(2, 1, 'type2'))
+
+        groups = []
+        get_weighted_candidates = sched._get_weighted_candidates
+
+        def fake_get_weighted_candidates(context, request_spec,
+                                         filter_properties=None):
+            groups.append(request_spec['volume_id'])
+            return get_weighted_candidates(context, request_spec,
+                                           filter_properties)
+
+        self.stubs.Set(sched, '_get_weighted_candidates',
+                       fake_get_weighted_candidates)
+
+        failures = sched.schedule_create_volumes(ctx, request_specs, {})
+
+        self.assertEqual({}, failures)
+        self.assertEqual([request_specs[0]['volume_id'],
+                          request_specs[3]['volume_id']], groups)
+        self.assertEqual([spec['volume_id'] for spec in request_specs],
+                         [volume_id for volume_id, host in placed])
@@ -24,6 +24,7 @@ from cinder import db
 from cinder import exception
 from cinder.openstack.common import jsonutils
 from cinder.openstack.common.scheduler import filters
+from cinder.scheduler.filters import extra_specs_ops
 from cinder import test
 from cinder.tests.scheduler import fakes
 from cinder.tests import utils as test_utils
@@ -145,3 +146,85 @@ class HostFiltersTestCase(test.TestCase):
         retry = dict(num_attempts=1, hosts=['host1'])
         filter_properties = dict(retry=retry)
         self.assertFalse(filt_cls.host_passes(host, filter_properties))
+
+    def _capabilities_filter(self):
+        filt_cls = self.class_map['CapabilitiesFilter']
+        self.stubs.Set(filt_cls, '_matchers_cache', {})
+        return filt_cls()
+
+    def test_capabilities_filter_is_cinder_one(self):
+        # The oslo-incubator filter does not compile the extra specs
+        self.assertEqual('cinder.scheduler.filters.capabilities_filter',
+                         self.class_map['CapabilitiesFilter'].__module__)
+
+    def test_capabilities_filter_ops(self):
+        filt = self._capabilities_filter()
+        cases = [({'opt': '1024'}, '= 512', True),
+                 ({'opt': '256'}, '= 512', False),
+                 ({'opt': 'abc'}, '= 512', False),
+                 ({'opt': '512'}, '== 512.0', True),
+                 ({'opt': '512'}, '!= 512', False),
+                 ({'opt': '12'}, '<= 11', False),
+                 ({'opt': '12'}, '>= 11', True),
+                 ({'opt': 'abc'}, 's== abc', True),
+                 ({'opt': 'abd'}, 's> abc', True),
+                 ({'opt': 'abc def'}, '<in> def', True),
+                 ({'opt': 'True'}, '<is> true', True),
+                 ({'opt': False}, '<is> True', False),
+                 ({'opt': 'b'}, '<or> a <or> b <or> c', True),
+                 ({'opt': 'd'}, '<or> a <or> b <or> c', False),
+                 ({'opt': 'plain'}, 'plain', True),
+                 ({'opt': 'other'}, 'plain', False),
+                 ({}, 'plain', False)]
+        for capabilities, req, expected in cases:
+            host = fakes.FakeHostState('host1',
+                                       {'capabilities': capabilities})
+            filter_properties = {'resource_type': {'id': 'type',
+                                                   'extra_specs':
+                                                   {'opt': req}}}
+            self.assertEqual(expected,
+                             filt.host_passes(host, filter_properties),
+                             '%s %s' % (capabilities, req))
+
+    def test_capabilities_filter_scopes(self):
+        filt = self._capabilities_filter()
+        host = fakes.FakeHostState('host1',
+                                   {'capabilities': {'a': {'b': 'c'}}})
+        extra_specs = {'capabilities:a:b': 'c', 'other_scope:x': 'y'}
+        filter_properties = {'resource_type': {'extra_specs': extra_specs}}
+        self.assertTrue(filt.host_passes(host, filter_properties))
+
+        extra_specs['capabilities:a:b:d'] = 'c'
+        self.assertFalse(filt.host_passes(host, filter_properties))
+
+    def test_capabilities_filter_compiles_extra_specs_once(self):
+        filt = self._capabilities_filter()
+        compiled = []
+        make_matcher = extra_specs_ops.make_matcher
+
+        def fake_make_matcher(req):
+            compiled.append(req)
+            return make_matcher(req)
+
+        self.stubs.Set(extra_specs_ops, 'make_matcher', fake_make_matcher)
+
+        hosts = [fakes.FakeHostState('host%s' % x,
+                                     {'capabilities': {'opt': str(x)}})
+                 for x in xrange(4)]
+        filter_properties = {'resource_type': {'id': 'type',
+                                               'extra_specs':
+                                               {'opt': '>= 2'}}}
+        passed = list(filt.filter_all(hosts, filter_properties))
+        self.assertEqual(['host2', 'host3'], [h.host for h in passed])
+        self.assertEqual(['>= 2'], compiled)
+
+        # Served from the cache by the filter of the next request
+        self.assertEqual(2, len(list(self.class_map['CapabilitiesFilter']().
+                                     filter_all(hosts, filter_properties))))
+        self.assertEqual(['>= 2'], compiled)
+
+        # Until the extra specs change
+        filter_properties['resource_type']['extra_specs']['opt'] = '>= 3'
+        self.assertEqual(1, len(list(filt.filter_all(hosts,
+                                                     filter_properties))))
+        self.assertEqual(['>= 2', '>= 3'], compiled)
@@ -16,6 +16,8 @@
 Tests For HostManager
 """
 
+import datetime
+
 from oslo.config import cfg
 
 from cinder import db
@@ -100,6 +102,114 @@ class HostManagerTestCase(test.TestCase):
                                                       fake_properties)
         self._verify_result(info, result)
 
+    def _update_indexed_capabilities(self):
+        capabilities = {
+            'host1': dict(volume_backend_name='lvm', storage_protocol='iSCSI',
+                          thin=True, free_capacity_gb=10),
+            'host2': dict(volume_backend_name='lvm', storage_protocol='FC',
+                          thin='False', free_capacity_gb=10),
+            'host3': dict(volume_backend_name='nfs', storage_protocol='nfs',
+                          thin=False, free_capacity_gb=10),
+        }
+        for host, host_capabilities in capabilities.iteritems():
+            self.host_manager.update_service_capabilities('volume', host,
+                                                          host_capabilities)
+
+    def _indexed_candidates(self, extra_specs):
+        filter_properties = {'resource_type': {'extra_specs': extra_specs}}
+        return self.host_manager._get_indexed_candidates(filter_properties)
+
+    def test_get_indexed_candidates(self):
+        self._update_indexed_capabilities()
+
+        self.assertEqual(None, self._indexed_candidates({}))
+        self.assertEqual(set(['host1', 'host2']),
+                         self._indexed_candidates(
+                             {'volume_backend_name': 'lvm'}))
+        self.assertEqual(set(['host2']),
+                         self._indexed_candidates(
+                             {'capabilities:volume_backend_name': 'lvm',
+                              'storage_protocol': 's== FC'}))
+        self.assertEqual(set(['host2', 'host3']),
+                         self._indexed_candidates({'thin': '<is> False'}))
+        self.assertEqual(set(['host1', 'host3']),
+                         self._indexed_candidates(
+                             {'storage_protocol': '<or> iSCSI <or> nfs'}))
+        self.assertEqual(set(),
+                         self._indexed_candidates(
+                             {'volume_backend_name': 'ceph'}))
+        # Not equality specs, or not about capabilities
+        self.assertEqual(None,
+                         self._indexed_candidates(
+                             {'free_capacity_gb': '>= 5',
+                              'volume_backend_name': 's>= a',
+                              'qos:volume_backend_name': 'ceph'}))
+
+    def test_capability_index_follows_updates(self):
+        self._update_indexed_capabilities()
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(volume_backend_name='nfs'))
+
+        self.assertEqual(set(['host2']),
+                         self._indexed_candidates(
+                             {'volume_backend_name': 'lvm'}))
+        self.assertEqual(set(['host1', 'host3']),
+                         self._indexed_candidates(
+                             {'volume_backend_name': 'nfs'}))
+        self.assertFalse(True in self.host_manager.capability_index['thin'])
+
+        # A value that cannot be indexed disables the index for it
+        self.host_manager.update_service_capabilities(
+            'volume', 'host1', dict(volume_backend_name=1))
+        self.assertEqual(None,
+                         self._indexed_candidates(
+                             {'volume_backend_name': 'nfs'}))
+
+    def test_get_filtered_hosts_uses_capability_index(self):
+        self._update_indexed_capabilities()
+        hosts = [host_manager.HostState(host)
+                 for host in ('host1', 'host2', 'host3')]
+        fake_properties = {'resource_type':
+                           {'extra_specs': {'volume_backend_name': 'lvm'}}}
+
+        info = {'expected_objs': hosts[:2],
+                'expected_fprops': fake_properties}
+        self._mock_get_filtered_hosts(info)
+        self.stubs.Set(FakeFilterClass1, '__name__', 'CapabilitiesFilter')
+
+        self.mox.ReplayAll()
+        result = self.host_manager.get_filtered_hosts(hosts,
+                                                      fake_properties)
+        self._verify_result(info, result)
+
+    def test_get_filtered_and_weighed_hosts_with_stats(self):
+        self.flags(scheduler_collect_stats=True)
+        fake_properties = {'moo': 1, 'cow': 2}
+
+        info = {'expected_objs': self.fake_hosts,
+                'expected_fprops': fake_properties}
+        self._mock_get_filtered_hosts(info)
+
+        self.mox.ReplayAll()
+        result = self.host_manager.get_filtered_hosts(self.fake_hosts,
+                                                      fake_properties)
+        self._verify_result(info, result)
+
+        for host_state in result:
+            host_state.free_capacity_gb = 100
+        weighed_hosts = self.host_manager.get_weighed_hosts(
+            result, fake_properties, ['CapacityWeigher'])
+        self.assertEqual(len(self.fake_hosts), len(weighed_hosts))
+
+        report = self.host_manager.stats.report()
+        self.assertEqual(['FakeFilterClass1'],
+                         [entry['name'] for entry in report['filters']])
+        self.assertEqual(4, report['filters'][0]['hosts_in'])
+        self.assertEqual(4, report['filters'][0]['hosts_out'])
+        self.assertEqual(['CapacityWeigher'],
+                         [entry['name'] for entry in report['weighers']])
+        self.assertEqual(1, report['weighers'][0]['calls'])
+
     def test_update_service_capabilities(self):
         service_states = self.host_manager.service_states
         self.assertDictMatch(service_states, {})
@@ -136,6 +246,7 @@ class HostManagerTestCase(test.TestCase):
         self.assertDictMatch(service_states, expected)
 
     def test_get_all_host_states(self):
+        self.flags(scheduler_service_cache_time=0)
         context = 'fake_context'
         topic = CONF.volume_topic
 
@@ -202,6 +313,111 @@ class HostManagerTestCase(test.TestCase):
             self.assertEqual(host_state_map[host].service,
                              volume_node)
 
+    def _fake_services(self):
+        return [
+            dict(id=1, host='host1', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+            dict(id=2, host='host2', topic='volume', disabled=False,
+                 availability_zone='zone1', updated_at=timeutils.utcnow()),
+        ]
+
+    def test_get_all_host_states_caches_services(self):
+        self.flags(scheduler_service_cache_time=10)
+        context = 'fake_context'
+        topic = CONF.volume_topic
+        services = self._fake_services()
+
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+        self.mox.StubOutWithMock(db, 'service_get_all_by_topic')
+        db.service_get_all_by_topic(context, topic).AndReturn(services)
+        db.service_get_all_by_topic(context, topic).AndReturn(services)
+
+        self.mox.ReplayAll()
+        self.host_manager.get_all_host_states(context)
+        host1_state = self.host_manager.host_state_map['host1']
+        host1_service = host1_state.service
+
+        # Served from the cache, without rebuilding the host states
+        timeutils.advance_time_seconds(5)
+        self.host_manager.get_all_host_states(context)
+        self.assertTrue(self.host_manager.host_state_map['host1'] is
+                        host1_state)
+        self.assertTrue(host1_state.service is host1_service)
+
+        # Read again once expired, the unchanged service is kept
+        timeutils.advance_time_seconds(6)
+        self.host_manager.get_all_host_states(context)
+        self.assertTrue(self.host_manager.host_state_map['host1'] is
+                        host1_state)
+        self.assertTrue(host1_state.service is host1_service)
+        self.mox.VerifyAll()
+
+    def test_get_all_host_states_removes_deleted_services(self):
+        context = 'fake_context'
+        topic = CONF.volume_topic
+        services = self._fake_services()
+
+        self.mox.StubOutWithMock(db, 'service_get_all_by_topic')
+        db.service_get_all_by_topic(context, topic).AndReturn(services)
+        db.service_get_all_by_topic(context, topic).AndReturn(services[:1])
+
+        self.mox.ReplayAll()
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(2, len(self.host_manager.host_state_map))
+
+        self.host_manager.refresh_services(context)
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(['host1'], self.host_manager.host_state_map.keys())
+
+    def test_capability_update_keeps_host_up(self):
+        context = 'fake_context'
+        topic = CONF.volume_topic
+        services = self._fake_services()
+        for service in services:
+            service['updated_at'] -= datetime.timedelta(hours=1)
+
+        self.mox.StubOutWithMock(db, 'service_get_all_by_topic')
+        db.service_get_all_by_topic(context, topic).AndReturn(services)
+
+        self.mox.ReplayAll()
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(0, len(self.host_manager.host_state_map))
+
+        self.host_manager.update_service_capabilities(
+            'volume', 'host2', dict(free_capacity_gb=10,
+                                    total_capacity_gb=10,
+                                    reserved_percentage=0))
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(['host2'], self.host_manager.host_state_map.keys())
+        self.assertEqual(10,
+                         self.host_manager.host_state_map['host2'].
+                         free_capacity_gb)
+
+    def test_capability_update_from_new_host_refreshes_services(self):
+        context = 'fake_context'
+        topic = CONF.volume_topic
+        services = self._fake_services()
+
+        self.mox.StubOutWithMock(db, 'service_get_all_by_topic')
+        db.service_get_all_by_topic(context, topic).AndReturn(services[:1])
+        db.service_get_all_by_topic(context, topic).AndReturn(services)
+        capabilities = dict(free_capacity_gb=10, total_capacity_gb=10,
+                            reserved_percentage=0)
+
+        self.mox.ReplayAll()
+        self.host_manager.get_all_host_states(context)
+        self.host_manager.update_service_capabilities('volume', 'host1',
+                                                      capabilities)
+        self.host_manager.get_all_host_states(context)
+        self.host_manager.update_service_capabilities('volume', 'host2',
+                                                      capabilities)
+        self.host_manager.get_all_host_states(context)
+        self.assertEqual(['host1', 'host2'],
+                         sorted(self.host_manager.host_state_map.keys()))
+        self.mox.VerifyAll()
+
 
 class HostStateTestCase(test.TestCase):
     """Test case for HostState class"""
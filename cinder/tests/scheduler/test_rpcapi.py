@@ -92,3 +92,16 @@ class SchedulerRpcAPITestCase(test.TestCase):
                                  request_spec='fake_request_spec',
                                  filter_properties='filter_properties',
                                  version='1.3')
+
+    def test_create_volumes(self):
+        self._test_scheduler_api('create_volumes',
+                                 rpc_method='cast',
+                                 topic='topic',
+                                 request_specs=['fake_request_spec'],
+                                 filter_properties='filter_properties',
+                                 version='1.4')
+
+    def test_get_scheduler_stats(self):
+        self._test_scheduler_api('get_scheduler_stats',
+                                 rpc_method='call',
+                                 version='1.5')
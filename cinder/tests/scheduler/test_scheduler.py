@@ -105,6 +105,54 @@ class SchedulerManagerTestCase(test.TestCase):
                                    request_spec=request_spec,
                                    filter_properties={})
 
+    def test_create_volumes_puts_unplaced_volumes_in_error_state(self):
+        """Test NoValidHost failures reported by schedule_create_volumes.
+
+        Only the volumes that could not be placed are put in 'error'
+        state.
+        """
+        self._mox_schedule_method_helper('schedule_create_volumes')
+        self.mox.StubOutWithMock(db, 'volume_update')
+
+        request_specs = [{'volume_id': 1}, {'volume_id': 2}]
+
+        self.manager.driver.schedule_create_volumes(
+            self.context, request_specs, {}).AndReturn(
+                {2: exception.NoValidHost(reason="")})
+        db.volume_update(self.context, 2, {'status': 'error'})
+
+        self.mox.ReplayAll()
+        self.manager.create_volumes(self.context, 'fake_topic',
+                                    request_specs)
+
+    def test_create_volumes_exception_puts_volumes_in_error_state(self):
+        self._mox_schedule_method_helper('schedule_create_volumes')
+        self.mox.StubOutWithMock(db, 'volume_update')
+
+        request_specs = [{'volume_id': 1}, {'volume_id': 2}]
+
+        self.manager.driver.schedule_create_volumes(
+            self.context, request_specs, {}).AndRaise(self.AnException())
+        db.volume_update(self.context, 1, {'status': 'error'})
+        db.volume_update(self.context, 2, {'status': 'error'})
+
+        self.mox.ReplayAll()
+        self.assertRaises(self.AnException, self.manager.create_volumes,
+                          self.context, 'fake_topic', request_specs)
+
+    def test_get_scheduler_stats(self):
+        stats = self.manager.driver.host_manager.stats
+        stats.record('filter', 'CapacityFilter', 0.1, 2, 1)
+        result = self.manager.get_scheduler_stats(self.context)
+        self.assertEqual(['CapacityFilter'],
+                         [entry['name'] for entry in result['filters']])
+
+    def test_expire_reservations(self):
+        self.mox.StubOutWithMock(manager.QUOTAS, 'expire')
+        manager.QUOTAS.expire(self.context)
+        self.mox.ReplayAll()
+        self.manager._expire_reservations(self.context)
+
     def test_migrate_volume_exception_returns_volume_state(self):
         """Test NoValidHost exception behavior for migrate_volume_to_host.
 
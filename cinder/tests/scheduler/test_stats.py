@@ -0,0 +1,68 @@
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For SchedulerStats.
+"""
+
+from cinder.scheduler import stats
+from cinder import test
+
+
+class SchedulerStatsTestCase(test.TestCase):
+    """Test case for SchedulerStats class."""
+
+    def setUp(self):
+        super(SchedulerStatsTestCase, self).setUp()
+        self.stats = stats.SchedulerStats()
+
+    def test_empty_report(self):
+        self.assertEqual({'filters': [], 'weighers': []},
+                         self.stats.report())
+        self.assertEqual('', self.stats.summary())
+
+    def test_report(self):
+        self.stats.record('filter', 'CapacityFilter', 0.002, 10, 6)
+        self.stats.record('filter', 'CapacityFilter', 0.004, 8, 2)
+        self.stats.record('filter', 'CapabilitiesFilter', 7.0, 6, 6)
+        self.stats.record('weigher', 'CapacityWeigher', 0.0005, 6, 6)
+
+        report = self.stats.report()
+        self.assertEqual(['CapabilitiesFilter', 'CapacityFilter'],
+                         [entry['name'] for entry in report['filters']])
+
+        capacity = report['filters'][1]
+        self.assertEqual(2, capacity['calls'])
+        self.assertAlmostEqual(0.006, capacity['total_time'])
+        self.assertAlmostEqual(0.003, capacity['average_time'])
+        self.assertEqual(0.004, capacity['max_time'])
+        self.assertEqual(18, capacity['hosts_in'])
+        self.assertEqual(8, capacity['hosts_out'])
+        self.assertEqual(2, capacity['histogram']['0.005'])
+        self.assertEqual(0, capacity['histogram']['+inf'])
+        self.assertEqual(1, report['filters'][0]['histogram']['+inf'])
+
+        self.assertEqual(['CapacityWeigher'],
+                         [entry['name'] for entry in report['weighers']])
+        self.assertEqual(1, report['weighers'][0]['histogram']['0.001'])
+
+        summary = self.stats.summary()
+        self.assertTrue('CapacityFilter 2 calls 0.0030s avg 0.0040s max '
+                        '18->8 hosts' in summary)
+
+    def test_reset(self):
+        self.stats.record('filter', 'CapacityFilter', 0.002, 10, 6)
+        self.stats.reset()
+        self.assertEqual({'filters': [], 'weighers': []},
+                         self.stats.report())
@@ -260,6 +260,34 @@ class BackupCephTestCase(test.TestCase):
             # Ensure the files are equal
             self.assertEquals(checksum.digest(), self.checksum.digest())
 
+    def test_transfer_data_skips_zeros(self):
+        self._set_common_backup_stubs(self.service)
+        self.service.chunk_size = self.chunk_size
+
+        # Zero the second half of the volume
+        self.volume_file.seek(self.length / 2)
+        self.volume_file.write('\0' * (self.length / 2))
+
+        with tempfile.NamedTemporaryFile() as test_file:
+            test_file.truncate(self.length)
+            test_file.seek(0)
+            written = []
+            real_write = test_file.write
+
+            def write_data(data):
+                written.append(len(data))
+                real_write(data)
+
+            self.stubs.Set(test_file, 'write', write_data)
+            self.volume_file.seek(0)
+            self.service._transfer_data(self.volume_file, 'src_foo', test_file,
+                                        'dest_foo', self.length)
+
+            self.assertEquals(sum(written), self.length / 2)
+            test_file.seek(0)
+            self.volume_file.seek(0)
+            self.assertEquals(test_file.read(), self.volume_file.read())
+
     def test_transfer_data_from_file_to_file(self):
         self._set_common_backup_stubs(self.service)
 
@@ -19,12 +19,15 @@ Tests for Backup swift code.
 
 import bz2
 import hashlib
+import json
 import os
 import tempfile
 import zlib
 
+import eventlet
 from swiftclient import client as swift
 
+from cinder.backup.drivers import swift as swift_backup
 from cinder.backup.drivers.swift import SwiftBackupDriver
 from cinder import context
 from cinder import db
@@ -32,6 +35,8 @@ from cinder import exception
 from cinder.openstack.common import log as logging
 from cinder import test
 from cinder.tests.backup.fake_swift_client import FakeSwiftClient
+from cinder.tests.backup.fake_swift_client import FakeSwiftClientInMemory
+from cinder.tests.backup.fake_swift_client import FakeSwiftConnectionInMemory
 
 
 LOG = logging.getLogger(__name__)
@@ -55,11 +60,13 @@ class BackupSwiftTestCase(test.TestCase):
                'status': 'available'}
         return db.volume_create(self.ctxt, vol)['id']
 
-    def _create_backup_db_entry(self, container='test-container'):
-        backup = {'id': 123,
+    def _create_backup_db_entry(self, container='test-container',
+                                backup_id=123, parent_id=None):
+        backup = {'id': backup_id,
                   'size': 1,
                   'container': container,
-                  'volume_id': '1234-5678-1234-8888'}
+                  'volume_id': '1234-5678-1234-8888',
+                  'parent_id': parent_id}
         return db.backup_create(self.ctxt, backup)['id']
 
     def setUp(self):
@@ -102,6 +109,115 @@ class BackupSwiftTestCase(test.TestCase):
         backup = db.backup_get(self.ctxt, 123)
         service.backup(backup, self.volume_file)
 
+    def test_backup_pipelined(self):
+        self._create_backup_db_entry()
+        self.flags(backup_swift_object_size=8 * 1024)
+        self.flags(backup_swift_upload_concurrency=4)
+        self.flags(backup_swift_max_inflight_chunks=6)
+        service = SwiftBackupDriver(self.ctxt)
+        written = {}
+
+        def fake_write_metadata(backup, volume_id, container, object_list,
+                                holes=None):
+            written['objects'] = object_list
+
+        self.stubs.Set(service, '_write_metadata', fake_write_metadata)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        object_names = [obj.keys()[0] for obj in written['objects']]
+        self.assertEquals(len(object_names), 16)
+        self.assertEquals(object_names, sorted(object_names))
+        offsets = [obj.values()[0]['offset'] for obj in written['objects']]
+        self.assertEquals(offsets, range(0, 128 * 1024, 8 * 1024))
+        backup = db.backup_get(self.ctxt, 123)
+        self.assertEquals(backup['object_count'], 17)
+
+    def test_backup_pipelined_put_object_wraps_socket_error(self):
+        self._create_backup_db_entry(container='socket_error_on_put')
+        self.flags(backup_swift_object_size=8 * 1024)
+        self.flags(backup_swift_upload_concurrency=4)
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        self.assertRaises(exception.SwiftConnectionFailed,
+                          service.backup,
+                          backup, self.volume_file)
+
+    def test_backup_incremental(self):
+        self.stubs.Set(swift, 'Connection', FakeSwiftClientInMemory.Connection)
+        self.stubs.Set(FakeSwiftClientInMemory, 'containers', {})
+        self.flags(backup_swift_object_size=32 * 1024)
+        self.flags(backup_swift_block_size=4 * 1024)
+        self._create_backup_db_entry(backup_id=123)
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        # Change a block and make an incremental backup of the volume
+        self.volume_file.seek(40 * 1024)
+        self.volume_file.write(os.urandom(4 * 1024))
+        self._create_backup_db_entry(backup_id=124, parent_id=123)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 124)
+        service.backup(backup, self.volume_file)
+
+        metadata = service._read_metadata(backup)
+        self.assertEquals(metadata['parent_id'], '123')
+        self.assertEquals(len(metadata['objects']), 1)
+        obj = metadata['objects'][0].values()[0]
+        self.assertEquals(obj['offset'], 40 * 1024)
+        self.assertEquals(obj['length'], 4 * 1024)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(backup, '1234-5678-1234-8888', restored_file)
+            restored_file.seek(0)
+            self.volume_file.seek(0)
+            self.assertEquals(restored_file.read(), self.volume_file.read())
+
+    def test_backup_sparse(self):
+        self.stubs.Set(swift, 'Connection', FakeSwiftClientInMemory.Connection)
+        self.stubs.Set(FakeSwiftClientInMemory, 'containers', {})
+        self.flags(backup_swift_object_size=32 * 1024)
+        self.flags(backup_swift_block_size=4 * 1024)
+        # Zero 40KB straddling the first two objects
+        self.volume_file.seek(24 * 1024)
+        self.volume_file.write('\0' * 40 * 1024)
+        self._create_backup_db_entry()
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        metadata = service._read_metadata(backup)
+        self.assertEquals(metadata['holes'], [[24 * 1024, 40 * 1024]])
+        uploaded = sum(obj.values()[0]['length']
+                       for obj in metadata['objects'])
+        self.assertEquals(uploaded, 88 * 1024)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            # Garbage where the hole is must be overwritten with zeros
+            restored_file.write('\xff' * 128 * 1024)
+            restored_file.seek(0)
+            service.restore(backup, '1234-5678-1234-8888', restored_file)
+            restored_file.seek(0)
+            self.volume_file.seek(0)
+            self.assertEquals(restored_file.read(), self.volume_file.read())
+
+    def test_write_zeros(self):
+        service = SwiftBackupDriver(self.ctxt)
+        mib = 1024 * 1024
+        with tempfile.NamedTemporaryFile() as volume_file:
+            # Garbage in the first and third MB, zeros in the second
+            volume_file.write('\xff' * mib + '\0' * mib + '\xff' * mib)
+            volume_file.seek(0)
+            service._write_zeros(volume_file, 3 * mib)
+            self.assertEquals(volume_file.tell(), 3 * mib)
+            volume_file.seek(0)
+            self.assertEquals(volume_file.read(), '\0' * 3 * mib)
+
     def test_backup_default_container(self):
         self._create_backup_db_entry(container=None)
         service = SwiftBackupDriver(self.ctxt)
@@ -149,6 +265,84 @@ class BackupSwiftTestCase(test.TestCase):
             backup = db.backup_get(self.ctxt, 123)
             service.restore(backup, '1234-5678-1234-8888', volume_file)
 
+    def test_restore_parallel(self):
+        self.stubs.Set(swift, 'Connection', FakeSwiftClientInMemory.Connection)
+        self.stubs.Set(FakeSwiftClientInMemory, 'containers', {})
+        self.flags(backup_swift_object_size=8 * 1024)
+        self.flags(backup_swift_restore_concurrency=4)
+        self.flags(backup_swift_restore_fsync_interval=32 * 1024)
+        self._create_backup_db_entry()
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        fsyncs = []
+        self.stubs.Set(os, 'fsync', lambda fileno: fsyncs.append(fileno))
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(backup, '1234-5678-1234-8888', restored_file)
+            restored_file.seek(0)
+            self.volume_file.seek(0)
+            self.assertEquals(restored_file.read(), self.volume_file.read())
+        # One sync for every 32KB written and a final one
+        self.assertEquals(len(fsyncs), 5)
+
+    def test_restore_v1_out_of_order(self):
+        self.stubs.Set(swift, 'Connection', FakeSwiftClientInMemory.Connection)
+        self.stubs.Set(FakeSwiftClientInMemory, 'containers', {})
+        self.flags(backup_swift_object_size=8 * 1024)
+        self.flags(backup_swift_restore_concurrency=4)
+        self._create_backup_db_entry()
+        service = SwiftBackupDriver(self.ctxt)
+        self.volume_file.seek(0)
+        backup = db.backup_get(self.ctxt, 123)
+        service.backup(backup, self.volume_file)
+
+        # Turn the backup into a v1 one
+        backup = db.backup_get(self.ctxt, 123)
+        objects = FakeSwiftClientInMemory.containers[backup['container']]
+        metadata_name = service._metadata_filename(backup)
+        metadata = json.loads(objects[metadata_name])
+        metadata['version'] = '1.0.0'
+        metadata.pop('parent_id', None)
+        objects[metadata_name] = json.dumps(metadata)
+        first_object = metadata['objects'][0].keys()[0]
+
+        # The first object is the last one to be fetched
+        get_object = FakeSwiftConnectionInMemory.get_object
+        written = []
+
+        def fake_get_object(conn, container, name):
+            if name == first_object:
+                for _i in xrange(1000):
+                    if len(written) == len(metadata['objects']) - 1:
+                        break
+                    eventlet.sleep(0.001)
+            return get_object(conn, container, name)
+
+        self.stubs.Set(FakeSwiftConnectionInMemory, 'get_object',
+                       fake_get_object)
+
+        class RecordingFile(object):
+            def __init__(self, volume_file):
+                self.volume_file = volume_file
+
+            def write(self, data):
+                written.append(self.volume_file.tell())
+                self.volume_file.write(data)
+
+            def __getattr__(self, name):
+                return getattr(self.volume_file, name)
+
+        with tempfile.NamedTemporaryFile() as restored_file:
+            service.restore(backup, '1234-5678-1234-8888',
+                            RecordingFile(restored_file))
+            restored_file.seek(0)
+            self.volume_file.seek(0)
+            self.assertEquals(restored_file.read(), self.volume_file.read())
+        self.assertEqual(len(metadata['objects']), len(written))
+        self.assertEqual(0, written[-1])
+
     def test_restore_wraps_socket_error(self):
         container_name = 'socket_error_on_get'
         self._create_backup_db_entry(container=container_name)
@@ -191,11 +385,48 @@ class BackupSwiftTestCase(test.TestCase):
         compressor = service._get_compressor('None')
         self.assertEquals(compressor, None)
         compressor = service._get_compressor('zlib')
-        self.assertEquals(compressor, zlib)
+        self.assertEquals(compressor.module, zlib)
+        compressor = service._get_compressor('gzip')
+        self.assertEquals(compressor.name, 'zlib')
         compressor = service._get_compressor('bz2')
-        self.assertEquals(compressor, bz2)
+        self.assertEquals(compressor.module, bz2)
         self.assertRaises(ValueError, service._get_compressor, 'fake')
 
+    def test_get_compressor_level(self):
+        service = SwiftBackupDriver(self.ctxt)
+        compressor = service._get_compressor('zlib', 1)
+        data = 'cinder' * 1024
+        self.assertEquals(compressor.compress(data), zlib.compress(data, 1))
+        self.assertEquals(compressor.decompress(compressor.compress(data)),
+                          data)
+
+    def test_get_compressor_auto(self):
+        self.stubs.Set(swift_backup, 'AUTO_COMPRESSION_PREFERENCE',
+                       ['fake', 'zlib'])
+        service = SwiftBackupDriver(self.ctxt)
+        compressor = service._get_compressor('auto')
+        self.assertEquals(compressor.name, 'zlib')
+
+    def test_backup_auto_compression(self):
+        self._create_backup_db_entry()
+        self.flags(backup_compression_algorithm='auto')
+        service = SwiftBackupDriver(self.ctxt)
+        obj, data, md5 = service._compress_chunk('random', os.urandom(1024),
+                                                 0)
+        self.assertEquals(obj['random']['compression'], 'none')
+        obj, data, md5 = service._compress_chunk('text', 'cinder' * 1024, 0)
+        self.assertEquals(obj['text']['compression'], service.compressor.name)
+
+    def test_compress_chunk_does_not_log(self):
+        # It runs in a native thread, where the green logging locks must
+        # not be taken
+        self.flags(backup_compression_algorithm='auto')
+        service = SwiftBackupDriver(self.ctxt)
+        self.mox.StubOutWithMock(swift_backup, 'LOG')
+        self.mox.ReplayAll()
+        service._compress_chunk('random', os.urandom(1024), 0)
+        service._compress_chunk('text', 'cinder' * 1024, 0)
+
     def test_check_container_exists(self):
         service = SwiftBackupDriver(self.ctxt)
         exists = service._check_container_exists('fake_container')
@@ -0,0 +1,172 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""Unit tests for the native volume copy engine."""
+
+import errno
+import os
+import shutil
+import tempfile
+
+import eventlet
+
+from cinder import test
+from cinder import units
+from cinder.volume import copy_engine
+from cinder.volume import utils as volume_utils
+
+
+BLOCK = 64 * units.KiB
+
+
+class CopyEngineTestCase(test.TestCase):
+
+    def setUp(self):
+        super(CopyEngineTestCase, self).setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir, ignore_errors=True)
+        self.src = os.path.join(self.tempdir, 'src')
+        self.dest = os.path.join(self.tempdir, 'dest')
+        self.writes = []
+        real_write = copy_engine._write
+
+        def _write(fd, offset, data):
+            self.writes.append(offset)
+            real_write(fd, offset, data)
+
+        self.stubs.Set(copy_engine, '_write', _write)
+
+    def _make_file(self, path, size, blocks=None):
+        """Create a sparse file of size bytes, blocks is {index: char}."""
+        with open(path, 'wb') as f:
+            f.truncate(size)
+            for index, char in (blocks or {}).items():
+                f.seek(index * BLOCK)
+                f.write(char * BLOCK)
+
+    def _read_file(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _copy(self, size, sparse=False, workers=3):
+        copy_engine.VolumeCopier(self.src, self.dest, size, sparse=sparse,
+                                 workers=workers, io_size=BLOCK).copy()
+
+    def test_copy(self):
+        self._make_file(self.src, 8 * BLOCK, {0: 'a', 3: 'b', 7: 'c'})
+        self._make_file(self.dest, 8 * BLOCK)
+        self._copy(8 * BLOCK)
+        self.assertEqual(self._read_file(self.src),
+                         self._read_file(self.dest))
+
+    def test_copy_to_sparse_dest_skips_zeros(self):
+        self._make_file(self.src, 8 * BLOCK, {1: 'a', 6: 'b'})
+        self._make_file(self.dest, 0)
+        self._copy(8 * BLOCK, sparse=True)
+        self.assertEqual(self._read_file(self.src),
+                         self._read_file(self.dest))
+        self.assertEqual([BLOCK, 6 * BLOCK], sorted(self.writes))
+
+    def test_copy_zeros_only_where_dest_is_not_zero(self):
+        self._make_file(self.src, 4 * BLOCK, {0: 'a'})
+        self._make_file(self.dest, 4 * BLOCK, {2: 'x'})
+        self._copy(4 * BLOCK)
+        self.assertEqual(self._read_file(self.src),
+                         self._read_file(self.dest))
+        self.assertEqual([0, 2 * BLOCK], sorted(self.writes))
+
+    def test_clear(self):
+        self._make_file(self.dest, 4 * BLOCK, {1: 'x', 3: 'y'})
+        copy_engine.VolumeCopier(copy_engine.ZERO_SOURCE, self.dest,
+                                 4 * BLOCK, sparse=True,
+                                 io_size=BLOCK).copy()
+        self.assertEqual('\0' * 4 * BLOCK, self._read_file(self.dest))
+        self.assertEqual(4, len(self.writes))
+
+    def test_copy_failure(self):
+        self._make_file(self.src, 4 * BLOCK, {0: 'a'})
+        self._make_file(self.dest, 4 * BLOCK)
+
+        def _write(fd, offset, data):
+            raise OSError(errno.EIO, 'I/O error')
+
+        self.stubs.Set(copy_engine, '_write', _write)
+        self.assertRaises(OSError, self._copy, 4 * BLOCK)
+
+    def test_data_extents_without_hole_support(self):
+        def _lseek(fd, offset, whence):
+            raise OSError(errno.EINVAL, 'Invalid argument')
+
+        self.stubs.Set(os, 'lseek', _lseek)
+        self.assertEqual([(0, 100)], list(copy_engine.data_extents(0, 100)))
+
+    def test_data_extents(self):
+        self._make_file(self.src, 64 * BLOCK, {32: 'a'})
+        fd = os.open(self.src, os.O_RDONLY)
+        try:
+            extents = list(copy_engine.data_extents(fd, 64 * BLOCK))
+        finally:
+            os.close(fd)
+        # Holes are only reported where the file system supports it
+        self.assertTrue(sum(length for _start, length in extents) <=
+                        64 * BLOCK)
+        self.assertTrue(any(start <= 32 * BLOCK and
+                            start + length >= 33 * BLOCK
+                            for start, length in extents))
+
+    def test_throttle(self):
+        now = [100.0]
+        sleeps = []
+        self.stubs.Set(copy_engine.time, 'time', lambda: now[0])
+        self.stubs.Set(eventlet, 'sleep', sleeps.append)
+        throttle = copy_engine._Throttle(100)
+        throttle.consume(50)
+        now[0] += 0.25
+        throttle.consume(100)
+        self.assertEqual([0.5, 1.25], sleeps)
+
+    def test_copy_volume_engines(self):
+        self._make_file(self.src, units.MiB, {0: 'a'})
+        self._make_file(self.dest, units.MiB)
+        self.flags(volume_copy_engine='native', volume_copy_io_size_mb=1)
+        volume_utils.copy_volume(self.src, self.dest, 1)
+        self.assertEqual(self._read_file(self.src),
+                         self._read_file(self.dest))
+
+        # The default engine runs dd
+        self.flags(volume_copy_engine='dd')
+        self.mox.StubOutWithMock(volume_utils.utils, 'execute')
+        self._expect_dd(volume_utils.utils.execute)
+        self.mox.ReplayAll()
+        volume_utils.copy_volume(self.src, self.dest, 1,
+                                 execute=volume_utils.utils.execute)
+        self.mox.VerifyAll()
+
+    def test_copy_volume_native_with_custom_execute(self):
+        self.flags(volume_copy_engine='native')
+        self.mox.StubOutWithMock(copy_engine, 'copy_volume')
+        execute = self.mox.CreateMockAnything()
+        self._expect_dd(execute)
+        self.mox.ReplayAll()
+        # The native engine can not run the copy through another execute
+        volume_utils.copy_volume(self.src, self.dest, 1, execute=execute)
+        self.mox.VerifyAll()
+
+    def _expect_dd(self, execute):
+        execute('dd', 'count=0', 'if=%s' % self.src, 'of=%s' % self.dest,
+                'iflag=direct', 'oflag=direct', run_as_root=True)
+        execute('dd', 'if=%s' % self.src, 'of=%s' % self.dest, 'count=1',
+                'bs=1M', 'iflag=direct', 'oflag=direct', run_as_root=True)
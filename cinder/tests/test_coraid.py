@@ -774,7 +774,8 @@ class CoraidDriverImageTestCases(CoraidDriverTestCase):
         root_helper = 'sudo cinder-rootwrap None'
 
         self.mox.StubOutWithMock(connector, 'get_connector_properties')
-        connector.get_connector_properties(root_helper).\
+        connector.get_connector_properties(root_helper,
+                                           execute=utils.execute).\
             AndReturn({})
 
         self.mox.StubOutWithMock(utils, 'brick_get_connector')
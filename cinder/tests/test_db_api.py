@@ -19,7 +19,9 @@ from oslo.config import cfg
 
 from cinder import context
 from cinder import db
+from cinder.db.sqlalchemy import api as sqlalchemy_api
 from cinder import exception
+from cinder.openstack.common.db import exception as db_exc
 from cinder.openstack.common import uuidutils
 from cinder.quota import ReservableResource
 from cinder import test
@@ -368,6 +370,14 @@ class DBAPIVolumeTestCase(BaseTest):
         self._assertEqualListsOfObjects(volumes[2:], db.volume_get_all(
                                         self.ctxt, 2, 2, 'id', None))
 
+    def test_volume_get_all_offset_passed(self):
+        volumes = [db.volume_create(self.ctxt, {'id': i})
+                   for i in xrange(1, 6)]
+
+        self._assertEqualListsOfObjects(volumes[3:], db.volume_get_all(
+                                        self.ctxt, 1, 2, 'id', 'asc',
+                                        offset=2))
+
     def test_volume_get_all_by_host(self):
         volumes = []
         for i in xrange(3):
@@ -403,6 +413,64 @@ class DBAPIVolumeTestCase(BaseTest):
                                             self.ctxt, 'p%d' % i, None,
                                             None, 'host', None))
 
+    def test_volume_get_all_by_project_with_filters(self):
+        vols = [
+            db.volume_create(self.ctxt, {'project_id': 'p1',
+                                         'display_name': 'vol%d' % i,
+                                         'status': status,
+                                         'metadata': {'key1': value}})
+            for i, (status, value) in enumerate([('available', 'value1'),
+                                                 ('available', 'value2'),
+                                                 ('in-use', 'value2')])]
+        db.volume_create(self.ctxt, {'project_id': 'p2',
+                                     'status': 'available'})
+        ids = [vol['id'] for vol in vols]
+
+        def get_all(filters, limit=None):
+            return [vol['id'] for vol in db.volume_get_all_by_project(
+                self.ctxt, 'p1', None, limit, 'display_name', 'asc',
+                filters=filters)]
+
+        self.assertEqual(ids[1:2], get_all({'display_name': 'vol1'}))
+        self.assertEqual(ids[1:], get_all({'metadata': {'key1': 'value2'}}))
+        self.assertEqual(ids[2:], get_all({'status': 'in-use',
+                                           'metadata': {'key1': 'value2'}}))
+        self.assertEqual([], get_all({'metadata': {'key1': 'value3'}}))
+        self.assertEqual([], get_all({'not_a_column': 'value'}))
+        # pagination applies to the filtered result
+        self.assertEqual(ids[:2], get_all({'status': 'available'}, limit=2))
+
+    def test_volume_get_all_by_project_with_typed_filters(self):
+        vols = [db.volume_create(self.ctxt, {'project_id': 'p1',
+                                             'display_name': 'vol%d' % i,
+                                             'size': size,
+                                             'bootable': bootable})
+                for i, (size, bootable) in enumerate([(1, True),
+                                                      (2, False)])]
+        ids = [vol['id'] for vol in vols]
+
+        def get_all(filters):
+            return [vol['id'] for vol in db.volume_get_all_by_project(
+                self.ctxt, 'p1', None, None, 'display_name', 'asc',
+                filters=filters)]
+
+        # Values from a query string are converted to the column type
+        self.assertEqual(ids[:1], get_all({'bootable': 'True'}))
+        self.assertEqual(ids[1:], get_all({'bootable': 'false'}))
+        self.assertEqual(ids[1:], get_all({'size': '2'}))
+        self.assertEqual(ids[:1], get_all({'bootable': True, 'size': 1}))
+        self.assertEqual(ids, get_all({'size': ['1', '2']}))
+        # and match nothing when they can not be one
+        self.assertEqual([], get_all({'bootable': 'maybe'}))
+        self.assertEqual([], get_all({'size': 'abc'}))
+
+    def test_volume_get_all_no_migration_targets(self):
+        vols = [db.volume_create(self.ctxt, {'migration_status': status})
+                for status in (None, 'migrating', 'target:fake')]
+        self._assertEqualListsOfObjects(vols[:2], db.volume_get_all(
+            self.ctxt, None, None, 'host', None,
+            filters={'no_migration_targets': True}))
+
     def test_volume_get_iscsi_target_num(self):
         target = db.iscsi_target_create_safe(self.ctxt, {'volume_id': 42,
                                                          'target_num': 43})
@@ -450,6 +518,48 @@ class DBAPIVolumeTestCase(BaseTest):
 
 
 class DBAPISnapshotTestCase(BaseTest):
+    def test_snapshot_get_all_with_filters(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        snapshots = [db.snapshot_create(self.ctxt,
+                                        {'volume_id': 1, 'project_id': 'p1',
+                                         'status': status})
+                     for status in ('available', 'creating')]
+
+        result = db.snapshot_get_all_by_project(
+            self.ctxt, 'p1', filters={'status': 'creating'})
+        self.assertEqual([snapshots[1]['id']], [s['id'] for s in result])
+        result = db.snapshot_get_all(self.ctxt,
+                                     filters={'status': 'available'})
+        self.assertEqual([snapshots[0]['id']], [s['id'] for s in result])
+        self.assertEqual([], db.snapshot_get_all(
+            self.ctxt, filters={'not_a_column': 'value'}))
+        self.assertEqual([], db.snapshot_get_all(
+            self.ctxt, filters={'volume_size': 'abc'}))
+
+    def test_snapshot_get_all_by_project_paginated(self):
+        db.volume_create(self.ctxt, {'id': 1})
+        snapshots = [db.snapshot_create(self.ctxt,
+                                        {'id': str(i), 'volume_id': 1,
+                                         'project_id': 'p1',
+                                         'display_name': 'snap%d' % (i % 3)})
+                     for i in xrange(6)]
+
+        def _get_ids(**kwargs):
+            return [s['id'] for s in db.snapshot_get_all_by_project(
+                self.ctxt, 'p1', **kwargs)]
+
+        self.assertEqual(['5', '4'], _get_ids(limit=2))
+        self.assertEqual(['3', '2'], _get_ids(marker='4', limit=2))
+        self.assertEqual(['1', '0'], _get_ids(limit=2, offset=4))
+        self.assertEqual(['0', '3', '1', '4'],
+                         _get_ids(sort_key='display_name', sort_dir='asc',
+                                  limit=4))
+        self.assertEqual(['2', '5'],
+                         _get_ids(sort_key='display_name', sort_dir='asc',
+                                  marker=snapshots[4]['id']))
+        self.assertRaises(exception.SnapshotNotFound, _get_ids,
+                          marker='missing')
+
     def test_snapshot_metadata_get(self):
         metadata = {'a': 'b', 'c': 'd'}
         db.volume_create(self.ctxt, {'id': 1})
@@ -666,6 +776,43 @@ class DBAPIReservationTestCase(BaseTest):
                              self.ctxt,
                              'project1'))
 
+    def test_reservation_expire_batches(self):
+        _quota_reserve(self.ctxt, 'project1')
+        self.assertEqual(1, db.reservation_expire(self.ctxt, batch_size=1,
+                                                  max_reservations=1))
+        remaining = db.reservation_get_all_by_project(self.ctxt, 'project1')
+        del remaining['project_id']
+        self.assertEqual(1, len(remaining))
+        resource, deltas = remaining.items()[0]
+        usages = db.quota_usage_get_all_by_project(self.ctxt, 'project1')
+        for res in ('volumes', 'gigabytes'):
+            expected = sum(deltas.values()) if res == resource else 0
+            self.assertEqual(expected, usages[res]['reserved'])
+
+        self.assertEqual(1, db.reservation_expire(self.ctxt, batch_size=1))
+        self.assertEqual(0, db.reservation_expire(self.ctxt))
+        expected = {'project_id': 'project1',
+                    'gigabytes': {'reserved': 0, 'in_use': 0},
+                    'volumes': {'reserved': 0, 'in_use': 0}}
+        self.assertEqual(expected,
+                         db.quota_usage_get_all_by_project(
+                             self.ctxt,
+                             'project1'))
+
+    def test_reservation_applied_once(self):
+        reservations = _quota_reserve(self.ctxt, 'project1')
+        db.reservation_commit(self.ctxt, reservations, 'project1')
+        db.reservation_commit(self.ctxt, reservations, 'project1')
+        db.reservation_rollback(self.ctxt, reservations, 'project1')
+        expected = {'project_id': 'project1',
+                    'volumes': {'reserved': 0, 'in_use': 1},
+                    'gigabytes': {'reserved': 0, 'in_use': 2},
+                    }
+        self.assertEqual(expected,
+                         db.quota_usage_get_all_by_project(
+                             self.ctxt,
+                             'project1'))
+
 
 class DBAPIQuotaTestCase(BaseTest):
 
@@ -725,6 +872,23 @@ class DBAPIQuotaTestCase(BaseTest):
             self.assertTrue(reservation.resource in res_names)
             res_names.remove(reservation.resource)
 
+    def test_quota_reserve_retries_deadlock(self):
+        calls = []
+        get_quota_usages = sqlalchemy_api._get_quota_usages
+
+        def fake_get_quota_usages(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise db_exc.DBDeadlock()
+            return get_quota_usages(*args, **kwargs)
+
+        self.stubs.Set(sqlalchemy_api, '_get_quota_usages',
+                       fake_get_quota_usages)
+        self.stubs.Set(sqlalchemy_api.time, 'sleep', lambda interval: None)
+        reservations = _quota_reserve(self.ctxt, 'project1')
+        self.assertEqual(2, len(reservations))
+        self.assertEqual(2, len(calls))
+
     def test_quota_destroy_all_by_project(self):
         reservations = _quota_reserve(self.ctxt, 'project1')
         db.quota_destroy_all_by_project(self.ctxt, 'project1')
@@ -818,7 +982,8 @@ class DBAPIBackupTestCase(BaseTest):
             'service_metadata': 'metadata',
             'service': 'service',
             'size': 1000,
-            'object_count': 100}
+            'object_count': 100,
+            'parent_id': 'parent'}
         if one:
             return base_values
 
@@ -850,6 +1015,11 @@ class DBAPIBackupTestCase(BaseTest):
                                            self.created[1]['host'])
         self._assertEqualObjects(self.created[1], byhost[0])
 
+    def test_backup_get_all_by_parent(self):
+        byparent = db.backup_get_all_by_parent(self.ctxt,
+                                               self.created[1]['parent_id'])
+        self._assertEqualObjects(self.created[1], byparent[0])
+
     def test_backup_get_all_by_project(self):
         byproj = db.backup_get_all_by_project(self.ctxt,
                                               self.created[1]['project_id'])
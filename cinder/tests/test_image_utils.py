@@ -17,13 +17,18 @@
 """Unit tests for image utils."""
 
 import contextlib
+import hashlib
 import mox
+import os
+import shutil
 import tempfile
 import textwrap
 
 from cinder import context
 from cinder import exception
+from cinder.image import image_cache
 from cinder.image import image_utils
+from cinder.openstack.common import processutils
 from cinder import test
 from cinder import utils
 
@@ -282,6 +287,65 @@ class TestUtils(test.TestCase):
                           context, fake_image_service,
                           self.TEST_IMAGE_ID, self.TEST_DEV_PATH)
 
+    def test_fetch_to_raw_through_image_cache(self):
+        TEST_RET = "image: qemu.qcow2\n"\
+                   "file_format: qcow2 \n"\
+                   "virtual_size: 50M (52428800 bytes)\n"\
+                   "cluster_size: 65536\n"\
+                   "disk_size: 196K (200704 bytes)"
+        TEST_RETURN_RAW = "image: qemu.raw\n"\
+                          "file_format: raw\n"\
+                          "virtual_size: 50M (52428800 bytes)\n"\
+                          "cluster_size: 65536\n"\
+                          "disk_size: 196K (200704 bytes)\n"\
+
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir, ignore_errors=True)
+        self.flags(image_cache_dir=tempdir, image_cache_max_size_gb=1,
+                   lock_path=tempdir)
+        cached = os.path.join(tempdir, '%s-sum' % self.TEST_IMAGE_ID)
+        part = cached + image_cache.PART_SUFFIX
+
+        fake_image_service = FakeImageService()
+        fake_image_service.show = lambda ctxt, image_id: {
+            'checksum': 'sum', 'disk_format': 'qcow2',
+            'container_format': 'bare'}
+        mox = self._mox
+
+        mox.StubOutWithMock(image_utils, 'create_temporary_file')
+        mox.StubOutWithMock(utils, 'execute')
+        mox.StubOutWithMock(image_utils, 'fetch')
+
+        # Only the first copy downloads and converts the image
+        image_utils.create_temporary_file().AndReturn(self.TEST_DEV_PATH)
+        image_utils.fetch(context, fake_image_service,
+                          self.TEST_IMAGE_ID, self.TEST_DEV_PATH, None, None)
+        utils.execute(
+            'env', 'LC_ALL=C', 'LANG=C', 'qemu-img', 'info',
+            self.TEST_DEV_PATH, run_as_root=True).AndReturn(
+                (TEST_RET, 'ignored'))
+        utils.execute('qemu-img', 'convert', '-O', 'raw',
+                      self.TEST_DEV_PATH, part, run_as_root=True)
+        utils.execute(
+            'env', 'LC_ALL=C', 'LANG=C', 'qemu-img', 'info',
+            part, run_as_root=True).AndReturn((TEST_RETURN_RAW, 'ignored'))
+
+        for i in range(2):
+            utils.execute('qemu-img', 'convert', '-O', 'raw',
+                          cached, self.TEST_DEV_PATH, run_as_root=True)
+            utils.execute(
+                'env', 'LC_ALL=C', 'LANG=C', 'qemu-img', 'info',
+                self.TEST_DEV_PATH, run_as_root=True).AndReturn(
+                    (TEST_RETURN_RAW, 'ignored'))
+
+        mox.ReplayAll()
+
+        for i in range(2):
+            image_utils.fetch_to_raw(context, fake_image_service,
+                                     self.TEST_IMAGE_ID, self.TEST_DEV_PATH)
+        mox.VerifyAll()
+        self.assertTrue(os.path.exists(cached))
+
     def test_fetch_verify_image_with_backing_file(self):
         TEST_RETURN = "image: qemu.qcow2\n"\
                       "backing_file: qemu.qcow2 (actual path: qemu.qcow2)\n"\
@@ -408,6 +472,124 @@ class TestUtils(test.TestCase):
         m.VerifyAll()
 
 
+class FakeRawImageService(FakeImageService):
+    def __init__(self, data, checksum=None):
+        self._imagedata = {1: data}
+        self._checksum = checksum or hashlib.md5(data).hexdigest()
+
+    def download(self, context, image_id, data):
+        image = self._imagedata[image_id]
+        for i in range(0, len(image), 1000):
+            data.write(image[i:i + 1000])
+
+    def show(self, context, image_id):
+        return {'size': len(self._imagedata[image_id]),
+                'checksum': self._checksum,
+                'disk_format': 'raw',
+                'container_format': 'bare'}
+
+
+class TestStreamRawImage(test.TestCase):
+    def setUp(self):
+        super(TestStreamRawImage, self).setUp()
+        fd, self.dest = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, self.dest)
+        self.stubs.Set(image_utils, 'STREAM_WRITE_SIZE', 4096)
+        self.stubs.Set(image_utils, 'qemu_img_info', self._fake_qemu_img_info)
+        self.flags(image_stream_raw=True,
+                   image_conversion_dir=tempfile.gettempdir())
+        self.probed = []
+
+    def _fake_qemu_img_info(self, path):
+        with open(path) as f:
+            header = f.read()
+        self.probed.append(header)
+        if header.startswith('KDMV'):
+            # qemu-img fails to open a truncated vmdk header
+            raise processutils.ProcessExecutionError(exit_code=1)
+        if header.startswith('QFI\xfb'):
+            fmt = 'qcow2'
+        else:
+            fmt = 'raw'
+        return image_utils.QemuImgInfo('image: %s\nfile format: %s\n' %
+                                       (path, fmt))
+
+    def _read_dest(self):
+        with open(self.dest) as f:
+            return f.read()
+
+    def test_is_raw_header(self):
+        self.assertTrue(image_utils.is_raw_header('\0' * 512))
+        self.assertFalse(image_utils.is_raw_header('QFI\xfb' + '\0' * 508))
+        self.assertEqual(['\0' * 512, 'QFI\xfb' + '\0' * 508], self.probed)
+
+    def test_stream_raw_image(self):
+        data = ''.join(chr(i % 251) for i in range(10000))
+        image_service = FakeRawImageService(data)
+        self.assertTrue(image_utils.stream_raw_image(context, image_service,
+                                                     1, self.dest))
+        self.assertEqual(data, self._read_dest())
+        self.assertEqual([data[:image_utils.HEADER_PROBE_SIZE]], self.probed)
+
+    def test_stream_small_raw_image(self):
+        image_service = FakeRawImageService('tiny')
+        self.assertTrue(image_utils.stream_raw_image(context, image_service,
+                                                     1, self.dest))
+        self.assertEqual('tiny', self._read_dest())
+
+    def test_stream_raw_image_bad_checksum(self):
+        image_service = FakeRawImageService('\0' * 10000, checksum='bad')
+        self.assertRaises(exception.ImageUnacceptable,
+                          image_utils.stream_raw_image, context,
+                          image_service, 1, self.dest)
+
+    def test_stream_raw_image_not_raw(self):
+        with open(self.dest, 'w') as f:
+            f.write('previous')
+        image_service = FakeRawImageService('QFI\xfb' + '\0' * 10000)
+        self.assertFalse(image_utils.stream_raw_image(context, image_service,
+                                                      1, self.dest))
+        self.assertEqual('', self._read_dest())
+
+    def test_stream_raw_image_probe_fails(self):
+        image_service = FakeRawImageService('KDMV' + '\0' * 10000)
+        self.assertFalse(image_utils.stream_raw_image(context, image_service,
+                                                      1, self.dest))
+        self.assertEqual('', self._read_dest())
+
+    def test_fetch_to_raw_probe_fails_converts(self):
+        converted = []
+
+        def fake_fetch_and_check(context, image_service, image_id, path,
+                                 user_id=None, project_id=None):
+            return 'vmdk'
+
+        def fake_convert_and_check(image_id, source, dest, volume_format):
+            converted.append((dest, volume_format))
+
+        self.stubs.Set(image_utils, '_fetch_and_check', fake_fetch_and_check)
+        self.stubs.Set(image_utils, '_convert_and_check',
+                       fake_convert_and_check)
+        image_service = FakeRawImageService('KDMV' + '\0' * 10000)
+        image_utils.fetch_to_raw(context, image_service, 1, self.dest)
+        self.assertEqual([(self.dest, 'raw')], converted)
+
+    def test_stream_raw_image_disabled(self):
+        self.flags(image_stream_raw=False)
+        image_service = FakeRawImageService('\0' * 10000)
+        self.assertFalse(image_utils.stream_raw_image(context, image_service,
+                                                      1, self.dest))
+
+    def test_fetch_to_raw_streams_raw_image(self):
+        self.mox.StubOutWithMock(utils, 'execute')
+        self.mox.ReplayAll()
+        data = '\1' * 10000
+        image_utils.fetch_to_raw(context, FakeRawImageService(data), 1,
+                                 self.dest)
+        self.assertEqual(data, self._read_dest())
+
+
 class TestExtractTo(test.TestCase):
     def test_extract_to_calls_tar(self):
         mox = self.mox
@@ -1002,3 +1002,101 @@ class TestMigrations(test.TestCase):
 
             self.assertFalse(engine.dialect.has_table(engine.connect(),
                                                       "volume_admin_metadata"))
+
+    def test_migration_021(self):
+        """Test that adding parent_id column to backups works correctly."""
+        for (key, engine) in self.engines.items():
+            migration_api.version_control(engine,
+                                          TestMigrations.REPOSITORY,
+                                          migration.INIT_VERSION)
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 20)
+            metadata = sqlalchemy.schema.MetaData()
+            metadata.bind = engine
+
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 21)
+            backups = sqlalchemy.Table('backups',
+                                       metadata,
+                                       autoload=True)
+            self.assertTrue(isinstance(backups.c.parent_id.type,
+                                       sqlalchemy.types.VARCHAR))
+
+            migration_api.downgrade(engine, TestMigrations.REPOSITORY, 20)
+            metadata = sqlalchemy.schema.MetaData()
+            metadata.bind = engine
+
+            backups = sqlalchemy.Table('backups',
+                                       metadata,
+                                       autoload=True)
+            self.assertTrue('parent_id' not in backups.c)
+
+    def test_migration_022(self):
+        """Test adding image_volume_cache_entries table works correctly."""
+        for (key, engine) in self.engines.items():
+            migration_api.version_control(engine,
+                                          TestMigrations.REPOSITORY,
+                                          migration.INIT_VERSION)
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 21)
+            metadata = sqlalchemy.schema.MetaData()
+            metadata.bind = engine
+
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 22)
+
+            self.assertTrue(engine.dialect.has_table(
+                engine.connect(), "image_volume_cache_entries"))
+            cache = sqlalchemy.Table('image_volume_cache_entries',
+                                     metadata,
+                                     autoload=True)
+
+            self.assertTrue(isinstance(cache.c.id.type,
+                                       sqlalchemy.types.INTEGER))
+            self.assertTrue(isinstance(cache.c.host.type,
+                                       sqlalchemy.types.VARCHAR))
+            self.assertTrue(isinstance(cache.c.image_id.type,
+                                       sqlalchemy.types.VARCHAR))
+            self.assertTrue(isinstance(cache.c.image_updated_at.type,
+                                       sqlalchemy.types.DATETIME))
+            self.assertTrue(isinstance(cache.c.volume_id.type,
+                                       sqlalchemy.types.VARCHAR))
+            self.assertTrue(isinstance(cache.c.size.type,
+                                       sqlalchemy.types.INTEGER))
+            self.assertTrue(isinstance(cache.c.last_used.type,
+                                       sqlalchemy.types.DATETIME))
+
+            migration_api.downgrade(engine, TestMigrations.REPOSITORY, 21)
+
+            self.assertFalse(engine.dialect.has_table(
+                engine.connect(), "image_volume_cache_entries"))
+
+    def test_migration_023(self):
+        """Test adding the volume, snapshot and backup indexes works."""
+        def _index_names(engine, table_name):
+            metadata = sqlalchemy.schema.MetaData()
+            metadata.bind = engine
+            table = sqlalchemy.Table(table_name, metadata, autoload=True)
+            return set(index.name for index in table.indexes)
+
+        for (key, engine) in self.engines.items():
+            migration_api.version_control(engine,
+                                          TestMigrations.REPOSITORY,
+                                          migration.INIT_VERSION)
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 22)
+            self.assertFalse('volumes_host_deleted_idx' in
+                             _index_names(engine, 'volumes'))
+
+            migration_api.upgrade(engine, TestMigrations.REPOSITORY, 23)
+
+            volume_indexes = _index_names(engine, 'volumes')
+            self.assertTrue('volumes_project_id_deleted_created_at_idx' in
+                            volume_indexes)
+            self.assertTrue('volumes_host_deleted_idx' in volume_indexes)
+            self.assertTrue('volumes_instance_uuid_deleted_idx' in
+                            volume_indexes)
+            self.assertTrue('backups_host_deleted_idx' in
+                            _index_names(engine, 'backups'))
+
+            migration_api.downgrade(engine, TestMigrations.REPOSITORY, 22)
+
+            self.assertFalse('volumes_host_deleted_idx' in
+                             _index_names(engine, 'volumes'))
+            self.assertFalse('backups_host_deleted_idx' in
+                             _index_names(engine, 'backups'))
@@ -30,6 +30,7 @@ from cinder import context
 from cinder import exception
 from cinder.image import image_utils
 from cinder.openstack.common import processutils as putils
+from cinder.openstack.common import timeutils
 from cinder import test
 from cinder import units
 from cinder.volume import configuration as conf
@@ -135,6 +136,7 @@ class NfsDriverTestCase(test.TestCase):
         self.configuration.nfs_sparsed_volumes = True
         self.configuration.nfs_used_ratio = 0.95
         self.configuration.nfs_oversub_ratio = 1.0
+        self.configuration.nfs_allocated_scan_interval = 600
         self._driver = nfs.NfsDriver(configuration=self.configuration)
         self._driver.shares = {}
         self._driver._remotefsclient._mount_options = None
@@ -214,7 +216,7 @@ class NfsDriverTestCase(test.TestCase):
 
         mox.StubOutWithMock(drv, '_get_mount_point_for_share')
         drv._get_mount_point_for_share(self.TEST_NFS_EXPORT1).\
-            AndReturn(self.TEST_MNT_POINT)
+            MultipleTimes().AndReturn(self.TEST_MNT_POINT)
 
         mox.StubOutWithMock(drv, '_execute')
         drv._execute('stat', '-f', '-c', '%S %b %a',
@@ -247,7 +249,7 @@ class NfsDriverTestCase(test.TestCase):
 
         mox.StubOutWithMock(drv, '_get_mount_point_for_share')
         drv._get_mount_point_for_share(self.TEST_NFS_EXPORT_SPACES).\
-            AndReturn(self.TEST_MNT_POINT_SPACES)
+            MultipleTimes().AndReturn(self.TEST_MNT_POINT_SPACES)
 
         mox.StubOutWithMock(drv, '_execute')
         drv._execute('stat', '-f', '-c', '%S %b %a',
@@ -623,6 +625,10 @@ class NfsDriverTestCase(test.TestCase):
             AndReturn((20 * units.GiB, 3 * units.GiB,
                        3 * units.GiB))
 
+        mox.StubOutWithMock(drv, '_scan_allocated_space')
+        drv._scan_allocated_space(self.TEST_NFS_EXPORT1)
+        drv._scan_allocated_space(self.TEST_NFS_EXPORT2)
+
         mox.ReplayAll()
 
         drv.get_volume_stats()
@@ -630,3 +636,106 @@ class NfsDriverTestCase(test.TestCase):
         self.assertEqual(drv._stats['free_capacity_gb'], 5.0)
 
         mox.VerifyAll()
+
+    def _stub_du(self, allocated_list):
+        mox = self._mox
+        drv = self._driver
+
+        mox.StubOutWithMock(drv, '_get_mount_point_for_share')
+        drv._get_mount_point_for_share(self.TEST_NFS_EXPORT1).\
+            MultipleTimes().AndReturn(self.TEST_MNT_POINT)
+
+        mox.StubOutWithMock(drv, '_execute')
+        for allocated in allocated_list:
+            drv._execute('du', '-sb', '--apparent-size',
+                         '--exclude', '*snapshot*',
+                         self.TEST_MNT_POINT,
+                         run_as_root=True).AndReturn(('%d /mnt' % allocated,
+                                                      None))
+
+    def test_get_allocated_space_scans_share_once(self):
+        """The allocated space is read from the ledger once scanned."""
+        mox = self._mox
+        drv = self._driver
+
+        self._stub_du([490560])
+
+        mox.ReplayAll()
+
+        self.assertEqual(490560,
+                         drv._get_allocated_space(self.TEST_NFS_EXPORT1))
+        self.assertEqual(490560,
+                         drv._get_allocated_space(self.TEST_NFS_EXPORT1))
+
+        mox.VerifyAll()
+
+    def test_get_allocated_space_without_caching(self):
+        """A scan interval of 0 scans the share on every lookup."""
+        mox = self._mox
+        drv = self._driver
+        self.configuration.nfs_allocated_scan_interval = 0
+
+        self._stub_du([1, 2])
+
+        mox.ReplayAll()
+
+        self.assertEqual(1, drv._get_allocated_space(self.TEST_NFS_EXPORT1))
+        self.assertEqual(2, drv._get_allocated_space(self.TEST_NFS_EXPORT1))
+
+        mox.VerifyAll()
+
+    def test_create_and_delete_volume_update_allocated_space(self):
+        """Created and deleted volumes are accounted in the ledger."""
+        mox = self._mox
+        drv = self._driver
+
+        self._stub_du([units.GiB])
+        self.stub_out_not_replaying(drv, '_create_sparsed_file')
+        self.stub_out_not_replaying(drv, '_set_rw_permissions_for_all')
+        self.stub_out_not_replaying(drv, '_ensure_share_mounted')
+
+        mox.ReplayAll()
+
+        drv._get_allocated_space(self.TEST_NFS_EXPORT1)
+
+        volume = {'provider_location': self.TEST_NFS_EXPORT1,
+                  'name': 'volume-123',
+                  'size': 2}
+        drv._do_create_volume(volume)
+        self.assertEqual(3 * units.GiB,
+                         drv._get_allocated_space(self.TEST_NFS_EXPORT1))
+
+        mox.UnsetStubs()
+        self.stub_out_not_replaying(drv, '_execute')
+        drv.delete_volume(volume)
+        self.assertEqual(units.GiB,
+                         drv._get_allocated_space(self.TEST_NFS_EXPORT1))
+
+        mox.VerifyAll()
+
+    def test_reconcile_allocated_space_rescans_stale_shares(self):
+        """Only shares scanned too long ago are scanned again."""
+        mox = self._mox
+        drv = self._driver
+        drv._mounted_shares = [self.TEST_NFS_EXPORT1]
+
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+        self._stub_du([units.GiB, 2 * units.GiB])
+
+        mox.ReplayAll()
+
+        drv._get_allocated_space(self.TEST_NFS_EXPORT1)
+
+        timeutils.advance_time_seconds(599)
+        drv._reconcile_allocated_space()
+        self.assertEqual(units.GiB,
+                         drv._get_allocated_space(self.TEST_NFS_EXPORT1))
+
+        timeutils.advance_time_seconds(2)
+        drv._reconcile_allocated_space()
+        self.assertEqual(2 * units.GiB,
+                         drv._get_allocated_space(self.TEST_NFS_EXPORT1))
+
+        mox.VerifyAll()
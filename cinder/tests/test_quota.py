@@ -32,6 +32,7 @@ from cinder import quota
 from cinder import test
 import cinder.tests.image.fake
 from cinder import volume
+from cinder.volume import volume_types
 
 
 CONF = cfg.CONF
@@ -716,6 +717,57 @@ class VolumeTypeQuotaEngineTestCase(test.TestCase):
         db.volume_type_destroy(ctx, vtype['id'])
         db.volume_type_destroy(ctx, vtype2['id'])
 
+    def _stub_volume_types(self, names):
+        calls = []
+
+        def fake_vtga(context, inactive=False, filters=None):
+            calls.append(inactive)
+            return dict((name, {'id': name, 'name': name, 'extra_specs': {}})
+                        for name in names)
+        self.stubs.Set(db, 'volume_type_get_all', fake_vtga)
+        return calls
+
+    def test_resources_cached(self):
+        self.flags(quota_resources_cache_ttl=30)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        calls = self._stub_volume_types(['type1'])
+
+        engine = quota.VolumeTypeQuotaEngine()
+        self.assertTrue('volumes_type1' in engine)
+        self.assertTrue('gigabytes_type1' in engine.resources)
+        self.assertEqual(1, len(calls))
+
+        timeutils.advance_time_seconds(31)
+        self.assertTrue('volumes_type1' in engine)
+        self.assertEqual(2, len(calls))
+
+        engine.invalidate_resources()
+        self.assertTrue('volumes_type1' in engine)
+        self.assertEqual(3, len(calls))
+
+    def test_reserve_reloads_unknown_resources(self):
+        self.flags(quota_resources_cache_ttl=30)
+        self._stub_volume_types([])
+        engine = quota.VolumeTypeQuotaEngine(FakeDriver())
+        self.assertFalse('volumes_type1' in engine)
+
+        self._stub_volume_types(['type1'])
+        engine.reserve(None, volumes_type1=1)
+        self.assertTrue('volumes_type1' in engine._driver.called[0][2])
+
+    def test_volume_type_create_and_destroy_invalidate(self):
+        ctx = context.get_admin_context()
+        calls = self._stub_volume_types([])
+        self.assertEqual(quota.QUOTAS.resource_names,
+                         ['gigabytes', 'snapshots', 'volumes'])
+
+        self._stub_volume_types(['type1'])
+        vtype = volume_types.create(ctx, 'type1')
+        self.assertTrue('volumes_type1' in quota.QUOTAS)
+        volume_types.destroy(ctx, vtype['id'])
+        self.assertEqual(1, len(calls))
+
 
 class DbQuotaDriverTestCase(test.TestCase):
     def setUp(self):
@@ -1126,11 +1178,14 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
         self.usages = {}
         self.usages_created = {}
         self.reservations_created = {}
+        self.locked_usages = []
 
         def fake_get_session():
             return FakeSession()
 
-        def fake_get_quota_usages(context, session, project_id):
+        def fake_get_quota_usages(context, session, project_id,
+                                  resources=None):
+            self.locked_usages.append(resources)
             return self.usages.copy()
 
         def fake_quota_usage_create(context, project_id, resource, in_use,
@@ -1158,6 +1213,9 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
         self.stubs.Set(sqa_api, '_get_quota_usages', fake_get_quota_usages)
         self.stubs.Set(sqa_api, '_quota_usage_create', fake_quota_usage_create)
         self.stubs.Set(sqa_api, '_reservation_create', fake_reservation_create)
+        # Run the usage refresh right away instead of in another green thread
+        self.stubs.Set(sqa_api.greenthread, 'spawn_n',
+                       lambda f, *args, **kwargs: f(*args, **kwargs))
 
         timeutils.set_time_override()
 
@@ -1296,6 +1354,19 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                                        usage_id=self.usages['gigabytes'],
                                        delta=2 * 1024), ])
 
+    def test_quota_reserve_negative_in_use_counted_before_check(self):
+        spawned = []
+        self.stubs.Set(sqa_api.greenthread, 'spawn_n',
+                       lambda f, *args: spawned.append(args))
+        self.init_usage('test_project', 'volumes', -1, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=3, gigabytes=10 * 1024, )
+        self.assertRaises(exception.OverQuota, sqa_api.quota_reserve,
+                          context, self.resources, quotas, dict(volumes=2),
+                          self.expire, 0, 0)
+        self.assertEqual(set(['volumes']), self.sync_called)
+        self.assertEqual([], spawned)
+
     def test_quota_reserve_until_refresh(self):
         self.init_usage('test_project', 'volumes', 3, 0, until_refresh=1)
         self.init_usage('test_project', 'gigabytes', 3, 0, until_refresh=1)
@@ -1476,3 +1547,57 @@ class QuotaReserveSqlAlchemyTestCase(test.TestCase):
                                        usage_id=self.usages['gigabytes'],
                                        project_id='test_project',
                                        delta=-2 * 1024), ])
+
+    def test_quota_reserve_locks_reserved_usages_only(self):
+        self.init_usage('test_project', 'volumes', 3, 0)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        sqa_api.quota_reserve(context, self.resources, quotas,
+                              dict(volumes=1), self.expire, 0, 0)
+        self.assertEqual([['volumes']], self.locked_usages)
+
+    def test_quota_reserve_refresh_deferred(self):
+        spawned = []
+        self.stubs.Set(sqa_api.greenthread, 'spawn_n',
+                       lambda f, *args: spawned.append(args))
+        self.init_usage('test_project', 'volumes', 3, 0, until_refresh=1)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+        context = FakeContext('test_project', 'test_class')
+        quotas = dict(volumes=5, gigabytes=10 * 1024, )
+        deltas = dict(volumes=2, gigabytes=2 * 1024, )
+        sqa_api.quota_reserve(context, self.resources, quotas,
+                              deltas, self.expire, 5, 0)
+
+        self.assertEqual(self.sync_called, set([]))
+        self.compare_usage(self.usages, [dict(resource='volumes',
+                                              in_use=3,
+                                              reserved=2,
+                                              until_refresh=0), ])
+        self.assertEqual(1, len(spawned))
+        self.assertEqual([self.resources['volumes']], spawned[0][2])
+
+    def test_quota_usage_refresh_locks_before_counting(self):
+        self.init_usage('test_project', 'volumes', 3, 0, until_refresh=0)
+        self.init_usage('test_project', 'gigabytes', 3, 0)
+        real_get_quota_usages = sqa_api._get_quota_usages
+
+        def fake_get_quota_usages(context, session, project_id,
+                                  resources=None):
+            self.assertEqual(set([]), self.sync_called)
+            return real_get_quota_usages(context, session, project_id,
+                                         resources)
+
+        self.stubs.Set(sqa_api, '_get_quota_usages', fake_get_quota_usages)
+        context = FakeContext('test_project', 'test_class')
+        sqa_api._quota_usage_refresh(context, 'test_project',
+                                     [self.resources['volumes']], 5)
+
+        self.assertEqual([['volumes']], self.locked_usages)
+        self.assertEqual(set(['volumes']), self.sync_called)
+        self.compare_usage(self.usages, [dict(resource='volumes',
+                                              in_use=2,
+                                              until_refresh=5),
+                                         dict(resource='gigabytes',
+                                              in_use=3,
+                                              until_refresh=None), ])
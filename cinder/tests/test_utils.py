@@ -19,11 +19,15 @@ import __builtin__
 import datetime
 import hashlib
 import os
+import shutil
 import socket
 import StringIO
+import sys
 import tempfile
 import uuid
 
+from eventlet import green
+from eventlet import semaphore
 import mox
 from oslo.config import cfg
 import paramiko
@@ -34,6 +38,7 @@ from cinder.brick.initiator import linuxfc
 from cinder import exception
 from cinder.openstack.common import processutils as putils
 from cinder.openstack.common import timeutils
+from cinder.rootwrap import client as rootwrap_client
 from cinder import test
 from cinder import utils
 
@@ -122,6 +127,115 @@ grep foo
             os.unlink(tmpfilename)
             os.unlink(tmpfilename2)
 
+    def _stub_rootwrap_daemon(self, replies):
+        calls = []
+
+        class FakeClient(object):
+            def execute(self, cmd, stdin=None):
+                calls.append((cmd, stdin))
+                return replies.pop(0)
+
+        self.flags(use_rootwrap_daemon=True)
+        self.stubs.Set(os, 'geteuid', lambda: 1000)
+        self.stubs.Set(utils, 'get_rootwrap_daemon_client',
+                       lambda: FakeClient())
+        return calls
+
+    def test_run_as_root_uses_rootwrap_daemon(self):
+        calls = self._stub_rootwrap_daemon([(0, 'out', 'err')])
+        self.mox.StubOutWithMock(putils, 'execute')
+        self.mox.ReplayAll()
+
+        result = utils.execute('lvs', '--noheadings', run_as_root=True,
+                               process_input='foo')
+        self.assertEqual(('out', 'err'), result)
+        self.assertEqual([(['lvs', '--noheadings'], 'foo')], calls)
+
+    def test_rootwrap_daemon_check_exit_code(self):
+        calls = self._stub_rootwrap_daemon([(5, '', 'failed'),
+                                            (5, '', 'failed'),
+                                            (5, '', 'failed'),
+                                            (0, 'ok', '')])
+        self.assertRaises(putils.ProcessExecutionError,
+                          utils.execute, 'false', run_as_root=True)
+        utils.execute('false', run_as_root=True, check_exit_code=[0, 5])
+        self.assertEqual(('ok', ''),
+                         utils.execute('false', run_as_root=True, attempts=2,
+                                       delay_on_retry=False))
+        self.assertEqual(4, len(calls))
+
+    def test_rootwrap_daemon_not_used_for_other_root_helper(self):
+        calls = self._stub_rootwrap_daemon([])
+        self.mox.StubOutWithMock(putils, 'execute')
+        putils.execute('ls', run_as_root=True,
+                       root_helper='sudo').AndReturn(('', ''))
+        self.mox.ReplayAll()
+
+        utils.execute('ls', run_as_root=True, root_helper='sudo')
+        self.assertEqual([], calls)
+
+
+class RootwrapDaemonTestCase(test.TestCase):
+    """Runs the real rootwrap daemon as the current user."""
+
+    def setUp(self):
+        super(RootwrapDaemonTestCase, self).setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        filters_path = os.path.join(self.tmpdir, 'filters')
+        os.mkdir(filters_path)
+        with open(os.path.join(filters_path, 'test.filters'), 'w') as f:
+            f.write('[Filters]\ncat: CommandFilter, cat, root\n')
+        config_file = os.path.join(self.tmpdir, 'rootwrap.conf')
+        with open(config_file, 'w') as f:
+            f.write('[DEFAULT]\nfilters_path=%s\n'
+                    'exec_dirs=/bin,/usr/bin\n' % filters_path)
+        daemon_bin = os.path.join(os.path.dirname(cinder.__file__),
+                                  os.pardir, 'bin', 'cinder-rootwrap-daemon')
+        self.client = rootwrap_client.Client([sys.executable, daemon_bin,
+                                              config_file])
+
+    def tearDown(self):
+        process = self.client._process
+        if process is not None and process.poll() is None:
+            process.stdin.close()
+            process.wait()
+        shutil.rmtree(self.tmpdir)
+        super(RootwrapDaemonTestCase, self).tearDown()
+
+    def test_execute(self):
+        data = 'foo\x00\xff\nbar'
+        self.assertEqual((0, data, ''), self.client.execute(['cat'], data))
+        # The same daemon serves later commands
+        process = self.client._process
+        self.assertEqual((0, '', ''), self.client.execute(['cat']))
+        self.assertTrue(self.client._process is process)
+
+    def test_uses_green_modules(self):
+        # The services are not always monkey patched, so the client must
+        # not fall back to blocking pipes and sockets
+        self.assertTrue(rootwrap_client.subprocess is
+                        green.subprocess)
+        self.assertTrue(rootwrap_client.socket is green.socket)
+        self.assertTrue(isinstance(self.client._lock,
+                                   semaphore.Semaphore))
+
+    def test_unauthorized_command(self):
+        returncode, out, err = self.client.execute(['ls', '/'])
+        self.assertEqual(99, returncode)
+        self.assertEqual('', out)
+        self.assertTrue('Unauthorized command' in err)
+
+    def test_daemon_exits_with_parent(self):
+        self.client.execute(['cat'])
+        socket_dir = os.path.dirname(self.client._socket_path)
+        process = self.client._process
+        process.stdin.close()
+        self.assertEqual(0, process.wait())
+        self.assertFalse(os.path.exists(socket_dir))
+        # A new daemon is started on demand
+        self.assertEqual((0, 'x', ''), self.client.execute(['cat'], 'x'))
+        self.assertTrue(self.client._process is not process)
+
 
 class GetFromPathTestCase(test.TestCase):
     def test_tolerates_nones(self):
@@ -447,6 +561,13 @@ class GenericUtilsTestCase(test.TestCase):
         self.assertEqual('&quot;foo&quot;', utils.xhtml_escape('"foo"'))
         self.assertEqual('&apos;foo&apos;', utils.xhtml_escape("'foo'"))
 
+    def test_is_all_zero(self):
+        self.assertTrue(utils.is_all_zero('\0' * 4096))
+        self.assertFalse(utils.is_all_zero('\0' * 4095 + 'a'))
+        self.assertFalse(utils.is_all_zero('a' + '\0' * 4095))
+        self.assertFalse(utils.is_all_zero('\0' * 2048 + 'a' + '\0' * 2047))
+        self.assertFalse(utils.is_all_zero(''))
+
     def test_hash_file(self):
         data = 'Mary had a little lamb, its fleece as white as snow'
         flo = StringIO.StringIO(data)
@@ -761,19 +882,19 @@ class BrickUtils(test.TestCase):
         root_helper = utils.get_root_helper()
 
         self.mox.StubOutClassWithMocks(connector, 'ISCSIConnector')
-        connector.ISCSIConnector(execute=putils.execute,
+        connector.ISCSIConnector(execute=utils.execute,
                                  driver=None,
                                  root_helper=root_helper,
                                  use_multipath=False)
 
         self.mox.StubOutClassWithMocks(connector, 'FibreChannelConnector')
-        connector.FibreChannelConnector(execute=putils.execute,
+        connector.FibreChannelConnector(execute=utils.execute,
                                         driver=None,
                                         root_helper=root_helper,
                                         use_multipath=False)
 
         self.mox.StubOutClassWithMocks(connector, 'AoEConnector')
-        connector.AoEConnector(execute=putils.execute,
+        connector.AoEConnector(execute=utils.execute,
                                driver=None,
                                root_helper=root_helper)
 
@@ -36,6 +36,7 @@ from cinder import context
 from cinder import db
 from cinder import exception
 from cinder.image import image_utils
+from cinder.image import image_volume_cache
 from cinder import keymgr
 from cinder.openstack.common import fileutils
 from cinder.openstack.common import importutils
@@ -231,6 +232,57 @@ class VolumeTestCase(BaseVolumeTestCase):
                           None,
                           test_meta)
 
+    def _stub_scheduler_batch(self, volume_api):
+        batches = []
+
+        def fake_create_volume(*args, **kwargs):
+            self.fail('create_volume cast for a volume of a batch')
+
+        def fake_create_volumes(ctxt, topic, request_specs,
+                                filter_properties=None):
+            batches.append(([spec['volume_id'] for spec in request_specs],
+                            filter_properties))
+
+        self.stubs.Set(volume_api.scheduler_rpcapi, 'create_volume',
+                       fake_create_volume)
+        self.stubs.Set(volume_api.scheduler_rpcapi, 'create_volumes',
+                       fake_create_volumes)
+        return batches
+
+    def test_create_volumes(self):
+        """Volumes of a batch are cast to the scheduler together."""
+        volume_api = cinder.volume.api.API()
+        batches = self._stub_scheduler_batch(volume_api)
+        hints = {'same_host': 'fake-id'}
+
+        volumes = volume_api.create_volumes(self.context, [
+            {'size': 1, 'name': 'vol1', 'description': None},
+            {'size': 2, 'name': 'vol2', 'description': None},
+            {'size': 1, 'name': 'vol3', 'description': None,
+             'scheduler_hints': hints}])
+
+        self.assertEqual(['vol1', 'vol2', 'vol3'],
+                         [vol['display_name'] for vol in volumes])
+        self.assertEqual([([volumes[0]['id'], volumes[1]['id']], {}),
+                          ([volumes[2]['id']], {'scheduler_hints': hints})],
+                         batches)
+
+    def test_create_volumes_failure_casts_created_volumes(self):
+        volume_api = cinder.volume.api.API()
+        batches = self._stub_scheduler_batch(volume_api)
+
+        self.assertRaises(exception.InvalidVolumeMetadataSize,
+                          volume_api.create_volumes, self.context, [
+                              {'size': 1, 'name': 'vol1',
+                               'description': None},
+                              {'size': 1, 'name': 'vol2',
+                               'description': None,
+                               'metadata': {'key': 'value' * 256}}])
+
+        volumes = db.volume_get_all(self.context, None, None, 'created_at',
+                                    'desc')
+        self.assertEqual([([volumes[0]['id']], {})], batches)
+
     def test_create_volume_with_volume_type(self):
         """Test volume creation with default volume type."""
         def fake_reserve(context, expire=None, project_id=None, **deltas):
@@ -1233,6 +1285,67 @@ class VolumeTestCase(BaseVolumeTestCase):
         db.volume_destroy(self.context, volume_id)
         os.unlink(dst_path)
 
+    def test_create_volume_from_image_volume_cache(self):
+        """Verify that volumes of any size created from the same image are
+        cloned from a single image volume of the image size, and that
+        deleting it removes the entry.
+        """
+        self.flags(lock_path=CONF.volumes_dir)
+        self.volume.image_volume_cache = (
+            image_volume_cache.ImageVolumeCache(db, self.volume.driver,
+                                                self.volume.host))
+        copied = []
+        cloned = []
+        extended = []
+
+        def fake_copy_image_to_volume(context, volume, image_service,
+                                      image_id):
+            copied.append((volume['id'], volume['size']))
+
+        def fake_create_cloned_volume(volume, src_vref):
+            cloned.append((volume['id'], volume['size'], src_vref['id']))
+
+        def fake_extend_volume(volume, new_size):
+            extended.append((volume['id'], new_size))
+
+        self.stubs.Set(self.volume.driver, 'create_volume', lambda v: None)
+        self.stubs.Set(self.volume.driver, 'delete_volume', lambda v: None)
+        self.stubs.Set(self.volume.driver, 'copy_image_to_volume',
+                       fake_copy_image_to_volume)
+        self.stubs.Set(self.volume.driver, 'create_cloned_volume',
+                       fake_create_cloned_volume)
+        self.stubs.Set(self.volume.driver, 'extend_volume',
+                       fake_extend_volume)
+
+        image_id = 'c905cedb-7281-47e4-8a62-f26bc5fc4c77'
+        volume_ids = []
+        for size in (2, 1):
+            volume_params = dict(self.volume_params, size=size)
+            volume_id = tests_utils.create_volume(self.context,
+                                                  **volume_params)['id']
+            self.volume.create_volume(self.context, volume_id,
+                                      image_id=image_id)
+            volume = db.volume_get(self.context, volume_id)
+            self.assertEqual('available', volume['status'])
+            self.assertTrue(volume['bootable'])
+            volume_ids.append(volume_id)
+
+        self.assertEqual(1, len(copied))
+        image_volume_id, image_volume_size = copied[0]
+        self.assertEqual(1, image_volume_size)
+        self.assertEqual([(volume_ids[0], 1, image_volume_id),
+                          (volume_ids[1], 1, image_volume_id)], cloned)
+        self.assertEqual([(volume_ids[0], 2)], extended)
+        image_volume = db.volume_get(self.context, image_volume_id)
+        self.assertEqual('available', image_volume['status'])
+        self.assertEqual(None, image_volume['project_id'])
+
+        self.volume.delete_volume(self.context, image_volume_id)
+        self.assertEqual(None, db.image_volume_cache_get_by_volume_id(
+            self.context, image_volume_id))
+        for volume_id in volume_ids:
+            self.volume.delete_volume(self.context, volume_id)
+
     def test_create_volume_from_exact_sized_image(self):
         """Verify that an image which is exactly the same size as the
         volume, will work correctly.
@@ -1975,7 +2088,8 @@ class GenericVolumeDriverTestCase(DriverTestCase):
             AndReturn(attach_info)
         os.getuid()
         utils.execute('chown', None, '/dev/null', run_as_root=True)
-        f = fileutils.file_open('/dev/null', 'wb').AndReturn(file('/dev/null'))
+        f = fileutils.file_open('/dev/null', 'r+b').AndReturn(
+            file('/dev/null'))
         backup_service.restore(backup, vol['id'], f)
         utils.execute('chown', 0, '/dev/null', run_as_root=True)
         self.volume.driver._detach_volume(attach_info)
@@ -2069,7 +2183,8 @@ class LVMISCSIVolumeDriverTestCase(DriverTestCase):
         self.stubs.Set(self.volume.driver, '_create_volume',
                        lambda x, y, z: None)
         self.stubs.Set(volutils, 'copy_volume',
-                       lambda x, y, z, sync=False, execute='foo': None)
+                       lambda x, y, z, sync=False, execute='foo',
+                       sparse=False: None)
         self.stubs.Set(self.volume.driver, '_delete_volume',
                        lambda x: None)
         self.stubs.Set(self.volume.driver, '_create_export',
@@ -85,6 +85,23 @@ class VolumeGlanceMetadataTestCase(test.TestCase):
         for key, value in expected_metadata_1.items():
             self.assertEqual(metadata[0][key], value)
 
+    def test_vol_glance_metadata_list_get(self):
+        ctxt = context.get_admin_context()
+        for vol_id in (1, 2, 3):
+            db.volume_create(ctxt, {'id': vol_id})
+        db.volume_glance_metadata_create(ctxt, 1, 'key1', 'value1')
+        db.volume_glance_metadata_create(ctxt, 2, 'key1', 'value1')
+        db.volume_glance_metadata_create(ctxt, 2, 'key2', 'value2')
+        db.volume_glance_metadata_create(ctxt, 3, 'key1', 'value3')
+
+        metadata = db.volume_glance_metadata_list_get(ctxt, ['1', '2'])
+        self.assertEqual(set([('1', 'key1', 'value1'),
+                              ('2', 'key1', 'value1'),
+                              ('2', 'key2', 'value2')]),
+                         set((m['volume_id'], m['key'], m['value'])
+                             for m in metadata))
+        self.assertEqual([], db.volume_glance_metadata_list_get(ctxt, []))
+
     def test_vol_delete_glance_metadata(self):
         ctxt = context.get_admin_context()
         db.volume_create(ctxt, {'id': 1})
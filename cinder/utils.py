@@ -54,6 +54,7 @@ from cinder.openstack.common import lockutils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import processutils
 from cinder.openstack.common import timeutils
+from cinder.rootwrap import client as rootwrap_client
 
 
 CONF = cfg.CONF
@@ -139,9 +140,79 @@ def execute(*cmd, **kwargs):
     """Convenience wrapper around oslo's execute() method."""
     if 'run_as_root' in kwargs and not 'root_helper' in kwargs:
         kwargs['root_helper'] = get_root_helper()
+    if (CONF.use_rootwrap_daemon and kwargs.get('run_as_root') and
+            kwargs.get('root_helper') == get_root_helper() and
+            not kwargs.get('shell') and os.geteuid() != 0):
+        return _execute_rootwrap_daemon(*cmd, **kwargs)
     return processutils.execute(*cmd, **kwargs)
 
 
+_ROOTWRAP_DAEMON_CLIENT = None
+
+
+def get_rootwrap_daemon_client():
+    """Return the client for this process' rootwrap daemon."""
+    global _ROOTWRAP_DAEMON_CLIENT
+    if _ROOTWRAP_DAEMON_CLIENT is None:
+        daemon_cmd = ['sudo', 'cinder-rootwrap-daemon', CONF.rootwrap_config]
+        _ROOTWRAP_DAEMON_CLIENT = rootwrap_client.Client(daemon_cmd)
+    return _ROOTWRAP_DAEMON_CLIENT
+
+
+def _execute_rootwrap_daemon(*cmd, **kwargs):
+    """Run a root command through the rootwrap daemon.
+
+    Takes the same arguments and has the same semantics as
+    processutils.execute(), without forking sudo and cinder-rootwrap
+    for every command.
+    """
+    process_input = kwargs.pop('process_input', None)
+    check_exit_code = kwargs.pop('check_exit_code', [0])
+    ignore_exit_code = False
+    delay_on_retry = kwargs.pop('delay_on_retry', True)
+    attempts = kwargs.pop('attempts', 1)
+    kwargs.pop('run_as_root', None)
+    kwargs.pop('root_helper', None)
+    kwargs.pop('shell', None)
+
+    if isinstance(check_exit_code, bool):
+        ignore_exit_code = not check_exit_code
+        check_exit_code = [0]
+    elif isinstance(check_exit_code, int):
+        check_exit_code = [check_exit_code]
+
+    if kwargs:
+        raise processutils.UnknownArgumentError(
+            _('Got unknown keyword args to utils.execute: %r') % kwargs)
+
+    cmd = map(str, cmd)
+    client = get_rootwrap_daemon_client()
+    while attempts > 0:
+        attempts -= 1
+        try:
+            LOG.debug(_('Running cmd (rootwrap daemon): %s'), ' '.join(cmd))
+            try:
+                returncode, stdout, stderr = client.execute(cmd,
+                                                            process_input)
+            except rootwrap_client.RootwrapDaemonError as exc:
+                raise processutils.ProcessExecutionError(
+                    cmd=' '.join(cmd), description=unicode(exc))
+            if returncode:
+                LOG.debug(_('Result was %s') % returncode)
+                if not ignore_exit_code and returncode not in check_exit_code:
+                    raise processutils.ProcessExecutionError(
+                        exit_code=returncode, stdout=stdout, stderr=stderr,
+                        cmd=' '.join(cmd))
+            return stdout, stderr
+        except processutils.ProcessExecutionError:
+            if not attempts:
+                raise
+            else:
+                LOG.debug(_('%r failed. Retrying.'), cmd)
+                if delay_on_retry:
+                    greenthread.sleep(random.randint(20, 200) / 100.0)
+
+
 def check_ssh_injection(cmd_list):
     ssh_injection_pattern = ['`', '$', '|', '||', ';', '&', '&&', '>', '>>',
                              '<']
@@ -704,6 +775,14 @@ def hash_file(file_like_object):
     return checksum.hexdigest()
 
 
+def is_all_zero(data):
+    """Check whether a string of data contains only zero bytes."""
+    # Most data blocks are rejected by their first or last byte.
+    if data[:1] != '\0' or data[-1:] != '\0':
+        return False
+    return data.count('\0') == len(data)
+
+
 def service_is_up(service):
     """Check whether a service is up based on last heartbeat."""
     last_heartbeat = service['updated_at'] or service['created_at']
@@ -776,11 +855,11 @@ def brick_get_connector_properties():
     """
 
     root_helper = get_root_helper()
-    return connector.get_connector_properties(root_helper)
+    return connector.get_connector_properties(root_helper, execute=execute)
 
 
 def brick_get_connector(protocol, driver=None,
-                        execute=processutils.execute,
+                        execute=execute,
                         use_multipath=False):
     """Wrapper to get a brick connector object.
     This automatically populates the required protocol as well
@@ -134,7 +134,14 @@ class API(base.Base):
     def create(self, context, size, name, description, snapshot=None,
                image_id=None, volume_type=None, metadata=None,
                availability_zone=None, source_volume=None,
-               scheduler_hints=None, backup_source_volume=None):
+               scheduler_hints=None, backup_source_volume=None,
+               scheduler_batch=None):
+        """Create a volume.
+
+        When a scheduler_batch list is given, a volume to be placed by the
+        scheduler is appended to it as a (request_spec, filter_properties)
+        tuple instead of being cast to the scheduler, see create_volumes().
+        """
 
         def check_volume_az_zone(availability_zone):
             try:
@@ -163,7 +170,8 @@ class API(base.Base):
                                                   self.db,
                                                   self.image_service,
                                                   check_volume_az_zone,
-                                                  create_what)
+                                                  create_what,
+                                                  scheduler_batch)
 
         assert flow, _('Create volume flow not retrieved')
         flow.run(context)
@@ -183,6 +191,40 @@ class API(base.Base):
         assert volume, _('Expected volume result not found')
         return volume
 
+    def create_volumes(self, context, volume_requests):
+        """Create several volumes, placed by the scheduler in one batch.
+
+        :param volume_requests: list of dicts of the keyword arguments of
+                                create() for each volume
+        :returns: the created volumes
+        """
+        scheduler_batch = []
+        volumes = []
+        try:
+            for request in volume_requests:
+                volumes.append(self.create(context,
+                                           scheduler_batch=scheduler_batch,
+                                           **request))
+        finally:
+            # The volumes created before a failure are scheduled all the same
+            self._cast_scheduler_batch(context, scheduler_batch)
+        return volumes
+
+    def _cast_scheduler_batch(self, context, scheduler_batch):
+        """Cast one create_volumes per distinct set of filter properties."""
+        batches = []
+        for request_spec, filter_properties in scheduler_batch:
+            for batch_properties, request_specs in batches:
+                if batch_properties == filter_properties:
+                    request_specs.append(request_spec)
+                    break
+            else:
+                batches.append((filter_properties, [request_spec]))
+        for filter_properties, request_specs in batches:
+            self.scheduler_rpcapi.create_volumes(
+                context, CONF.volume_topic, request_specs,
+                filter_properties=filter_properties)
+
     @wrap_check_policy
     def delete(self, context, volume, force=False):
         if context.is_admin and context.project_id != volume['project_id']:
@@ -255,7 +297,7 @@ class API(base.Base):
         return volume
 
     def get_all(self, context, marker=None, limit=None, sort_key='created_at',
-                sort_dir='desc', filters={}):
+                sort_dir='desc', filters={}, offset=None):
         check_policy(context, 'get_all')
 
         try:
@@ -271,13 +313,9 @@ class API(base.Base):
         if (context.is_admin and 'all_tenants' in filters):
             # Need to remove all_tenants to pass the filtering below.
             del filters['all_tenants']
-            volumes = self.db.volume_get_all(context, marker, limit, sort_key,
-                                             sort_dir)
+            all_tenants = True
         else:
-            volumes = self.db.volume_get_all_by_project(context,
-                                                        context.project_id,
-                                                        marker, limit,
-                                                        sort_key, sort_dir)
+            all_tenants = False
 
         # Non-admin shouldn't see temporary target of a volume migration
         if not context.is_admin:
@@ -286,42 +324,19 @@ class API(base.Base):
         if filters:
             LOG.debug(_("Searching by: %s") % str(filters))
 
-            def _check_metadata_match(volume, searchdict):
-                volume_metadata = {}
-                for i in volume.get('volume_metadata'):
-                    volume_metadata[i['key']] = i['value']
-
-                for k, v in searchdict.iteritems():
-                    if (k not in volume_metadata.keys() or
-                            volume_metadata[k] != v):
-                        return False
-                return True
-
-            def _check_migration_target(volume, searchdict):
-                status = volume['migration_status']
-                if status and status.startswith('target:'):
-                    return False
-                return True
-
-            # search_option to filter_name mapping.
-            filter_mapping = {'metadata': _check_metadata_match,
-                              'no_migration_targets': _check_migration_target}
-
-            result = []
-            not_found = object()
-            for volume in volumes:
-                # go over all filters in the list
-                for opt, values in filters.iteritems():
-                    try:
-                        filter_func = filter_mapping[opt]
-                    except KeyError:
-                        def filter_func(volume, value):
-                            return volume.get(opt, not_found) == value
-                    if not filter_func(volume, values):
-                        break  # volume doesn't match this filter
-                else:  # did not break out loop
-                    result.append(volume)  # volume matches all filters
-            volumes = result
+        # Filtering happens in the database, before pagination, so that
+        # every page is full.
+        if all_tenants:
+            volumes = self.db.volume_get_all(context, marker, limit, sort_key,
+                                             sort_dir, filters=filters,
+                                             offset=offset)
+        else:
+            volumes = self.db.volume_get_all_by_project(context,
+                                                        context.project_id,
+                                                        marker, limit,
+                                                        sort_key, sort_dir,
+                                                        filters=filters,
+                                                        offset=offset)
 
         return volumes
 
@@ -335,31 +350,28 @@ class API(base.Base):
         rv = self.db.volume_get(context, volume_id)
         return dict(rv.iteritems())
 
-    def get_all_snapshots(self, context, search_opts=None):
+    def get_all_snapshots(self, context, search_opts=None, marker=None,
+                          limit=None, sort_key='created_at', sort_dir='desc',
+                          offset=None):
         check_policy(context, 'get_all_snapshots')
 
         search_opts = search_opts or {}
 
+        if search_opts:
+            LOG.debug(_("Searching by: %s") % str(search_opts))
+
         if (context.is_admin and 'all_tenants' in search_opts):
             # Need to remove all_tenants to pass the filtering below.
             del search_opts['all_tenants']
-            snapshots = self.db.snapshot_get_all(context)
+            snapshots = self.db.snapshot_get_all(
+                context, filters=search_opts, marker=marker, limit=limit,
+                sort_key=sort_key, sort_dir=sort_dir, offset=offset)
         else:
             snapshots = self.db.snapshot_get_all_by_project(
-                context, context.project_id)
-
-        if search_opts:
-            LOG.debug(_("Searching by: %s") % str(search_opts))
+                context, context.project_id, filters=search_opts,
+                marker=marker, limit=limit, sort_key=sort_key,
+                sort_dir=sort_dir, offset=offset)
 
-            results = []
-            not_found = object()
-            for snapshot in snapshots:
-                for opt, value in search_opts.iteritems():
-                    if snapshot.get(opt, not_found) != value:
-                        break
-                else:
-                    results.append(snapshot)
-            snapshots = results
         return snapshots
 
     @wrap_check_policy
@@ -704,6 +716,17 @@ class API(base.Base):
             (meta_entry.key, meta_entry.value) for meta_entry in db_data
         )
 
+    def get_list_volumes_image_metadata(self, context, volume_id_list):
+        """Return {volume_id: image metadata} for the listed volumes."""
+        check_policy(context, 'get_volume_image_metadata')
+        db_data = self.db.volume_glance_metadata_list_get(context,
+                                                          volume_id_list)
+        results = {}
+        for meta_entry in db_data:
+            results.setdefault(meta_entry['volume_id'], {}).update(
+                {meta_entry['key']: meta_entry['value']})
+        return results
+
     def _check_volume_availability(self, context, volume, force):
         """Check if the volume can be used."""
         if volume['status'] not in ['available', 'in-use']:
@@ -0,0 +1,296 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Native volume copy engine.
+
+Copies a volume block by block with several workers, each running its
+blocking I/O in a native thread.  Unlike dd it does not write what the
+destination already holds:
+
+* extents of the source that are unallocated (SEEK_HOLE) are not read;
+* blocks of zeros are not written to a sparse destination, which reads
+  zeros wherever nothing was written (e.g. a new thin LV), and are only
+  written to another destination where it does not read zeros already.
+
+The copy can be throttled to a number of bytes read and written per second.
+"""
+
+import errno
+import os
+import stat
+import sys
+import time
+
+import eventlet
+from eventlet import tpool
+from oslo.config import cfg
+
+from cinder.openstack.common import log as logging
+from cinder import units
+from cinder import utils
+
+
+LOG = logging.getLogger(__name__)
+
+copy_engine_opts = [
+    cfg.StrOpt('volume_copy_engine',
+               default='dd',
+               help='Engine copying and clearing volumes: dd or native. '
+                    'The native engine copies as the cinder user, taking '
+                    'ownership of the volumes meanwhile, instead of '
+                    'running dd as root'),
+    cfg.IntOpt('volume_copy_workers',
+               default=4,
+               help='Number of blocks the native volume copy engine reads '
+                    'and writes concurrently'),
+    cfg.IntOpt('volume_copy_io_size_mb',
+               default=4,
+               help='Size of the blocks the native volume copy engine '
+                    'reads and writes, in MB'),
+    cfg.IntOpt('volume_copy_bps_limit',
+               default=0,
+               help='Maximum number of bytes per second the native volume '
+                    'copy engine reads and writes, 0 for no limit'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(copy_engine_opts)
+
+# lseek() whences of Linux, missing from the os module of python 2
+SEEK_DATA = 3
+SEEK_HOLE = 4
+
+ZERO_SOURCE = '/dev/zero'
+
+# Progress is logged each time this percentage more is copied
+PROGRESS_STEP = 10
+
+
+def data_extents(fd, size):
+    """Yield the (offset, length) extents of fd, up to size, holding data.
+
+    Everything is data where the file system or device does not report
+    holes.
+    """
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # Nothing but a hole up to the end
+                return
+            yield offset, size - offset
+            return
+        if start >= size:
+            return
+        try:
+            end = min(os.lseek(fd, start, SEEK_HOLE), size)
+        except OSError:
+            end = size
+        yield start, end - start
+        offset = end
+
+
+def _is_zero(data):
+    return data.count('\0') == len(data)
+
+
+def _read(fd, offset, length):
+    os.lseek(fd, offset, os.SEEK_SET)
+    chunks = []
+    while length > 0:
+        chunk = os.read(fd, length)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        length -= len(chunk)
+    return ''.join(chunks)
+
+
+def _write(fd, offset, data):
+    os.lseek(fd, offset, os.SEEK_SET)
+    while data:
+        written = os.write(fd, data)
+        data = buffer(data, written)
+
+
+class _Throttle(object):
+    """Sleeps to keep the bytes consumed under bps per second."""
+
+    def __init__(self, bps):
+        self.bps = bps
+        self.start = time.time()
+        self.consumed = 0
+
+    def consume(self, nbytes):
+        if not self.bps:
+            return
+        self.consumed += nbytes
+        delay = self.consumed / float(self.bps) - (time.time() - self.start)
+        if delay > 0:
+            eventlet.sleep(delay)
+
+
+class VolumeCopier(object):
+
+    def __init__(self, src, dest, size, sparse=False, workers=None,
+                 io_size=None, bps_limit=None):
+        self.src = src
+        self.dest = dest
+        self.size = size
+        self.sparse = sparse
+        self.workers = max(1, workers or CONF.volume_copy_workers)
+        self.io_size = (io_size or
+                        max(1, CONF.volume_copy_io_size_mb) * units.MiB)
+        if bps_limit is None:
+            bps_limit = CONF.volume_copy_bps_limit
+        self.throttle = _Throttle(bps_limit)
+        self.zero_source = src == ZERO_SOURCE
+        self.done = 0
+        self.written = 0
+        self.next_progress = PROGRESS_STEP
+
+    def _blocks(self, src_fd):
+        """Yield the (offset, length, hole) blocks to copy."""
+        if self.zero_source:
+            extents = []
+        else:
+            extents = data_extents(src_fd, self.size)
+        offset = 0
+        for start, length in extents:
+            if start > offset:
+                if self.sparse:
+                    self._progress(start - offset)
+                else:
+                    for block in self._split(offset, start, True):
+                        yield block
+            for block in self._split(start, start + length, False):
+                yield block
+            offset = start + length
+        if offset < self.size:
+            if self.sparse and not self.zero_source:
+                self._progress(self.size - offset)
+            else:
+                for block in self._split(offset, self.size, True):
+                    yield block
+
+    def _split(self, start, end, hole):
+        for offset in xrange(start, end, self.io_size):
+            yield offset, min(self.io_size, end - offset), hole
+
+    def _progress(self, nbytes):
+        self.done += nbytes
+        percent = self.done * 100 / self.size if self.size else 100
+        if percent >= self.next_progress:
+            LOG.info(_("Copied %(percent)d%% of %(src)s to %(dest)s") %
+                     {'percent': percent, 'src': self.src, 'dest': self.dest})
+            self.next_progress = (percent / PROGRESS_STEP + 1) * PROGRESS_STEP
+
+    def _copy_block(self, src_fd, dest_fd, offset, length, hole):
+        """Copy one block, returning the number of bytes read and written."""
+        if hole:
+            data = '\0' * length
+            io = 0
+        else:
+            data = _read(src_fd, offset, length)
+            io = len(data)
+        if _is_zero(data):
+            if self.sparse and not self.zero_source:
+                return io
+            if not self.zero_source:
+                current = _read(dest_fd, offset, len(data))
+                io += len(current)
+                if current == data:
+                    return io
+        _write(dest_fd, offset, data)
+        return io + len(data)
+
+    def _worker(self, blocks):
+        src_fd = None
+        if not self.zero_source:
+            src_fd = os.open(self.src, os.O_RDONLY)
+        try:
+            dest_fd = os.open(self.dest,
+                              os.O_WRONLY if self.sparse else os.O_RDWR)
+            try:
+                for offset, length, hole in blocks:
+                    io = tpool.execute(self._copy_block, src_fd, dest_fd,
+                                       offset, length, hole)
+                    self.throttle.consume(io)
+                    self._progress(length)
+            finally:
+                os.close(dest_fd)
+        finally:
+            if src_fd is not None:
+                os.close(src_fd)
+
+    def copy(self):
+        LOG.debug(_("Copying %(size)d bytes from %(src)s to %(dest)s") %
+                  {'size': self.size, 'src': self.src, 'dest': self.dest})
+        src_fd = None
+        if not self.zero_source:
+            src_fd = os.open(self.src, os.O_RDONLY)
+        try:
+            # The workers share the generator: green threads never run it
+            # concurrently
+            blocks = self._blocks(src_fd)
+            failures = []
+
+            def _run():
+                try:
+                    self._worker(blocks)
+                except Exception:
+                    failures.append(sys.exc_info())
+
+            pool = eventlet.GreenPool(self.workers)
+            for _i in xrange(self.workers):
+                pool.spawn_n(_run)
+            pool.waitall()
+            if failures:
+                raise failures[0][0], failures[0][1], failures[0][2]
+        finally:
+            if src_fd is not None:
+                os.close(src_fd)
+
+        dest_fd = os.open(self.dest, os.O_WRONLY)
+        try:
+            # Extend a destination file whose tail was skipped
+            if (stat.S_ISREG(os.fstat(dest_fd).st_mode) and
+                    os.fstat(dest_fd).st_size < self.size):
+                os.ftruncate(dest_fd, self.size)
+            # The copy went through the page cache, persist it before the
+            # caller e.g. deletes the source
+            os.fdatasync(dest_fd)
+        finally:
+            os.close(dest_fd)
+
+
+def copy_volume(src, dest, size, sparse=False):
+    """Copy size bytes of the src volume to the dest volume.
+
+    :param sparse: dest reads zeros wherever nothing was written to it
+    """
+    copier = VolumeCopier(src, dest, size, sparse=sparse)
+    if copier.zero_source:
+        with utils.temporary_chown(dest):
+            copier.copy()
+        return
+    with utils.temporary_chown(src):
+        with utils.temporary_chown(dest):
+            copier.copy()
@@ -86,7 +86,20 @@ volume_opts = [
                     'none, zero, shred)'),
     cfg.IntOpt('volume_clear_size',
                default=0,
-               help='Size in MiB to wipe at start of old volumes. 0 => all'), ]
+               help='Size in MiB to wipe at start of old volumes. 0 => all'),
+    cfg.BoolOpt('image_volume_cache_enabled',
+                default=False,
+                help='Clone volumes created from an image from an '
+                     'internal volume holding that image, created on first '
+                     'use'),
+    cfg.IntOpt('image_volume_cache_max_size_gb',
+               default=0,
+               help='Maximum total size of the image volumes of a backend, '
+                    'in GB. 0 => unlimited'),
+    cfg.IntOpt('image_volume_cache_max_count',
+               default=0,
+               help='Maximum number of image volumes of a backend. '
+                    '0 => unlimited'), ]
 
 
 CONF = cfg.CONF
@@ -404,7 +417,9 @@ class VolumeDriver(object):
         try:
             volume_path = attach_info['device']['path']
             with utils.temporary_chown(volume_path):
-                with fileutils.file_open(volume_path, 'wb') as volume_file:
+                # Opened for reading too so backup services can leave ranges
+                # that already read as zeros unwritten
+                with fileutils.file_open(volume_path, 'r+b') as volume_file:
                     backup_service.restore(backup, volume['id'], volume_file)
 
         finally:
@@ -178,7 +178,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
         volutils.copy_volume(self.local_path(snapshot),
                              self.local_path(volume),
                              snapshot['volume_size'] * 1024,
-                             execute=self._execute)
+                             execute=self._execute,
+                             sparse=self.configuration.lvm_type == 'thin')
 
     def delete_volume(self, volume):
         """Deletes a logical volume."""
@@ -293,7 +294,8 @@ class LVMVolumeDriver(driver.VolumeDriver):
             volutils.copy_volume(self.local_path(temp_snapshot),
                                  self.local_path(volume),
                                  src_vref['size'] * 1024,
-                                 execute=self._execute)
+                                 execute=self._execute,
+                                 sparse=self.configuration.lvm_type == 'thin')
         finally:
             self.delete_snapshot(temp_snapshot)
 
@@ -312,7 +314,9 @@ class LVMVolumeDriver(driver.VolumeDriver):
         """Restore an existing backup to a new or existing volume."""
         volume_path = self.local_path(volume)
         with utils.temporary_chown(volume_path):
-            with fileutils.file_open(volume_path, 'wb') as volume_file:
+            # Opened for reading too so backup services can leave ranges
+            # that already read as zeros unwritten
+            with fileutils.file_open(volume_path, 'r+b') as volume_file:
                 backup_service.restore(backup, volume['id'], volume_file)
 
     def get_volume_stats(self, refresh=False):
@@ -653,8 +657,9 @@ class LVMISCSIDriver(LVMVolumeDriver, driver.ISCSIDriver):
 
         volutils.copy_volume(self.local_path(volume),
                              self.local_path(volume, vg=dest_vg),
-                             volume['size'],
-                             execute=self._execute)
+                             volume['size'] * 1024,
+                             execute=self._execute,
+                             sparse=lvm_type == 'thin')
         self._delete_volume(volume)
         model_update = self._create_export(ctxt, volume, vg=dest_vg)
 
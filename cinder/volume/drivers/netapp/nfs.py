@@ -92,6 +92,7 @@ class NetAppNFSDriver(nfs.NfsDriver):
 
         self._clone_volume(snapshot.name, volume.name, snapshot.volume_id)
         share = self._get_volume_location(snapshot.volume_id)
+        self._update_allocated_space(share, vol_size)
 
         return {'provider_location': share}
 
@@ -190,6 +191,7 @@ class NetAppNFSDriver(nfs.NfsDriver):
 
         self._clone_volume(src_vref.name, volume.name, src_vref.id)
         share = self._get_volume_location(src_vref.id)
+        self._update_allocated_space(share, vol_size)
 
         return {'provider_location': share}
 
@@ -25,6 +25,7 @@ from cinder import exception
 from cinder.image import image_utils
 from cinder.openstack.common import log as logging
 from cinder.openstack.common import processutils as putils
+from cinder.openstack.common import timeutils
 from cinder import units
 from cinder.volume import driver
 
@@ -50,7 +51,14 @@ volume_opts = [
                  default=1.0,
                  help=('This will compare the allocated to available space on '
                        'the volume destination.  If the ratio exceeds this '
-                       'number, the destination will no longer be valid.'))
+                       'number, the destination will no longer be valid.')),
+    cfg.IntOpt('nfs_allocated_scan_interval',
+               default=600,
+               help=('Seconds between two scans of the space allocated on '
+                     'a share.  In between, the allocated space is tracked '
+                     'from the volumes created and deleted by this driver.  '
+                     'Set to 0 to scan the share every time its allocated '
+                     'space is needed.'))
 ]
 
 
@@ -360,6 +368,8 @@ class NfsDriver(RemoteFsDriver):
         super(NfsDriver, self).__init__(*args, **kwargs)
         self.configuration.append_config_values(volume_opts)
         self._remotefsclient = remotefs.RemoteFsClient('nfs', execute)
+        # share : (allocated bytes, time of the last scan)
+        self._allocated_space = {}
 
     def set_execute(self, execute):
         super(NfsDriver, self).set_execute(execute)
@@ -505,7 +515,76 @@ class NfsDriver(RemoteFsDriver):
         total_available = block_size * blocks_avail
         total_size = block_size * blocks_total
 
+        total_allocated = self._get_allocated_space(nfs_share)
+        return total_size, total_available, total_allocated
+
+    def _scan_allocated_space(self, nfs_share):
+        """Sum up the apparent size of the files on the share.
+
+        This walks the whole share and is slow on shares holding many
+        volumes, the result is kept in the allocated space ledger.
+        """
+        mount_point = self._get_mount_point_for_share(nfs_share)
         du, _ = self._execute('du', '-sb', '--apparent-size', '--exclude',
                               '*snapshot*', mount_point, run_as_root=True)
         total_allocated = float(du.split()[0])
-        return total_size, total_available, total_allocated
+        self._allocated_space[nfs_share] = (total_allocated,
+                                            timeutils.utcnow())
+        return total_allocated
+
+    def _get_allocated_space(self, nfs_share):
+        """Return the apparent space allocated on the share.
+
+        The ledger is only scanned here when the share was never scanned
+        (or caching is disabled), reconciling it with the content of the
+        share is otherwise left to the periodic stats update.
+        """
+        if (nfs_share not in self._allocated_space or
+                self.configuration.nfs_allocated_scan_interval <= 0):
+            return self._scan_allocated_space(nfs_share)
+        return self._allocated_space[nfs_share][0]
+
+    def _update_allocated_space(self, nfs_share, size_in_gib):
+        """Account for size_in_gib being allocated (or freed if negative).
+
+        Shares that were never scanned are left alone, their first scan
+        will see the change anyway.
+        """
+        if nfs_share not in self._allocated_space:
+            return
+        allocated, scanned_at = self._allocated_space[nfs_share]
+        allocated = max(0, allocated + size_in_gib * units.GiB)
+        self._allocated_space[nfs_share] = (allocated, scanned_at)
+
+    def _reconcile_allocated_space(self):
+        """Rescan the shares whose ledger entry is out of date."""
+        interval = self.configuration.nfs_allocated_scan_interval
+        if interval <= 0:
+            # Every lookup scans the share already
+            return
+        for nfs_share in self._mounted_shares:
+            entry = self._allocated_space.get(nfs_share)
+            if entry and not timeutils.is_older_than(entry[1], interval):
+                continue
+            try:
+                self._scan_allocated_space(nfs_share)
+            except putils.ProcessExecutionError as exc:
+                LOG.warn(_('Failed to scan allocated space on %(share)s: '
+                           '%(exc)s'), {'share': nfs_share, 'exc': exc})
+
+    def _update_volume_stats(self):
+        """Retrieve stats info and reconcile the allocated space ledger."""
+        super(NfsDriver, self)._update_volume_stats()
+        self._reconcile_allocated_space()
+
+    def _do_create_volume(self, volume):
+        super(NfsDriver, self)._do_create_volume(volume)
+        self._update_allocated_space(volume['provider_location'],
+                                     volume['size'])
+
+    def delete_volume(self, volume):
+        """Deletes a logical volume."""
+        super(NfsDriver, self).delete_volume(volume)
+        if volume['provider_location']:
+            self._update_allocated_space(volume['provider_location'],
+                                         -volume['size'])
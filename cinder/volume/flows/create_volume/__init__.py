@@ -675,14 +675,19 @@ class VolumeCastTask(base.CinderTask):
     This which will signal a transition of the api workflow to another child
     and/or related workflow on another component.
 
+    Volumes to be placed by the scheduler are appended to scheduler_batch
+    instead, when it is given, to be scheduled in one batch by the caller.
+
     Reversion strategy: N/A
     """
 
-    def __init__(self, scheduler_rpcapi, volume_rpcapi, db):
+    def __init__(self, scheduler_rpcapi, volume_rpcapi, db,
+                 scheduler_batch=None):
         super(VolumeCastTask, self).__init__(addons=[ACTION])
         self.volume_rpcapi = volume_rpcapi
         self.scheduler_rpcapi = scheduler_rpcapi
         self.db = db
+        self.scheduler_batch = scheduler_batch
         self.requires.update(['image_id', 'scheduler_hints', 'snapshot_id',
                               'source_volid', 'volume_id', 'volume_type',
                               'volume_properties'])
@@ -708,7 +713,9 @@ class VolumeCastTask(base.CinderTask):
             source_volume_ref = self.db.volume_get(context, source_volid)
             host = source_volume_ref['host']
 
-        if not host:
+        if not host and self.scheduler_batch is not None:
+            self.scheduler_batch.append((request_spec, filter_properties))
+        elif not host:
             # Cast to the scheduler and let it handle whatever is needed
             # to select the target host for this volume.
             self.scheduler_rpcapi.create_volume(
@@ -1166,10 +1173,11 @@ class CreateVolumeFromSpecTask(base.CinderTask):
     Reversion strategy: N/A
     """
 
-    def __init__(self, db, host, driver):
+    def __init__(self, db, host, driver, image_volume_cache=None):
         super(CreateVolumeFromSpecTask, self).__init__(addons=[ACTION])
         self.db = db
         self.driver = driver
+        self.image_volume_cache = image_volume_cache
         self.requires.update(['volume_spec', 'volume_ref'])
         # This maps the different volume specification types into the methods
         # that can create said volume type (aka this is a jump table).
@@ -1379,6 +1387,10 @@ class CreateVolumeFromSpecTask(base.CinderTask):
         # and clone status.
         model_update, cloned = self.driver.clone_image(
             volume_ref, image_location, image_id)
+        if not cloned and self.image_volume_cache:
+            model_update, cloned = self._create_from_image_volume_cache(
+                context, volume_ref, image_location, image_id, image_meta,
+                image_service)
         if not cloned:
             # TODO(harlowja): what needs to be rolled back in the clone if this
             # volume create fails?? Likely this should be a subflow or broken
@@ -1406,6 +1418,156 @@ class CreateVolumeFromSpecTask(base.CinderTask):
                                                  image_meta=image_meta)
         return model_update
 
+    @staticmethod
+    def _get_image_volume_size(image_meta):
+        """Returns the smallest size in GB of a volume holding the image."""
+        image_size = utils.as_int(image_meta.get('size') or 0)
+        image_size_in_gb = (image_size + GB - 1) / GB
+        return max(1, image_meta.get('min_disk') or 0, image_size_in_gb)
+
+    def _create_image_volume(self, context, volume_ref, image_location,
+                             image_id, image_meta, image_service):
+        """Create the image volume of image_id, returns it or None.
+
+        The image volume is created at the smallest size of the image, so
+        that volumes of any size can be cloned from it.  Images whose
+        virtual size is larger, e.g. qcow2 ones, are cached at the size of
+        the volume being created instead.
+        """
+        sizes = [self._get_image_volume_size(image_meta)]
+        if sizes[0] < volume_ref['size']:
+            sizes.append(volume_ref['size'])
+        for size in sizes:
+            image_volume = self._create_image_volume_of_size(
+                context, volume_ref, image_location, image_id, image_meta,
+                image_service, size)
+            if image_volume is not None:
+                return image_volume
+        return None
+
+    def _create_image_volume_of_size(self, context, volume_ref,
+                                     image_location, image_id, image_meta,
+                                     image_service, size):
+        cache = self.image_volume_cache
+        if not cache.ensure_space(context, size):
+            LOG.debug(_("Image %s does not fit in the image volume cache")
+                      % image_id)
+            return None
+
+        image_volume = self.db.volume_create(context, {
+            'size': size,
+            'host': self.host,
+            'availability_zone': volume_ref['availability_zone'],
+            'volume_type_id': volume_ref['volume_type_id'],
+            'status': 'creating',
+            'attach_status': 'detached',
+            'display_name': 'image-%s' % image_id,
+            'display_description': _('Image volume cache entry'),
+        })
+        try:
+            model_update = self.driver.create_volume(image_volume)
+            updates = dict(model_update or dict(), status='downloading')
+            image_volume = self.db.volume_update(context, image_volume['id'],
+                                                 updates)
+            self._copy_image_to_volume(context, image_volume, image_id,
+                                       image_location, image_service)
+            image_volume = self.db.volume_update(context, image_volume['id'],
+                                                 {'status': 'available'})
+        except Exception:
+            LOG.exception(_("Failed to create the %(size)sG image volume of "
+                            "image %(image_id)s") %
+                          {'size': size, 'image_id': image_id})
+            try:
+                cache.delete_image_volume(context, image_volume)
+            except Exception:
+                LOG.exception(_("Failed to delete image volume %s") %
+                              image_volume['id'])
+                self.db.volume_update(context, image_volume['id'],
+                                      {'status': 'error'})
+            return None
+
+        cache.create_entry(context, image_volume, image_id, image_meta)
+        return image_volume
+
+    def _clone_image_volume(self, volume_ref, image_volume):
+        """Clone volume_ref from image_volume, extending it if larger.
+
+        Returns (model_update, cloned).
+        """
+        LOG.debug(_("Cloning volume %(volume_id)s from image volume "
+                    "%(image_volume_id)s") %
+                  {'volume_id': volume_ref['id'],
+                   'image_volume_id': image_volume['id']})
+        # Cloning to another size is not supported by every driver, the
+        # clone is created at the size of the image volume and then extended
+        clone_ref = dict(volume_ref.iteritems())
+        clone_ref['name'] = volume_ref['name']
+        clone_ref['size'] = image_volume['size']
+        model_update = self.driver.create_cloned_volume(clone_ref,
+                                                        image_volume)
+        if volume_ref['size'] > image_volume['size']:
+            try:
+                self.driver.extend_volume(volume_ref, volume_ref['size'])
+            except Exception:
+                LOG.exception(_("Failed to extend volume %(volume_id)s to "
+                                "%(size)sG, not using image volume "
+                                "%(image_volume_id)s") %
+                              {'volume_id': volume_ref['id'],
+                               'size': volume_ref['size'],
+                               'image_volume_id': image_volume['id']})
+                self.driver.delete_volume(clone_ref)
+                return None, False
+        return model_update, True
+
+    def _create_from_image_volume_cache(self, context, volume_ref,
+                                        image_location, image_id, image_meta,
+                                        image_service):
+        """Clone the volume from the cached image volume of image_id.
+
+        The image volume is created first if it is not cached yet.  Returns
+        (model_update, cloned), cloned being False when the cache could not
+        be used.
+        """
+        admin_context = context.elevated()
+        cache = self.image_volume_cache
+
+        @utils.synchronized('image-volume-cache-%s-%s' % (self.host,
+                                                          image_id),
+                            external=True)
+        def _get_image_volume_id():
+            entry = cache.get_entry(admin_context, image_id, image_meta)
+            if entry:
+                return entry['volume_id']
+            image_volume = self._create_image_volume(
+                admin_context, volume_ref, image_location, image_id,
+                image_meta, image_service)
+            if image_volume is None:
+                return None
+            return image_volume['id']
+
+        image_volume_id = _get_image_volume_id()
+        if image_volume_id is None:
+            return None, False
+
+        # NOTE: the image volume is held while it is cloned, so that no
+        # process evicts it meanwhile.
+        with cache.use_image_volume(admin_context,
+                                    image_volume_id) as image_volume:
+            if image_volume is None:
+                LOG.debug(_("Image volume %s is being evicted, not cloning "
+                            "from it") % image_volume_id)
+                return None, False
+            if image_volume['size'] > volume_ref['size']:
+                LOG.debug(_("Image volume %(image_volume_id)s is "
+                            "%(image_volume_size)sG, not cloning "
+                            "%(volume_size)sG volume %(volume_id)s from it") %
+                          {'image_volume_id': image_volume['id'],
+                           'image_volume_size': image_volume['size'],
+                           'volume_size': volume_ref['size'],
+                           'volume_id': volume_ref['id']})
+                return None, False
+            return self._clone_image_volume(volume_ref, image_volume)
+
     def _create_raw_volume(self, context, volume_ref, **kwargs):
         return self.driver.create_volume(volume_ref)
 
@@ -1520,7 +1682,8 @@ class CreateVolumeOnFinishTask(NotifyVolumeActionTask):
 def get_api_flow(scheduler_rpcapi, volume_rpcapi, db,
                  image_service,
                  az_check_functor,
-                 create_what):
+                 create_what,
+                 scheduler_batch=None):
     """Constructs and returns the api entrypoint flow.
 
     This flow will do the following:
@@ -1530,7 +1693,8 @@ def get_api_flow(scheduler_rpcapi, volume_rpcapi, db,
     3. Reserves the quota (reverts quota on any failures).
     4. Creates the database entry.
     5. Commits the quota.
-    6. Casts to volume manager or scheduler for further processing.
+    6. Casts to volume manager or scheduler for further processing, or
+       appends the volume to scheduler_batch when it is given.
     """
 
     flow_name = ACTION.replace(":", "_") + "_api"
@@ -1552,7 +1716,8 @@ def get_api_flow(scheduler_rpcapi, volume_rpcapi, db,
 
     # This will cast it out to either the scheduler or volume manager via
     # the rpc apis provided.
-    api_flow.add(VolumeCastTask(scheduler_rpcapi, volume_rpcapi, db))
+    api_flow.add(VolumeCastTask(scheduler_rpcapi, volume_rpcapi, db,
+                                scheduler_batch))
 
     # Note(harlowja): this will return the flow as well as the uuid of the
     # task which will produce the 'volume' database reference (since said
@@ -1651,7 +1816,7 @@ def get_manager_flow(db, driver, scheduler_rpcapi, host, volume_id,
                      request_spec=None, filter_properties=None,
                      allow_reschedule=True,
                      snapshot_id=None, image_id=None, source_volid=None,
-                     reschedule_context=None):
+                     reschedule_context=None, image_volume_cache=None):
     """Constructs and returns the manager entrypoint flow.
 
     This flow will do the following:
@@ -1707,7 +1872,8 @@ def get_manager_flow(db, driver, scheduler_rpcapi, host, volume_id,
 
     volume_flow.add(ExtractVolumeSpecTask(db))
     volume_flow.add(NotifyVolumeActionTask(db, host, "create.start"))
-    volume_flow.add(CreateVolumeFromSpecTask(db, host, driver))
+    volume_flow.add(CreateVolumeFromSpecTask(db, host, driver,
+                                             image_volume_cache))
     volume_flow.add(CreateVolumeOnFinishTask(db, host, "create.end"))
 
     return flow_utils.attach_debug_listeners(volume_flow)
@@ -47,6 +47,7 @@ from cinder import compute
 from cinder import context
 from cinder import exception
 from cinder.image import glance
+from cinder.image import image_volume_cache
 from cinder import manager
 from cinder.openstack.common import excutils
 from cinder.openstack.common import importutils
@@ -157,6 +158,13 @@ class VolumeManager(manager.SchedulerDependentManager):
         #             by the driver.
         self.driver.db = self.db
 
+        self.image_volume_cache = None
+        if self.configuration.safe_get('image_volume_cache_enabled'):
+            self.image_volume_cache = image_volume_cache.ImageVolumeCache(
+                self.db, self.driver, self.host,
+                max_size_gb=self.configuration.image_volume_cache_max_size_gb,
+                max_count=self.configuration.image_volume_cache_max_count)
+
     def init_host(self):
         """Do any initialization that needs to be run if this is a
            standalone service.
@@ -208,7 +216,8 @@ class VolumeManager(manager.SchedulerDependentManager):
             snapshot_id=snapshot_id,
             image_id=image_id,
             source_volid=source_volid,
-            reschedule_context=context.deepcopy())
+            reschedule_context=context.deepcopy(),
+            image_volume_cache=self.image_volume_cache)
 
         assert flow, _('Manager volume flow not retrieved')
 
@@ -263,18 +272,26 @@ class VolumeManager(manager.SchedulerDependentManager):
         if volume_ref['migration_status']:
             return True
 
-        # Get reservations
-        try:
-            reserve_opts = {'volumes': -1, 'gigabytes': -volume_ref['size']}
-            QUOTAS.add_volume_type_opts(context,
-                                        reserve_opts,
-                                        volume_ref.get('volume_type_id'))
-            reservations = QUOTAS.reserve(context,
-                                          project_id=project_id,
-                                          **reserve_opts)
-        except Exception:
+        # Image volumes are internal and were never counted in any quota
+        cache_entry = self.db.image_volume_cache_get_by_volume_id(context,
+                                                                  volume_id)
+        if cache_entry:
+            self.db.image_volume_cache_delete(context, cache_entry['id'])
             reservations = None
-            LOG.exception(_("Failed to update usages deleting volume"))
+        else:
+            # Get reservations
+            try:
+                reserve_opts = {'volumes': -1,
+                                'gigabytes': -volume_ref['size']}
+                QUOTAS.add_volume_type_opts(context,
+                                            reserve_opts,
+                                            volume_ref.get('volume_type_id'))
+                reservations = QUOTAS.reserve(context,
+                                              project_id=project_id,
+                                              **reserve_opts)
+            except Exception:
+                reservations = None
+                LOG.exception(_("Failed to update usages deleting volume"))
 
         # Delete glance metadata if it exists
         try:
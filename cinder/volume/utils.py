@@ -32,6 +32,7 @@ from cinder.openstack.common import strutils
 from cinder.openstack.common import timeutils
 from cinder import units
 from cinder import utils
+from cinder.volume import copy_engine
 
 
 volume_opts = [
@@ -170,7 +171,22 @@ def _calculate_count(size_in_m):
 
 
 def copy_volume(srcstr, deststr, size_in_m, sync=False,
-                execute=utils.execute):
+                execute=utils.execute, sparse=False):
+    """Copy size_in_m MB of srcstr to deststr.
+
+    :param sync: persist the data before returning
+    :param execute: runs dd; the native copy engine, which does not run any
+                    command, is only used with the default one
+    :param sparse: deststr reads zeros wherever nothing was written to it,
+                   as a new thin volume does, so that zeros need not be
+                   copied to it
+    """
+    if CONF.volume_copy_engine == 'native' and execute is utils.execute:
+        # The native engine always persists the data it copied, whether
+        # sync is requested or not
+        return copy_engine.copy_volume(srcstr, deststr, size_in_m * units.MiB,
+                                       sparse=sparse)
+
     # Use O_DIRECT to avoid thrashing the system buffer cache
     extra_flags = ['iflag=direct', 'oflag=direct']
 
@@ -29,10 +29,12 @@ from cinder import db
 from cinder import exception
 from cinder.openstack.common.db import exception as db_exc
 from cinder.openstack.common import log as logging
+from cinder import quota
 
 
 CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
+QUOTAS = quota.QUOTAS
 
 
 def create(context, name, extra_specs={}):
@@ -45,6 +47,7 @@ def create(context, name, extra_specs={}):
         LOG.exception(_('DB error: %s') % e)
         raise exception.VolumeTypeCreateFailed(name=name,
                                                extra_specs=extra_specs)
+    QUOTAS.invalidate_resources()
     return type_ref
 
 
@@ -55,6 +58,7 @@ def destroy(context, id):
         raise exception.InvalidVolumeType(reason=msg)
     else:
         db.volume_type_destroy(context, id)
+        QUOTAS.invalidate_resources()
 
 
 def get_all_types(context, inactive=0, search_opts={}):